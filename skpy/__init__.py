@@ -1,19 +1,57 @@
 """
-Root of the SkPy module.  Classes from all submodules are imported here for convenience.
+Root of the SkPy module.  Classes from all submodules are available here for convenience.
+
+Submodules are only imported when one of their classes is first accessed, so that ``import skpy`` doesn't load
+:mod:`requests` or :mod:`bs4` until they're needed.
 """
 
-from skpy.core import SkypeObj, SkypeObjs, SkypeEnum, SkypeException, SkypeApiException, SkypeAuthException
-from skpy.util import SkypeUtils
-from skpy.main import Skype, SkypeEventLoop, SkypeSettings, SkypeTranslator
-from skpy.conn import SkypeConnection, SkypeAuthProvider, SkypeAPIAuthProvider, SkypeLiveAuthProvider, \
-                      SkypeSOAPAuthProvider, SkypeGuestAuthProvider, SkypeRefreshAuthProvider, \
-                      SkypeRegistrationTokenProvider, SkypeEndpoint
-from skpy.user import SkypeUser, SkypeContact, SkypeBotUser, SkypeContacts, SkypeContactGroup, SkypeRequest
-from skpy.chat import SkypeChat, SkypeSingleChat, SkypeGroupChat, SkypeChats
-from skpy.msg import SkypeMsg, SkypeTextMsg, SkypeContactMsg, SkypeLocationMsg, SkypeCardMsg, \
-                     SkypeFileMsg, SkypeImageMsg, SkypeAudioMsg, SkypeVideoMsg, SkypeCallMsg, SkypePropertyMsg, \
-                     SkypeTopicPropertyMsg, SkypeOpenPropertyMsg, SkypeHistoryPropertyMsg, SkypeMemberMsg, \
-                     SkypeAddMemberMsg, SkypeChangeMemberMsg, SkypeRemoveMemberMsg
-from skpy.event import SkypeEvent, SkypePresenceEvent, SkypeEndpointEvent, SkypeTypingEvent, \
-                       SkypeMessageEvent, SkypeNewMessageEvent, SkypeEditMessageEvent, SkypeCallEvent, \
-                       SkypeChatUpdateEvent, SkypeChatMemberEvent
+# Mapping from submodule names to the classes they provide at the package level.
+submodules = {"core": ("SkypeObj", "SkypeObjs", "SkypeEnum", "SkypeException", "SkypeApiException",
+                       "SkypeAuthException"),
+              "util": ("SkypeUtils",),
+              "remote": ("SkypeCachedResource",),
+              "main": ("Skype", "SkypeEventLoop", "SkypeSettings", "SkypeTranslator"),
+              "conn": ("SkypeConnection", "SkypeAuthProvider", "SkypeAPIAuthProvider", "SkypeLiveAuthProvider",
+                       "SkypeSOAPAuthProvider", "SkypeGuestAuthProvider", "SkypeRefreshAuthProvider",
+                       "SkypeRegistrationTokenProvider", "SkypeEndpoint", "SkypeEndpointScheduler"),
+              "codec": ("SkypeJsonCodec",),
+              "stream": ("SkypeJsonStream",),
+              "tokens": ("SkypeTokenStore", "SkypeFileTokenStore", "SkypeTokenManager"),
+              "metrics": ("SkypeApiCall", "SkypeInstrument", "SkypeDebugInstrument", "SkypeLatencyHistogram",
+                          "SkypeMetrics", "SkypeLoopProfiler"),
+              "user": ("SkypeUser", "SkypeContact", "SkypeBotUser", "SkypeContacts", "SkypeContactGroup",
+                       "SkypeRequest"),
+              "chat": ("SkypeChat", "SkypeSingleChat", "SkypeGroupChat", "SkypeChats"),
+              "msg": ("SkypeMsg", "SkypeTextMsg", "SkypeContactMsg", "SkypeLocationMsg", "SkypeCardMsg", "SkypeFileMsg",
+                      "SkypeImageMsg", "SkypeAudioMsg", "SkypeVideoMsg", "SkypeCallMsg", "SkypePropertyMsg",
+                      "SkypeTopicPropertyMsg", "SkypeOpenPropertyMsg", "SkypeHistoryPropertyMsg", "SkypeMemberMsg",
+                      "SkypeAddMemberMsg", "SkypeChangeMemberMsg", "SkypeRemoveMemberMsg"),
+              "event": ("SkypeEvent", "SkypeEventFilter", "SkypePresenceEvent", "SkypePresences", "SkypeEndpointEvent",
+                        "SkypeTypingEvent", "SkypeMessageEvent", "SkypeNewMessageEvent", "SkypeEditMessageEvent",
+                        "SkypeCallEvent", "SkypeChatUpdateEvent", "SkypeChatMemberEvent"),
+              "replay": ("SkypeEventRecorder", "SkypeStubConnection", "SkypeEventReplay"),
+              "router": ("SkypeEventRoute", "SkypeEventRouter"),
+              "pool": ("SkypeWorkerConnection", "SkypeEventPool"),
+              "tracker": ("SkypeEventTracker",),
+              "acks": ("SkypeAckBatcher",),
+              "columns": ("SkypeMsgColumns",)}
+
+exports = dict((name, module) for module, names in submodules.items() for name in names)
+
+__all__ = sorted(exports)
+
+
+def __getattr__(name):
+    try:
+        module = exports[name]
+    except KeyError:
+        raise AttributeError("module 'skpy' has no attribute '{0}'".format(name))
+    # Use the import statement's machinery (rather than importlib) so that the load shows up in -X importtime.
+    value = getattr(__import__("skpy.{0}".format(module), fromlist=(name,)), name)
+    # Cache on the package, so this is only called once per name.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(exports))
@@ -0,0 +1,180 @@
+import atexit
+from collections import OrderedDict
+import threading
+import time
+
+import requests
+
+from .core import SkypeObj, SkypeApiException
+from .conn import SkypeConnection
+
+
+class SkypeAckBatcher(SkypeObj):
+    """
+    A background sender for event acknowledgements and read receipts (consumption horizons).
+
+    Attach a started instance to :attr:`.SkypeConnection.acks` to take these requests off the calling thread.  Each
+    request is held for up to :attr:`window` seconds, so that repeats can be merged before anything is sent:
+
+    - acknowledgements are sent once per URL, however many times an event is acked
+    - only the newest consumption horizon for each conversation is sent, replacing any older ones still waiting
+
+    The API has no way of acknowledging several events in one request, so acknowledgements are coalesced rather than
+    combined.  Anything pending is flushed when the batcher is stopped, including at interpreter exit.
+
+    .. code-block:: python
+
+        sk.conn.acks = SkypeAckBatcher(sk.conn).start()
+
+    Attributes:
+        conn (:class:`.SkypeConnection`):
+            Connection used to send requests.
+        window (float):
+            Number of seconds to hold requests before sending.
+        stats (dict):
+            Counters of ``acks`` and ``horizons`` sent, requests ``merged`` into one already waiting, and ``failures``.
+    """
+
+    attrs = ("window", "running")
+
+    def __init__(self, conn, window=1.0):
+        """
+        Create a new batcher.  Nothing is sent until :meth:`start` is called, or :meth:`flush` is called directly.
+
+        Args:
+            conn (SkypeConnection): connection used to send requests
+            window (float): number of seconds to hold requests before sending
+        """
+        super(SkypeAckBatcher, self).__init__()
+        self.conn = conn
+        self.window = window
+        self.stats = {"acks": 0, "horizons": 0, "merged": 0, "failures": 0}
+        self.acks = OrderedDict()
+        self.horizons = OrderedDict()
+        self.since = None
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    @property
+    def running(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    @property
+    def pending(self):
+        return len(self.acks) + len(self.horizons)
+
+    @staticmethod
+    def horizonTime(horizon):
+        # Horizons take the form <id>;<timestamp>;<id>, and sort on their timestamp.
+        try:
+            return int(horizon.split(";")[1])
+        except (IndexError, ValueError):
+            return None
+
+    def queued(self):
+        if self.since is None:
+            self.since = time.time()
+        self.cond.notify()
+
+    def ack(self, url):
+        """
+        Queue an event acknowledgement.
+
+        Args:
+            url (str): acknowledgement URL, from the event's ``ackrequired`` field
+        """
+        with self.cond:
+            if url in self.acks:
+                self.stats["merged"] += 1
+                return
+            self.acks[url] = None
+            self.queued()
+
+    def consume(self, chatId, horizon):
+        """
+        Queue an update of the consumption horizon of a conversation.  An older horizon for the same conversation that
+        hasn't yet been sent is discarded.
+
+        Args:
+            chatId (str): conversation identifier
+            horizon (str): new horizon string, of the form ``<id>;<timestamp>;<id>``
+        """
+        with self.cond:
+            current = self.horizons.get(chatId)
+            if current is not None:
+                self.stats["merged"] += 1
+                new, old = self.horizonTime(horizon), self.horizonTime(current)
+                if new is not None and old is not None and new < old:
+                    return
+            self.horizons[chatId] = horizon
+            self.queued()
+
+    def flush(self):
+        """
+        Send all pending requests now, from the calling thread.
+        """
+        with self.cond:
+            acks, self.acks = list(self.acks), OrderedDict()
+            horizons, self.horizons = list(self.horizons.items()), OrderedDict()
+            self.since = None
+        for url in acks:
+            self.send("acks", "POST", url)
+        for chatId, horizon in horizons:
+            self.send("horizons", "PUT", "{0}/users/ME/conversations/{1}/properties".format(self.conn.msgsHost, chatId),
+                      params={"name": "consumptionhorizon"}, json={"consumptionhorizon": horizon})
+
+    def send(self, key, method, url, **kwargs):
+        try:
+            self.conn(method, url, auth=SkypeConnection.Auth.RegToken, **kwargs)
+        except (SkypeApiException, requests.RequestException):
+            self.stats["failures"] += 1
+        else:
+            self.stats[key] += 1
+
+    def start(self):
+        """
+        Start the sender thread, if not already running.
+
+        Returns:
+            SkypeAckBatcher: the current instance, for chaining
+        """
+        with self.cond:
+            if not self.running:
+                self.stopped = False
+                self.thread = threading.Thread(target=self.run, name="SkypeAckBatcher")
+                self.thread.daemon = True
+                self.thread.start()
+                atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """
+        Stop the sender thread, then send anything still pending.
+        """
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        if self.running and threading.current_thread() is not self.thread:
+            self.thread.join()
+        atexit.unregister(self.stop)
+        self.flush()
+
+    def run(self):
+        """
+        Main loop of the sender thread: wait for the oldest pending request to be held for :attr:`window` seconds, then
+        send everything pending.
+        """
+        while True:
+            with self.cond:
+                while not self.stopped and (self.since is None or self.since + self.window > time.time()):
+                    self.cond.wait(self.since + self.window - time.time() if self.since is not None else None)
+                if self.stopped:
+                    return
+            self.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
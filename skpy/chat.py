@@ -49,6 +49,22 @@ class SkypeChat(SkypeObj):
         else:
             return SkypeSingleChat(skype, raw, **SkypeSingleChat.rawToFields(raw))
 
+    def __getstate__(self):
+        """
+        Pickle only the raw conversation and fields from :attr:`attrs`, for the cached copy sent alongside events to a
+        :class:`.SkypeEventPool` worker.  Unpickled conversations have :attr:`skype` set to ``None``.
+
+        Returns:
+            dict: instance state
+        """
+        state = {attr: self.__dict__[attr] for attr in self.attrs if attr in self.__dict__}
+        state["raw"] = self.raw
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.skype = None
+
     def getMsgs(self):
         """
         Retrieve a batch of messages from the conversation.
@@ -60,6 +76,42 @@ class SkypeChat(SkypeObj):
         Returns:
             :class:`.SkypeMsg` list: collection of messages
         """
+        return [SkypeMsg.fromRaw(self.skype, json) for json in self.getRawMsgs()]
+
+    def getRawMsgs(self):
+        """
+        Retrieve a batch of raw messages from the conversation, without creating any message objects.
+
+        Paging is shared with :meth:`getMsgs`.
+
+        Returns:
+            dict list: raw messages, as provided by the API
+        """
+        url, params, headers = self.msgsRequest()
+        resp = self.skype.conn.syncStateCall("GET", url, params, auth=SkypeConnection.Auth.RegToken,
+                                             headers=headers).json()
+        return resp.get("messages", [])
+
+    def iterRawMsgs(self, states=None):
+        """
+        Retrieve the same batch of raw messages as :meth:`getRawMsgs`, but decode the response incrementally, yielding
+        each message as it's read.
+
+        Paging is shared with :meth:`getMsgs` unless a separate list of states is given, and only advances once the
+        batch has been read in full.
+
+        Args:
+            states (list): sync state links to page with, starting from the latest messages if empty
+
+        Returns:
+            generator: raw messages, as provided by the API
+        """
+        url, params, headers = self.msgsRequest()
+        for _, json in self.skype.conn.syncStateStream("GET", url, ("messages",), params, states,
+                                                       auth=SkypeConnection.Auth.RegToken, headers=headers):
+            yield json
+
+    def msgsRequest(self):
         url = "{0}/users/ME/conversations/{1}/messages".format(self.skype.conn.msgsHost, self.id)
         params = {"startTime": 0,
                   "view": "supportsExtendedHistory|msnp24Equivalent|supportsMessageProperties",
@@ -68,8 +120,7 @@ class SkypeChat(SkypeObj):
                    "Sec-Fetch-Dest": "empty",
                    "Sec-Fetch-Mode": "cors",
                    "Sec-Fetch-Site": "cross-site"}
-        resp = self.skype.conn.syncStateCall("GET", url, params, auth=SkypeConnection.Auth.RegToken, headers=headers).json()
-        return [SkypeMsg.fromRaw(self.skype, json) for json in resp.get("messages", [])]
+        return url, params, headers
 
     def createRaw(self, msg):
         # All fields except timezone are required; 1418 = desktop client.
@@ -146,14 +197,14 @@ class SkypeChat(SkypeObj):
                     "from": "{0}/users/ME/contacts/8:{1}".format(self.skype.conn.msgsHost, self.skype.userId),
                     "imdisplayname": str(self.skype.user.name),
                     "isactive": True,
-                    "originalarrivaltime": datetime.strftime(arriveDate, "%Y-%m-%dT%H:%M:%S.%fZ"),
+                    "originalarrivaltime": SkypeUtils.formatTime(arriveDate),
                     "type": "Message"})
         if clientTime:
             clientDate = datetime.fromtimestamp(clientTime / 1000)
-            msg["composetime"] = datetime.strftime(clientDate, "%Y-%m-%dT%H:%M:%S.%fZ")
+            msg["composetime"] = SkypeUtils.formatTime(clientDate)
         if arriveTime:
             arriveDate = datetime.fromtimestamp(arriveTime / 1000)
-            msg["originalarrivaltime"] = datetime.strftime(arriveDate, "%Y-%m-%dT%H:%M:%S.%fZ")
+            msg["originalarrivaltime"] = SkypeUtils.formatTime(arriveDate)
         return SkypeMsg.fromRaw(self.skype, msg)
 
     def setTyping(self, active=True):
@@ -223,12 +274,12 @@ class SkypeChat(SkypeObj):
                 "permissions": dict(("8:{0}".format(id), ["read"]) for id in self.userIds)}
         if not image:
             meta["filename"] = name
-        objId = self.skype.conn("POST", "https://api.asm.skype.com/v1/objects",
+        objId = self.skype.conn("POST", SkypeConnection.API_ASM,
                                 auth=SkypeConnection.Auth.Authorize,
                                 headers={"X-Client-Version": "0/0.0.0.0"},
                                 json=meta).json()["id"]
         objType = "imgpsh" if image else "original"
-        urlFull = "https://api.asm.skype.com/v1/objects/{0}".format(objId)
+        urlFull = "{0}/{1}".format(SkypeConnection.API_ASM, objId)
         self.skype.conn("PUT", "{0}/content/{1}".format(urlFull, objType),
                         auth=SkypeConnection.Auth.Authorize, data=content.read())
         size = content.tell()
@@ -266,6 +317,9 @@ class SkypeChat(SkypeObj):
         Args:
             horizon (str): new horizon string, of the form ``<id>,<timestamp>,<id>``
         """
+        if self.skype.conn.acks:
+            self.skype.conn.acks.consume(self.id, horizon)
+            return
         self.skype.conn("PUT", "{0}/users/ME/conversations/{1}/properties".format(self.skype.conn.msgsHost, self.id),
                         auth=SkypeConnection.Auth.RegToken, params={"name": "consumptionhorizon"},
                         json={"consumptionhorizon": horizon})
@@ -486,11 +540,7 @@ class SkypeChats(SkypeObjs):
         Returns:
             :class:`SkypeChat` dict: collection of recent conversations keyed by their ID
         """
-        url = "{0}/users/ME/conversations".format(self.skype.conn.msgsHost)
-        params = {"startTime": 0,
-                  "view": "supportsExtendedHistory|msnp24Equivalent",
-                  "targetType": "Passport|Skype|Lync|Thread|Agent|ShortCircuit|PSTN|Flxt|NotificationStream|"
-                                "ModernBots|secureThreads|InviteFree"}
+        url, params = self.recentRequest()
         resp = self.skype.conn.syncStateCall("GET", url, params, auth=SkypeConnection.Auth.RegToken).json()
         chats = {}
         for json in resp.get("conversations", []):
@@ -498,6 +548,27 @@ class SkypeChats(SkypeObjs):
             chats[chat.id] = self.merge(chat)
         return chats
 
+    def streamRecent(self):
+        """
+        Retrieve the same selection of conversations as :meth:`recent`, but decode the response incrementally,
+        storing each conversation in the cache as it's read.
+
+        Returns:
+            generator: :class:`SkypeChat` objects, as cached
+        """
+        url, params = self.recentRequest()
+        for _, json in self.skype.conn.syncStateStream("GET", url, ("conversations",), params,
+                                                       auth=SkypeConnection.Auth.RegToken):
+            yield self.merge(SkypeChat.fromRaw(self.skype, json))
+
+    def recentRequest(self):
+        url = "{0}/users/ME/conversations".format(self.skype.conn.msgsHost)
+        params = {"startTime": 0,
+                  "view": "supportsExtendedHistory|msnp24Equivalent",
+                  "targetType": "Passport|Skype|Lync|Thread|Agent|ShortCircuit|PSTN|Flxt|NotificationStream|"
+                                "ModernBots|secureThreads|InviteFree"}
+        return url, params
+
     def chat(self, id):
         """
         Get a single conversation by identifier.
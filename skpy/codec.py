@@ -0,0 +1,114 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from .core import SkypeObj
+
+
+class SkypeJsonCodec(SkypeObj):
+    """
+    A JSON encoder and decoder for API request and response bodies, for use as :attr:`.SkypeConnection.codec`.
+
+    By default, the fastest installed library is used: :mod:`orjson`, then :mod:`ujson`, falling back to the standard
+    library via :mod:`requests`.  Set the ``SKPY_JSON`` environment variable to one of ``orjson``, ``ujson`` or
+    ``json`` to choose one explicitly.
+
+    Responses are decoded straight from their raw bytes, skipping the text decoding step made by
+    :meth:`requests.Response.json`.
+
+    Attributes:
+        name (str):
+            Name of the underlying library.
+        loads (method):
+            Function to parse a JSON document, given as :class:`bytes` or :class:`str`.
+        dumps (method):
+            Function to serialise an object, producing :class:`bytes` or :class:`str`.
+    """
+
+    attrs = ("name",)
+
+    def __init__(self, name, loads, dumps):
+        """
+        Create a new codec.
+
+        Args:
+            name (str): name of the underlying library
+            loads (method): function to parse a JSON document
+            dumps (method): function to serialise an object
+        """
+        super(SkypeJsonCodec, self).__init__()
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    @classmethod
+    def named(cls, name):
+        """
+        Create a codec for a specific library.
+
+        Args:
+            name (str): one of ``orjson``, ``ujson`` or ``json``
+
+        Returns:
+            SkypeJsonCodec: codec instance, or ``None`` if the library isn't installed
+        """
+        if name == "orjson" and orjson:
+            # Match the standard library's acceptance of non-string keys (e.g. integer IDs).
+            return cls("orjson", orjson.loads, lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+        elif name == "ujson" and ujson:
+            return cls("ujson", ujson.loads, lambda obj: ujson.dumps(obj, ensure_ascii=False))
+        elif name == "json":
+            return cls("json", json.loads, json.dumps)
+        return None
+
+    @classmethod
+    def default(cls):
+        """
+        Pick the codec to use for new connections, as described above.
+
+        Returns:
+            SkypeJsonCodec: codec instance, or ``None`` to leave encoding and decoding to :mod:`requests`
+        """
+        name = os.getenv("SKPY_JSON")
+        if name:
+            return None if name == "json" else cls.named(name)
+        return cls.named("orjson") or cls.named("ujson")
+
+    def decode(self, resp, **kwargs):
+        """
+        Parse the body of a response.  This replaces :meth:`requests.Response.json` on responses from connections using
+        this codec.
+
+        Args:
+            resp (requests.Response): response to parse
+
+        Returns:
+            object: decoded JSON content
+
+        Raises:
+            ValueError: if the body isn't valid JSON
+        """
+        return self.loads(resp.content)
+
+    def encodeRequest(self, headers, kwargs):
+        """
+        Replace a ``json`` argument for :func:`requests.request` with a body serialised by this codec.
+
+        Args:
+            headers (dict): request headers, which gain a ``Content-Type`` if not already set
+            kwargs (dict): request arguments, modified in place
+        """
+        if kwargs.get("json") is None or kwargs.get("data") is not None:
+            return
+        kwargs["data"] = self.dumps(kwargs.pop("json"))
+        if not any(key.lower() == "content-type" for key in headers):
+            headers["Content-Type"] = "application/json"
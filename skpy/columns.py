@@ -0,0 +1,204 @@
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .core import SkypeObj
+from .util import SkypeUtils
+from .replay import SkypeEventReplay
+
+
+class SkypeMsgColumns(SkypeObj):
+    """
+    A columnar store of message metadata, for analytics over large numbers of messages.
+
+    Raw messages from history pages or event logs are reduced to their arrival time, sender, conversation and type,
+    without creating any :class:`.SkypeMsg` objects.  Times are stored as 64-bit epoch milliseconds, and the other
+    columns are dictionary-encoded as 32-bit indices into lists of distinct values.
+
+    Columns are held in :class:`array.array` instances, and can be converted with :meth:`arrays` into NumPy arrays for
+    vectorised aggregation.  :meth:`save` writes them to Parquet if :mod:`pyarrow` is installed, or otherwise to a NumPy
+    ``.npz`` archive.
+
+    .. code-block:: python
+
+        cols = SkypeMsgColumns()
+        cols.addLog("events.log.gz")
+        data = cols.arrays()
+        perUser = numpy.bincount(data["user"])
+
+    Attributes:
+        times (array.array):
+            Arrival times in milliseconds since the epoch, or ``0`` if unknown.
+        users (array.array):
+            Sender of each message, as an index into :attr:`userIds`.
+        chats (array.array):
+            Conversation of each message, as an index into :attr:`chatIds`.
+        types (array.array):
+            Type of each message, as an index into :attr:`msgTypes`.
+        userIds (str list):
+            Distinct sender identifiers.
+        chatIds (str list):
+            Distinct conversation identifiers.
+        msgTypes (str list):
+            Distinct raw message types.
+    """
+
+    attrs = ("count",)
+
+    def __init__(self):
+        """
+        Create a new, empty store.
+        """
+        super(SkypeMsgColumns, self).__init__()
+        self.times = array.array("q")
+        self.users = array.array("i")
+        self.chats = array.array("i")
+        self.types = array.array("i")
+        self.userIds = []
+        self.chatIds = []
+        self.msgTypes = []
+        # Indices are keyed on the raw link, so each distinct URL is only parsed once.
+        self.userLinks = {}
+        self.chatLinks = {}
+        self.typeIndex = {}
+
+    @property
+    def count(self):
+        return len(self.times)
+
+    @staticmethod
+    def encode(index, values, key, value):
+        try:
+            return index[key]
+        except KeyError:
+            code = index[key] = len(values)
+            values.append(value)
+            return code
+
+    def add(self, raw):
+        """
+        Append a raw message.
+
+        Args:
+            raw (dict): raw message, as provided by the API
+        """
+        try:
+            stamp = SkypeUtils.parseTime(raw.get("originalarrivaltime"), SkypeUtils.TimeMode.Millis)
+        except ValueError:
+            stamp = 0
+        userLink = raw.get("from") or ""
+        chatLink = raw.get("conversationLink") or ""
+        msgType = raw.get("messagetype")
+        self.times.append(stamp)
+        self.users.append(self.encode(self.userLinks, self.userIds, userLink, SkypeUtils.userToId(userLink)))
+        self.chats.append(self.encode(self.chatLinks, self.chatIds, chatLink, SkypeUtils.chatToId(chatLink)))
+        self.types.append(self.encode(self.typeIndex, self.msgTypes, msgType, msgType))
+
+    def addEvent(self, raw):
+        """
+        Append the message from a raw event, if it's a ``NewMessage`` event.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+        """
+        if raw.get("resourceType") == "NewMessage":
+            self.add(raw.get("resource", {}))
+
+    def addLog(self, path):
+        """
+        Append all messages from a log written by :class:`.SkypeEventRecorder`.
+
+        Args:
+            path (str): location of the log file
+        """
+        for _, raw in SkypeEventReplay.readLog(path):
+            self.addEvent(raw)
+
+    def addHistory(self, chat, pages=None):
+        """
+        Append messages from a conversation's history, using :meth:`.SkypeChat.iterRawMsgs` so that only one message
+        is held at a time.
+
+        History is read from the latest messages with its own paging, so the position of :meth:`.SkypeChat.getMsgs`
+        isn't affected.
+
+        Args:
+            chat (.SkypeChat): conversation to read from
+            pages (int): maximum number of pages to read, or ``None`` to read until no more messages are returned
+        """
+        states = []
+        page = 0
+        while pages is None or page < pages:
+            count = self.count
+            seen = len(states)
+            for raw in chat.iterRawMsgs(states):
+                self.add(raw)
+            # Stop on an empty page, or one without a link to the next, which would just be fetched again.
+            if self.count == count or len(states) == seen:
+                break
+            page += 1
+
+    def arrays(self):
+        """
+        Convert the columns to NumPy arrays, or plain copies of the columns if NumPy isn't available.
+
+        Returns:
+            dict: ``time`` (int64), ``user``, ``chat`` and ``type`` (int32) columns, and ``userIds``, ``chatIds`` and
+            ``msgTypes`` dictionaries
+        """
+        if numpy:
+            columns = {"time": numpy.frombuffer(self.times, dtype=numpy.int64).copy(),
+                       "user": numpy.frombuffer(self.users, dtype=numpy.int32).copy(),
+                       "chat": numpy.frombuffer(self.chats, dtype=numpy.int32).copy(),
+                       "type": numpy.frombuffer(self.types, dtype=numpy.int32).copy()}
+        else:
+            columns = {"time": array.array("q", self.times),
+                       "user": array.array("i", self.users),
+                       "chat": array.array("i", self.chats),
+                       "type": array.array("i", self.types)}
+        columns.update({"userIds": list(self.userIds),
+                        "chatIds": list(self.chatIds),
+                        "msgTypes": list(self.msgTypes)})
+        return columns
+
+    def save(self, path):
+        """
+        Write the columns to disk: as a Parquet file with dictionary-encoded columns if :mod:`pyarrow` is installed,
+        otherwise as a NumPy ``.npz`` archive.
+
+        Args:
+            path (str): location of the output file
+
+        Returns:
+            str: format written, either ``parquet`` or ``npz``
+
+        Raises:
+            RuntimeError: if neither :mod:`pyarrow` nor :mod:`numpy` is installed
+        """
+        if pyarrow:
+            def dictionary(codes, values):
+                return pyarrow.DictionaryArray.from_arrays(pyarrow.array(codes, type=pyarrow.int32()),
+                                                           pyarrow.array(values, type=pyarrow.string()))
+            table = pyarrow.table({"time": pyarrow.array(self.times, type=pyarrow.timestamp("ms", tz="UTC")),
+                                   "user": dictionary(self.users, self.userIds),
+                                   "chat": dictionary(self.chats, self.chatIds),
+                                   "type": dictionary(self.types, self.msgTypes)})
+            pyarrow.parquet.write_table(table, path)
+            return "parquet"
+        elif numpy:
+            columns = self.arrays()
+            for key in ("userIds", "chatIds", "msgTypes"):
+                columns[key] = numpy.array([value or "" for value in columns[key]], dtype=str)
+            with open(path, "wb") as f:
+                numpy.savez(f, **columns)
+            return "npz"
+        raise RuntimeError("Columnar export requires pyarrow or numpy")
@@ -1,19 +1,43 @@
 import base64
+import contextlib
 import functools
 import hashlib
+import heapq
 import os
 import re
+import threading
 import time
 from datetime import datetime, timedelta
-from pprint import pformat
 from types import MethodType
-from xml.etree import ElementTree
 
 import requests
-from bs4 import BeautifulSoup
 
 from .core import SkypeApiException, SkypeAuthException, SkypeEnum, SkypeObj, SkypeRateLimitException, \
                   SkypeTokenException
+from .codec import SkypeJsonCodec
+from .stream import SkypeJsonStream
+from .tokens import SkypeFileTokenStore, SkypeTokenManager
+
+
+class SkypeLazySession(object):
+    """
+    Descriptor: a :class:`requests.Session` shared by a class, created on first access rather than at import time.
+
+    The session's ``User-Agent`` header is taken from the owning class's ``USER_AGENT`` attribute.
+    """
+
+    def __init__(self):
+        self.sess = None
+        self.lock = threading.Lock()
+
+    def __get__(self, obj, owner):
+        if self.sess is None:
+            with self.lock:
+                if self.sess is None:
+                    sess = requests.Session()
+                    sess.headers["User-Agent"] = owner.USER_AGENT
+                    self.sess = sess
+        return self.sess
 
 
 class SkypeConnection(SkypeObj):
@@ -30,12 +54,27 @@ class SkypeConnection(SkypeObj):
             Map from token key to :class:`datetime <datetime.datetime>` of expiry.
         tokenFile (str):
             Path to file holding token data for the current session.
+        tokenStore (:class:`.SkypeTokenStore`):
+            Shared storage for token data, set by :meth:`setTokenFile` or :meth:`setTokenStore`.
+        tokenLock (threading.RLock):
+            Lock held whilst tokens are being refreshed, so that concurrent callers wait for a single refresh.
+        tokenManager (:class:`.SkypeTokenManager`):
+            Background token refresher, if enabled with :meth:`startTokenRefresh`.
+        instruments (:class:`.SkypeInstrument` list):
+            Observers of API requests made by this connection, managed with :meth:`addInstrument`.
+        extInstruments (:class:`.SkypeInstrument` list):
+            Observers of API requests made by :meth:`externalCall`, shared by all connections.
         msgsHost (str):
             Derived API base URL during registration token retrieval.
         sess (requests.Session):
             Shared session used for all API requests.
         endpoints (dict):
             Container of :class:`SkypeEndpoint` instances for the current session.
+        acks (:class:`.SkypeAckBatcher`):
+            If set, sends event acknowledgements and consumption horizons in the background, merging repeats.
+        codec (:class:`.SkypeJsonCodec`):
+            Encoder and decoder of JSON request and response bodies, shared by all connections unless overridden, or
+            ``None`` to use :mod:`requests`.  See :meth:`.SkypeJsonCodec.default` for how this is chosen.
         connected (bool):
             Whether the connection instance is ready to make API calls.
         guest (bool):
@@ -78,11 +117,17 @@ class SkypeConnection(SkypeObj):
                 except SkypeApiException as e:
                     if isinstance(e.args[1], requests.Response) and e.args[1].status_code in codes:
                         conn = self if isinstance(self, SkypeConnection) else self.conn
+                        if conn.instruments:
+                            conn.notifyInstruments("retry", e)
                         if regToken:
                             conn.getRegToken()
                         if subscribe:
                             conn.endpoints[subscribe].subscribe()
-                        return fn(self, *args, **kwargs)
+                        conn.retryState.retries = getattr(conn.retryState, "retries", 0) + 1
+                        try:
+                            return fn(self, *args, **kwargs)
+                        finally:
+                            conn.retryState.retries -= 1
                     raise
             return wrapper
 
@@ -109,19 +154,22 @@ class SkypeConnection(SkypeObj):
             .SkypeAuthException: if an authentication rate limit is reached
             .SkypeApiException: if a successful status code is not received
         """
+        if cls.codec:
+            kwargs["headers"] = dict(kwargs.get("headers") or {})
+            cls.codec.encodeRequest(kwargs["headers"], kwargs)
+        instruments = cls.extInstruments
         if os.getenv("SKPY_DEBUG_HTTP"):
-            print("<= [{0}] {1} {2}".format(datetime.now().strftime("%d/%m %H:%M:%S"), method, url))
-            print(pformat(kwargs))
-        resp = cls.extSess.request(method, url, **kwargs)
-        if os.getenv("SKPY_DEBUG_HTTP"):
-            print("=> [{0}] {1}".format(datetime.now().strftime("%d/%m %H:%M:%S"), resp.status_code))
-            print(pformat(dict(resp.headers)))
-            try:
-                print(pformat(resp.json()))
-            except ValueError:
-                print(resp.text)
+            from .metrics import SkypeDebugInstrument
+            instruments = SkypeDebugInstrument.attach(instruments)
+        if instruments:
+            from .metrics import SkypeApiCall
+            resp = SkypeApiCall.perform(instruments, cls.extSess.request, method, url, codes, **kwargs)
+        else:
+            resp = cls.extSess.request(method, url, **kwargs)
         if resp.status_code not in codes:
             raise SkypeApiException("{0} response from {1} {2}".format(resp.status_code, method, url), resp)
+        if cls.codec:
+            resp.json = MethodType(cls.codec.decode, resp)
         return resp
 
     API_LOGIN = "https://login.skype.com/login"
@@ -153,8 +201,9 @@ class SkypeConnection(SkypeObj):
 
     attrs = ("userId", "tokenFile", "connected", "guest")
 
-    extSess = requests.Session()
-    extSess.headers["User-Agent"] = USER_AGENT
+    extSess = SkypeLazySession()
+    extInstruments = []
+    codec = SkypeJsonCodec.default()
 
     def __init__(self):
         """
@@ -164,12 +213,18 @@ class SkypeConnection(SkypeObj):
         self.tokens = {}
         self.tokenExpiry = {}
         self.tokenFile = None
+        self.tokenStore = None
+        self.tokenLock = threading.RLock()
+        self.tokenManager = None
         self.hasUserPwd = False
         self.msgsHost = self.API_MSGSHOST
         self.sess = requests.Session()
         self.sess.headers["User-Agent"] = self.USER_AGENT
         self.endpoints = {"self": SkypeEndpoint(self, "SELF")}
         self.syncStates = {}
+        self.acks = None
+        self.instruments = []
+        self.retryState = threading.local()
 
     @property
     def connected(self):
@@ -223,33 +278,67 @@ class SkypeConnection(SkypeObj):
         self.verifyToken(auth)
         if not headers:
             headers = {}
-        debugHeaders = dict(headers)
         if auth == self.Auth.SkypeToken:
             headers["X-SkypeToken"] = self.tokens["skype"]
-            debugHeaders["X-SkypeToken"] = "***"
         elif auth == self.Auth.Authorize:
             headers["Authorization"] = "skype_token {0}".format(self.tokens["skype"])
-            debugHeaders["Authorization"] = "***"
         elif auth == self.Auth.RegToken:
             headers["RegistrationToken"] = self.tokens["reg"]
-            debugHeaders["RegistrationToken"] = "***"
-        if os.getenv("SKPY_DEBUG_HTTP"):
-            print("<= [{0}] {1} {2}".format(datetime.now().strftime("%d/%m %H:%M:%S"), method, url))
-            print(pformat(dict(kwargs, headers=debugHeaders)))
-        resp = self.sess.request(method, url, headers=headers, **kwargs)
+        codec = self.codec
+        if codec:
+            codec.encodeRequest(headers, kwargs)
+        instruments = self.instruments
         if os.getenv("SKPY_DEBUG_HTTP"):
-            print("=> [{0}] {1}".format(datetime.now().strftime("%d/%m %H:%M:%S"), resp.status_code))
-            print(pformat(dict(resp.headers)))
-            try:
-                print(pformat(resp.json()))
-            except ValueError:
-                print(resp.text)
+            # Instrumentation is only loaded when in use, to keep it out of the import time of the package.
+            from .metrics import SkypeDebugInstrument
+            instruments = SkypeDebugInstrument.attach(instruments)
+        if instruments:
+            from .metrics import SkypeApiCall
+            resp = SkypeApiCall.perform(instruments, self.sess.request, method, url, codes, auth=auth,
+                                        retries=getattr(self.retryState, "retries", 0), headers=headers, **kwargs)
+        else:
+            resp = self.sess.request(method, url, headers=headers, **kwargs)
         if resp.status_code not in codes:
             if resp.status_code == 429:
                 raise SkypeRateLimitException("Rate limit exceeded", resp)
             raise SkypeApiException("{0} response from {1} {2}".format(resp.status_code, method, url), resp)
+        if codec:
+            resp.json = MethodType(codec.decode, resp)
         return resp
 
+    def addInstrument(self, instrument):
+        """
+        Start notifying an instrument of API requests made by this connection.
+
+        Args:
+            instrument (.SkypeInstrument): instrument to add
+
+        Returns:
+            .SkypeInstrument: the same instrument, for chaining
+        """
+        self.instruments = self.instruments + [instrument]
+        return instrument
+
+    def removeInstrument(self, instrument):
+        """
+        Stop notifying an instrument previously added with :meth:`addInstrument`.
+
+        Args:
+            instrument (.SkypeInstrument): instrument to remove
+        """
+        self.instruments = [inst for inst in self.instruments if inst is not instrument]
+
+    def notifyInstruments(self, hook, *args):
+        """
+        Call a hook method on each instrument of this connection.
+
+        Args:
+            hook (str): name of the :class:`.SkypeInstrument` method to call
+            args (list): arguments to pass to the hook
+        """
+        for inst in self.instruments:
+            getattr(inst, hook)(*args)
+
     def syncStateCall(self, method, url, params={}, **kwargs):
         """
         Follow and track sync state URLs provided by an API endpoint, in order to implicitly handle pagination.
@@ -263,14 +352,7 @@ class SkypeConnection(SkypeObj):
             params (dict): query parameters to include in the URL
             kwargs (dict): any extra parameters to pass to :meth:`__call__`
         """
-        try:
-            states = self.syncStates[(method, url)]
-        except KeyError:
-            states = self.syncStates[(method, url)] = []
-        if states:
-            # We have a state link, use it to replace the URL and query string.
-            url = states[-1]
-            params = {}
+        states, url, params = self.syncState(method, url, params)
         resp = self(method, url, params=params, **kwargs)
         try:
             json = resp.json()
@@ -284,6 +366,57 @@ class SkypeConnection(SkypeObj):
                 states.append(state)
         return resp
 
+    def syncStateStream(self, method, url, keys, params={}, states=None, **kwargs):
+        """
+        Like :meth:`syncStateCall`, but stream the response with a :class:`.SkypeJsonStream`, yielding each item of
+        the arrays under the given keys as it's decoded.  The sync state is stored once the response has been read.
+
+        Args:
+            method (str): HTTP request method
+            url (str): full URL to connect to
+            keys (str list): top-level keys whose arrays are to be streamed
+            params (dict): query parameters to include in the URL
+            states (list): state links to page with, instead of those shared by all calls to the endpoint
+            kwargs (dict): any extra parameters to pass to :meth:`__call__`
+
+        Returns:
+            generator: (``key``, ``item``) pairs from :class:`.SkypeJsonStream`
+        """
+        states, url, params = self.syncState(method, url, params, states)
+        resp = self(method, url, params=params, stream=True, **kwargs)
+        try:
+            stream = SkypeJsonStream(resp.iter_content(SkypeJsonStream.chunkSize), keys)
+            for pair in stream:
+                yield pair
+        finally:
+            resp.close()
+        state = stream.rest.get("_metadata", {}).get("syncState")
+        if state:
+            states.append(state)
+
+    def syncState(self, method, url, params, states=None):
+        """
+        Find the sync state for an API endpoint, and the URL and query parameters to use for its next call.
+
+        Args:
+            method (str): HTTP request method
+            url (str): initial URL of the endpoint
+            params (dict): query parameters for the initial URL
+            states (list): separate state links to use, instead of those in :attr:`syncStates`
+
+        Returns:
+            (list, str, dict) tuple: state links seen so far (to be appended to), URL, and query parameters
+        """
+        if states is None:
+            try:
+                states = self.syncStates[(method, url)]
+            except KeyError:
+                states = self.syncStates[(method, url)] = []
+        if states:
+            # We have a state link, use it to replace the URL and query string.
+            return states, states[-1], {}
+        return states, url, params
+
     def setTokenFile(self, path):
         """
         Enable reading and writing session tokens to a file at the given location.
@@ -292,6 +425,29 @@ class SkypeConnection(SkypeObj):
             path (str): path to file used for token storage
         """
         self.tokenFile = path
+        self.setTokenStore(SkypeFileTokenStore(path))
+
+    def setTokenStore(self, store):
+        """
+        Enable reading and writing session tokens to a shared store.
+
+        Connections sharing a store take turns to refresh tokens: whilst one holds the store's lock to acquire new
+        tokens, the others wait, then use the newly stored tokens instead of requesting their own.
+
+        Args:
+            store (.SkypeTokenStore): storage backend for token data
+        """
+        self.tokenStore = store
+        store.subscribe(self.readStoredTokens)
+
+    def tokenStoreLock(self):
+        """
+        Acquire the token store's lock, if a store is in use.
+
+        Returns:
+            context manager: lock for use in a ``with`` statement
+        """
+        return self.tokenStore.lock() if self.tokenStore else contextlib.nullcontext()
 
     def readTokenFromStr(self, tokens):
         """
@@ -305,13 +461,7 @@ class SkypeConnection(SkypeObj):
         Raises:
             .SkypeAuthException: if the token string cannot be used to authenticate
         """
-        lines = tokens.splitlines()
-        try:
-            user, skypeToken, skypeExpiry, regToken, regExpiry, msgsHost = lines
-            skypeExpiry = datetime.fromtimestamp(int(skypeExpiry))
-            regExpiry = datetime.fromtimestamp(int(regExpiry))
-        except ValueError:
-            raise SkypeTokenException("Token file is malformed")
+        user, skypeToken, skypeExpiry, regToken, regExpiry, msgsHost = self.parseTokenStr(tokens)
         if datetime.now() >= skypeExpiry:
             raise SkypeTokenException("Token file has expired")
         self.userId = user
@@ -324,6 +474,30 @@ class SkypeConnection(SkypeObj):
         else:
             self.getRegToken()
 
+    @staticmethod
+    def parseTokenStr(tokens):
+        """
+        Split a token string into its component parts.
+
+        Args:
+            tokens (str): string containing tokens
+
+        Returns:
+            (str, str, datetime.datetime, str, datetime.datetime, str) tuple: user identifier, Skype token and expiry,
+                                                                              registration token and expiry, and
+                                                                              messenger hostname
+
+        Raises:
+            .SkypeTokenException: if the token string is malformed
+        """
+        try:
+            user, skypeToken, skypeExpiry, regToken, regExpiry, msgsHost = tokens.splitlines()
+            skypeExpiry = datetime.fromtimestamp(int(skypeExpiry))
+            regExpiry = datetime.fromtimestamp(int(regExpiry))
+        except ValueError:
+            raise SkypeTokenException("Token file is malformed")
+        return user, skypeToken, skypeExpiry, regToken, regExpiry, msgsHost
+
     def readToken(self):
         """
         Attempt to re-establish a connection using previously acquired tokens.
@@ -333,14 +507,51 @@ class SkypeConnection(SkypeObj):
         Raises:
             .SkypeAuthException: if the token file cannot be used to authenticate
         """
-        if not self.tokenFile:
+        if not self.tokenStore:
             raise SkypeTokenException("No token file specified")
+        with self.tokenStoreLock():
+            tokens = self.tokenStore.read()
+            if tokens is None:
+                raise SkypeTokenException("Token file doesn't exist or not readable")
+            self.readTokenFromStr(tokens)
+
+    def readStoredTokens(self):
+        """
+        Adopt any valid tokens from the token store that differ from those currently in use, e.g. if another process
+        sharing the store has refreshed them.
+
+        Only tokens for the connected user are used, and a Skype token is only replaced by one that expires later, so
+        that a token just obtained by logging in isn't swapped for an older one.  A connection without a Skype token
+        may adopt the stored user.
+
+        Returns:
+            bool: whether any new tokens were taken from the store
+        """
+        tokens = self.tokenStore.read() if self.tokenStore else None
+        if not tokens:
+            return False
         try:
-            with open(self.tokenFile, "r") as f:
-                tokens = f.read()
-        except OSError:
-            raise SkypeTokenException("Token file doesn't exist or not readable")
-        self.readTokenFromStr(tokens)
+            user, skypeToken, skypeExpiry, regToken, regExpiry, msgsHost = self.parseTokenStr(tokens)
+        except SkypeTokenException:
+            return False
+        changed = False
+        with self.tokenLock:
+            if not (user == self.userId if self.userId else not self.tokens.get("skype")):
+                return False
+            now = datetime.now()
+            currentExpiry = self.tokenExpiry.get("skype") if self.tokens.get("skype") else None
+            if (not skypeToken == self.tokens.get("skype") and now < skypeExpiry and
+                    (currentExpiry is None or currentExpiry < skypeExpiry)):
+                self.userId = user
+                self.tokens["skype"] = skypeToken
+                self.tokenExpiry["skype"] = skypeExpiry
+                changed = True
+            if not regToken == self.tokens.get("reg") and now < regExpiry:
+                self.tokens["reg"] = regToken
+                self.tokenExpiry["reg"] = regExpiry
+                self.msgsHost = msgsHost
+                changed = True
+        return changed
 
     def writeTokenToStr(self):
         """
@@ -366,11 +577,7 @@ class SkypeConnection(SkypeObj):
 
         This can be used by :meth:`readToken` to re-authenticate at a later time.
         """
-        # Write token file privately.
-        with os.fdopen(os.open(self.tokenFile, os.O_WRONLY | os.O_CREAT, 0o600), "w") as f:
-            # When opening files via os, truncation must be done manually.
-            f.truncate()
-            f.write(self.writeTokenToStr())
+        self.tokenStore.write(self.writeTokenToStr())
 
     def verifyToken(self, auth):
         """
@@ -383,14 +590,49 @@ class SkypeConnection(SkypeObj):
             .SkypeAuthException: if Skype auth is required, and the current token has expired and can't be renewed
         """
         if auth in (self.Auth.SkypeToken, self.Auth.Authorize):
-            if "skype" not in self.tokenExpiry or datetime.now() >= self.tokenExpiry["skype"]:
+            key = "skype"
+        elif auth == self.Auth.RegToken:
+            key = "reg"
+        else:
+            return
+        if key in self.tokenExpiry and datetime.now() < self.tokenExpiry[key]:
+            return
+        with self.tokenLock, self.tokenStoreLock():
+            # Another thread or process may have completed a refresh whilst we were waiting for the lock.
+            self.readStoredTokens()
+            if key in self.tokenExpiry and datetime.now() < self.tokenExpiry[key]:
+                return
+            if key == "skype":
                 if not hasattr(self, "getSkypeToken"):
                     raise SkypeTokenException("Skype token expired, and no password specified")
+                if self.instruments:
+                    self.notifyInstruments("authRefresh", "skype")
                 self.getSkypeToken()
-        elif auth == self.Auth.RegToken:
-            if "reg" not in self.tokenExpiry or datetime.now() >= self.tokenExpiry["reg"]:
+            else:
                 self.getRegToken()
 
+    def startTokenRefresh(self, margin=timedelta(minutes=10)):
+        """
+        Refresh tokens in the background shortly before they expire, rather than on the next API call afterwards.
+
+        Args:
+            margin (datetime.timedelta): how long before expiry to start a refresh
+
+        Returns:
+            .SkypeTokenManager: the running token manager
+        """
+        if not self.tokenManager:
+            self.tokenManager = SkypeTokenManager(self, margin)
+        self.tokenManager.margin = margin
+        return self.tokenManager.start()
+
+    def stopTokenRefresh(self):
+        """
+        Stop any background token refreshes started by :meth:`startTokenRefresh`.
+        """
+        if self.tokenManager:
+            self.tokenManager.stop()
+
     def skypeTokenClosure(self, method, *args, **kwargs):
         """
         Replace the stub :meth:`getSkypeToken` method with one that connects using the given credentials.  Avoids
@@ -500,6 +742,8 @@ class SkypeConnection(SkypeObj):
             .SkypeAuthException: if the login request is rejected
             .SkypeApiException: if the login form can't be processed
         """
+        if self.instruments:
+            self.notifyInstruments("authRefresh", "skype")
         self.tokens["skype"], self.tokenExpiry["skype"] = SkypeRefreshAuthProvider(self).auth(self.tokens["skype"])
         self.getRegToken()
 
@@ -515,18 +759,31 @@ class SkypeConnection(SkypeObj):
         Acquire a new registration token.
 
         Once successful, all tokens and expiry times are written to the token file (if specified on initialisation).
-        """
-        self.verifyToken(self.Auth.SkypeToken)
-        token, expiry, msgsHost, endpoint = SkypeRegistrationTokenProvider(self).auth(self.tokens["skype"])
-        self.tokens["reg"] = token
-        self.tokenExpiry["reg"] = expiry
-        self.msgsHost = msgsHost
+
+        When sharing a token store, if another process has replaced the registration token since this connection last
+        read it, the stored token is used instead of registering a new one, along with the most recent endpoint.
+        """
+        with self.tokenLock, self.tokenStoreLock():
+            oldToken = self.tokens.get("reg")
+            stored = self.readStoredTokens() and not self.tokens.get("reg") == oldToken
+            endpoint = None
+            if not stored:
+                self.verifyToken(self.Auth.SkypeToken)
+                if self.instruments:
+                    self.notifyInstruments("authRefresh", "reg")
+                token, expiry, msgsHost, endpoint = SkypeRegistrationTokenProvider(self).auth(self.tokens["skype"])
+                self.tokens["reg"] = token
+                self.tokenExpiry["reg"] = expiry
+                self.msgsHost = msgsHost
+                if self.tokenStore:
+                    self.writeToken()
+        self.syncEndpoints()
+        if stored and self.endpoints["all"]:
+            # Stored tokens don't name the endpoint they were registered with, so use the most recent one listed.
+            endpoint = self.endpoints["all"][0]
         if endpoint:
             endpoint.config()
             self.endpoints["main"] = endpoint
-        self.syncEndpoints()
-        if self.tokenFile:
-            self.writeToken()
 
     def syncEndpoints(self):
         """
@@ -560,6 +817,21 @@ class SkypeAuthProvider(SkypeObj):
         """
         raise NotImplementedError
 
+    @staticmethod
+    def parseHtml(text):
+        """
+        Parse an HTML login page.  :mod:`bs4` is only imported on first use, as it's slow to load and not needed once
+        connected.
+
+        Args:
+            text (str): page content
+
+        Returns:
+            bs4.BeautifulSoup: parsed document
+        """
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(text, "html.parser")
+
 
 class SkypeAPIAuthProvider(SkypeAuthProvider):
     """
@@ -649,7 +921,7 @@ class SkypeLiveAuthProvider(SkypeAuthProvider):
             return self.getToken(ex.t)
 
     def check(self, resp):
-        page = BeautifulSoup(resp.text, "html.parser")
+        page = self.parseHtml(resp.text)
         # Look for the 't' value we need to exchange for a Skype token, which might turn up at any stage.
         tField = page.find(id="t")
         if tField is not None:
@@ -711,7 +983,7 @@ class SkypeLiveAuthProvider(SkypeAuthProvider):
                               params={"client_id": "578134", "redirect_uri": "https://web.skype.com"},
                               data={"t": t, "client_id": "578134", "oauthPartner": "999",
                                     "site_name": "lw.skype.com", "redirect_uri": "https://web.skype.com"})
-        loginPage = BeautifulSoup(loginResp.text, "html.parser")
+        loginPage = self.parseHtml(loginResp.text)
         # Collect the Skype token, and expiry if present.
         tokenField = loginPage.find("input", {"name": "skypetoken"})
         if not tokenField:
@@ -788,6 +1060,7 @@ class SkypeSOAPAuthProvider(SkypeAuthProvider):
     def getSecToken(self, user, pwd):
         loginResp = self.conn("POST", "{0}/RST.srf".format(SkypeConnection.API_MSACC),
                               data=self.template.format(self.encode(user), self.encode(pwd)))
+        from xml.etree import ElementTree
         loginData = ElementTree.fromstring(loginResp.text)
         token = None
         for node in loginData.iter():
@@ -894,7 +1167,7 @@ class SkypeRefreshAuthProvider(SkypeAuthProvider):
         loginResp = self.conn("GET", "{0}/login".format(SkypeConnection.API_LOGIN),
                               params={"client_id": "578134", "redirect_uri": "https://web.skype.com"},
                               cookies={"refresh-token": token})
-        tField = BeautifulSoup(loginResp.text, "html.parser").find(id="t")
+        tField = self.parseHtml(loginResp.text).find(id="t")
         if tField is None:
             err = re.search(r"sErrTxt:'([^'\\]*(\\.[^'\\]*)*)'", loginResp.text)
             errMsg = "Couldn't retrieve t field from login response"
@@ -909,7 +1182,7 @@ class SkypeRefreshAuthProvider(SkypeAuthProvider):
                               params={"client_id": "578134", "redirect_uri": "https://web.skype.com"},
                               data={"t": t, "client_id": "578134", "oauthPartner": "999",
                                     "site_name": "lw.skype.com", "redirect_uri": "https://web.skype.com"})
-        loginPage = BeautifulSoup(loginResp.text, "html.parser")
+        loginPage = self.parseHtml(loginResp.text)
         # Collect the Skype token, and expiry if present.
         tokenField = loginPage.find("input", {"name": "skypetoken"})
         if not tokenField:
@@ -1086,7 +1359,10 @@ class SkypeEndpoint(SkypeObj):
         self.conn = conn
         self.id = id
         self.subscribed = False
+        # Incremented on each (re-)subscription, so that consumers can detect gaps in the event stream.
+        self.subscriptions = 0
         self.subscribedPresence = False
+        self.presenceIds = set()
 
     def config(self, name="skype"):
         """
@@ -1118,6 +1394,20 @@ class SkypeEndpoint(SkypeObj):
         self.conn("POST", "{0}/users/ME/endpoints/{1}/active".format(self.conn.msgsHost, self.id),
                   auth=SkypeConnection.Auth.RegToken, json={"timeout": timeout})
 
+    def keepAlive(self, scheduler=None):
+        """
+        Ping this endpoint periodically in the background, re-registering and re-subscribing if it lapses.
+
+        Args:
+            scheduler (SkypeEndpointScheduler): scheduler to add to, defaults to the shared instance
+
+        Returns:
+            SkypeEndpointScheduler: the running scheduler
+        """
+        scheduler = scheduler or SkypeEndpointScheduler.shared()
+        scheduler.add(self)
+        return scheduler.start()
+
     def subscribe(self):
         """
         Subscribe to contact and conversation events.  These are accessible through :meth:`getEvents`.
@@ -1128,25 +1418,89 @@ class SkypeEndpoint(SkypeObj):
                         "channelType": "HttpLongPoll",
                         "conversationType": 2047})
         self.subscribed = True
+        self.subscriptions += 1
 
-    def subscribePresence(self, contacts):
+    def subscribePresence(self, contacts, chunkSize=100):
         """
         Enable presence subscriptions for the authenticated user's contacts.
 
+        Rather than listing every contact as a resource of the subscription, the subscription covers all contacts, and
+        the contacts themselves are registered with the messaging service in batches.
+
         Args:
             contacts (.SkypeContacts): contact list to select user IDs
+            chunkSize (int): maximum number of contacts to register per request
         """
         if not self.subscribed:
             self.subscribe()
-        resources = list(self.resources)
-        for contact in contacts:
-            resources.append("/v1/users/ME/contacts/8:{}".format(contact.id))
+        self.subscribeAllContacts()
+        self.presenceIds = set()
+        self.syncPresence([contact.id for contact in contacts], chunkSize)
+
+    def subscribeAllContacts(self):
+        """
+        Extend the current subscription to cover presence events from all registered contacts.
+        """
         self.conn("PUT", "{0}/users/ME/endpoints/{1}/subscriptions/0".format(self.conn.msgsHost, self.id),
                   auth=SkypeConnection.Auth.RegToken,
                   params={"name": "interestedResources"},
-                  json={"interestedResources": resources})
+                  json={"interestedResources": self.resources + ["/v1/users/ME/contacts/ALL"]})
         self.subscribedPresence = True
 
+    def resubscribe(self, chunkSize=100):
+        """
+        Restore subscriptions after the endpoint has lapsed: events, and if previously enabled, presence for the same
+        users as before.
+
+        Args:
+            chunkSize (int): maximum number of contacts to register per request
+        """
+        self.subscribe()
+        if self.subscribedPresence:
+            ids = self.presenceIds
+            self.subscribeAllContacts()
+            self.presenceIds = set()
+            self.addPresence(ids, chunkSize)
+
+    def syncPresence(self, ids, chunkSize=100):
+        """
+        Update presence subscriptions to cover exactly the given users, adding and removing only what has changed.
+
+        Args:
+            ids (str list): user identifiers to subscribe to
+            chunkSize (int): maximum number of contacts to register per request
+        """
+        ids = set(ids)
+        self.addPresence(ids - self.presenceIds, chunkSize)
+        self.removePresence(self.presenceIds - ids)
+
+    def addPresence(self, ids, chunkSize=100):
+        """
+        Subscribe to presence for additional users.
+
+        Args:
+            ids (str list): user identifiers to subscribe to
+            chunkSize (int): maximum number of contacts to register per request
+        """
+        ids = sorted(set(ids) - self.presenceIds)
+        for i in range(0, len(ids), chunkSize):
+            chunk = ids[i:i + chunkSize]
+            self.conn("POST", "{0}/users/ME/contacts".format(self.conn.msgsHost), auth=SkypeConnection.Auth.RegToken,
+                      json={"contacts": [{"id": "8:{0}".format(id)} for id in chunk]})
+            self.presenceIds.update(chunk)
+
+    def removePresence(self, ids):
+        """
+        Unsubscribe from presence for the given users.
+
+        Args:
+            ids (str list): user identifiers to unsubscribe from
+        """
+        for id in sorted(set(ids) & self.presenceIds):
+            self.conn("DELETE", "{0}/users/ME/contacts/8:{1}".format(self.conn.msgsHost, id),
+                      auth=SkypeConnection.Auth.RegToken)
+            self.presenceIds.discard(id)
+
     def getEvents(self):
         """
         Retrieve a list of events since the last poll.  Multiple calls may be needed to retrieve all events.
@@ -1162,3 +1516,204 @@ class SkypeEndpoint(SkypeObj):
             self.subscribe()
         return self.conn("POST", "{0}/users/ME/endpoints/{1}/subscriptions/0/poll".format(self.conn.msgsHost, self.id),
                          auth=SkypeConnection.Auth.RegToken).json().get("eventMessages", [])
+
+
+class SkypeEndpointScheduler(SkypeObj):
+    """
+    A single background thread that keeps any number of endpoints alive, across all connections.
+
+    Each endpoint is pinged every :attr:`interval` seconds.  A ping rejected with a 404 means the endpoint has lapsed,
+    in which case a new registration token is acquired and the endpoint re-subscribed (see
+    :meth:`SkypeEndpoint.resubscribe`), ahead of the next poll for events.
+
+    Attributes:
+        interval (int):
+            Number of seconds between pings for each endpoint.
+        timeout (int):
+            Activity timeout sent with each ping, see :meth:`.SkypeEndpoint.ping`.
+        stats (dict):
+            Counters of ``pings``, ``failures``, ``lapses`` and ``recoveries`` across all endpoints.
+        endpointStats (dict):
+            The same counters per endpoint, plus ``lastPing`` and ``lastLapse`` times, keyed by endpoint.
+    """
+
+    attrs = ("interval", "timeout", "running")
+
+    instance = None
+
+    @classmethod
+    def shared(cls):
+        """
+        Retrieve the process-wide scheduler, creating it if needed.
+
+        Returns:
+            SkypeEndpointScheduler: shared scheduler instance
+        """
+        if not cls.instance:
+            cls.instance = cls()
+        return cls.instance
+
+    def __init__(self, interval=30, timeout=60):
+        """
+        Create a new scheduler.  Nothing is pinged until :meth:`start` is called.
+
+        Args:
+            interval (int): number of seconds between pings for each endpoint
+            timeout (int): activity timeout sent with each ping
+        """
+        super(SkypeEndpointScheduler, self).__init__()
+        self.interval = interval
+        self.timeout = timeout
+        self.stats = {"pings": 0, "failures": 0, "lapses": 0, "recoveries": 0}
+        self.endpointStats = {}
+        self.queue = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    @property
+    def running(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    def add(self, endpoint):
+        """
+        Start keeping an endpoint alive.  The first ping is sent straight away.
+
+        Args:
+            endpoint (SkypeEndpoint): endpoint to keep alive
+        """
+        with self.cond:
+            if endpoint in self.endpointStats:
+                return
+            self.endpointStats[endpoint] = {"pings": 0, "failures": 0, "lapses": 0, "recoveries": 0,
+                                            "lastPing": None, "lastLapse": None}
+            self.push(endpoint, time.time())
+
+    def remove(self, endpoint):
+        """
+        Stop keeping an endpoint alive.
+
+        Args:
+            endpoint (SkypeEndpoint): endpoint to drop from the schedule
+        """
+        with self.cond:
+            self.endpointStats.pop(endpoint, None)
+            self.queue = [item for item in self.queue if item[2] is not endpoint]
+            heapq.heapify(self.queue)
+
+    def replace(self, old, new):
+        """
+        Swap a re-registered endpoint into the schedule in place of the one it replaces, keeping its counters.
+
+        Args:
+            old (SkypeEndpoint): endpoint no longer in use
+            new (SkypeEndpoint): endpoint to keep alive instead
+        """
+        with self.cond:
+            stats = self.endpointStats.pop(old, None)
+            if stats is not None:
+                self.endpointStats[new] = stats
+            self.queue = [(due, seq, new if endpoint is old else endpoint) for due, seq, endpoint in self.queue]
+            heapq.heapify(self.queue)
+
+    def push(self, endpoint, due):
+        # Sequence number breaks ties, as endpoints themselves aren't orderable.
+        self.seq += 1
+        heapq.heappush(self.queue, (due, self.seq, endpoint))
+        self.cond.notify()
+
+    def count(self, endpoint, key):
+        self.stats[key] += 1
+        if endpoint in self.endpointStats:
+            self.endpointStats[endpoint][key] += 1
+
+    def keep(self, endpoint):
+        """
+        Ping a single endpoint, recovering it if it has lapsed.
+
+        Re-registering may replace the endpoint in its connection's :attr:`~.SkypeConnection.endpoints` (for example,
+        the ``main`` endpoint).  In that case, the replacement takes over the subscriptions and place in the schedule.
+
+        Args:
+            endpoint (SkypeEndpoint): endpoint to ping
+
+        Returns:
+            SkypeEndpoint: endpoint to keep alive from now on
+        """
+        try:
+            endpoint.ping(self.timeout)
+        except SkypeApiException as e:
+            if not (len(e.args) >= 2 and getattr(e.args[1], "status_code", None) == 404):
+                self.count(endpoint, "failures")
+                return endpoint
+            self.count(endpoint, "lapses")
+            if endpoint in self.endpointStats:
+                self.endpointStats[endpoint]["lastLapse"] = datetime.now()
+            conn = endpoint.conn
+            keys = [key for key, value in conn.endpoints.items() if value is endpoint]
+            try:
+                conn.getRegToken()
+                for key in keys:
+                    current = conn.endpoints.get(key)
+                    if isinstance(current, SkypeEndpoint) and current is not endpoint:
+                        current.subscribed = endpoint.subscribed
+                        current.subscribedPresence = endpoint.subscribedPresence
+                        current.presenceIds = set(endpoint.presenceIds)
+                        self.replace(endpoint, current)
+                        endpoint = current
+                        break
+                if endpoint.subscribed:
+                    endpoint.resubscribe()
+            except (SkypeApiException, requests.RequestException):
+                self.count(endpoint, "failures")
+            else:
+                self.count(endpoint, "recoveries")
+        except requests.RequestException:
+            self.count(endpoint, "failures")
+        else:
+            self.count(endpoint, "pings")
+            if endpoint in self.endpointStats:
+                self.endpointStats[endpoint]["lastPing"] = datetime.now()
+        return endpoint
+
+    def start(self):
+        """
+        Start the scheduler thread, if not already running.
+
+        Returns:
+            SkypeEndpointScheduler: the current instance, for chaining
+        """
+        with self.cond:
+            if not self.running:
+                self.stopped = False
+                self.thread = threading.Thread(target=self.run, name="SkypeEndpointScheduler")
+                self.thread.daemon = True
+                self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the scheduler thread.  Registered endpoints are kept, and resume pinging if started again.
+        """
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        if self.running and threading.current_thread() is not self.thread:
+            self.thread.join()
+
+    def run(self):
+        """
+        Main loop of the scheduler thread: wait for the next endpoint to be due, ping it, then reschedule it.
+        """
+        while True:
+            with self.cond:
+                while not self.stopped and (not self.queue or self.queue[0][0] > time.time()):
+                    self.cond.wait(self.queue[0][0] - time.time() if self.queue else None)
+                if self.stopped:
+                    return
+                endpoint = heapq.heappop(self.queue)[2]
+            endpoint = self.keep(endpoint)
+            with self.cond:
+                if endpoint in self.endpointStats:
+                    self.push(endpoint, time.time() + self.interval)
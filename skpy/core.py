@@ -175,8 +175,12 @@ class SkypeObjs(object):
 class SkypeEnum(object):
     """
     A basic implementation for an enum.
+
+    Enums and their items are pickled by name, so that unpickled items are the same objects as the originals.
     """
 
+    enums = {}
+
     def __init__(self, label, names=(), path=None):
         """
         Create a new enumeration.  The parent enum creates an instance for each item.
@@ -189,8 +193,31 @@ class SkypeEnum(object):
         self.label = label
         self.names = names
         self.path = path
+        qualName = "{0}.{1}".format(path, label) if path else label
         for name in names:
-            setattr(self, name, self.__class__(name, path="{0}.{1}".format(path, label) if path else label))
+            setattr(self, name, self.__class__(name, path=qualName))
+        if names:
+            SkypeEnum.enums[qualName] = self
+
+    @staticmethod
+    def lookup(qualName, name=None):
+        """
+        Find an enum, or one of its items, by name.
+
+        Args:
+            qualName (str): qualified enum name
+            name (str): item label
+
+        Returns:
+            SkypeEnum: matching enum or item
+        """
+        enum = SkypeEnum.enums[qualName]
+        return getattr(enum, name) if name else enum
+
+    def __reduce__(self):
+        if self.names:
+            return (SkypeEnum.lookup, ("{0}.{1}".format(self.path, self.label) if self.path else self.label,))
+        return (SkypeEnum.lookup, (self.path, self.label))
 
     def __getitem__(self, item):
         """
@@ -1,6 +1,6 @@
-from datetime import datetime
+from collections import Counter
 
-from .core import SkypeObj
+from .core import SkypeObj, SkypeObjs
 from .util import SkypeUtils
 from .conn import SkypeConnection
 from .msg import SkypeMsg
@@ -18,48 +18,217 @@ class SkypeEvent(SkypeObj):
             Raw message type, as specified by the Skype API.
         time (datetime.datetime):
             Time at which the event occurred.
+
+    Event classes are picked by :meth:`fromRaw` from registries of raw resource types and, for ``NewMessage`` events,
+    raw message types.  Subclasses for types not handled here can be added with :meth:`registerType`.
     """
 
     attrs = ("id", "type", "time")
 
+    resourceTypes = {}
+    """
+    dict: Mapping from raw resource types to the :class:`SkypeEvent` subclasses that represent them.
+    """
+
+    msgTypes = {}
+    """
+    dict: Mapping from (resource type, message type) pairs to the :class:`SkypeEvent` subclasses that represent them,
+    taking precedence over :attr:`resourceTypes`.
+    """
+
+    unknownTypes = Counter()
+    """
+    collections.Counter: Number of events created by :meth:`fromRaw` for each (resource type, message type) pair missing
+    from the registries, where the message type is ``None`` for an unknown resource type.
+    """
+
     @classmethod
     def rawToFields(cls, raw={}):
         try:
-            evtTime = datetime.strptime(raw.get("time", ""), "%Y-%m-%dT%H:%M:%SZ")
+            evtTime = SkypeUtils.parseTime(raw.get("time"))
         except ValueError:
-            evtTime = datetime.now()
+            evtTime = SkypeUtils.nowTime()
         return {"id": raw.get("id"),
                 "type": raw.get("resourceType"),
                 "time": evtTime}
 
+    @staticmethod
+    def registerType(resourceType, *msgTypes):
+        """
+        Class decorator: use the decorated class in :meth:`fromRaw` for the given raw resource type, or if message types
+        are given, for events of that resource type with those message types.  Any class already registered is replaced.
+
+        .. code-block:: python
+
+            @SkypeEvent.registerType("NewMessage", "Poll")
+            class PollEvent(SkypeMessageEvent):
+                ...
+
+        Args:
+            resourceType (str): raw resource type to handle
+            msgTypes (str list): raw message types to handle, within the given resource type
+
+        Returns:
+            method: decorator function, ready to apply to a :class:`SkypeEvent` subclass
+        """
+        def decorator(evtCls):
+            if msgTypes:
+                for msgType in msgTypes:
+                    SkypeEvent.msgTypes[(resourceType, msgType)] = evtCls
+            else:
+                SkypeEvent.resourceTypes[resourceType] = evtCls
+            return evtCls
+        return decorator
+
     @classmethod
-    def fromRaw(cls, skype=None, raw={}):
-        res = raw.get("resource", {})
+    def rawToClass(cls, raw={}, count=False):
+        """
+        Determine which event class :meth:`fromRaw` would use for a raw event, without creating it.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+            count (bool): whether to add missing types to :attr:`unknownTypes`, only set when creating the event
+
+        Returns:
+            type: subclass of :class:`SkypeEvent`
+        """
         resType = raw.get("resourceType")
-        evtCls = {"UserPresence": SkypePresenceEvent,
-                  "EndpointPresence": SkypeEndpointEvent,
-                  "NewMessage": SkypeMessageEvent,
-                  "ConversationUpdate": SkypeChatUpdateEvent,
-                  "ThreadUpdate": SkypeChatMemberEvent}.get(resType, cls)
-        if evtCls is SkypeMessageEvent:
-            msgType = res.get("messagetype")
-            if msgType in ("Text", "RichText", "RichText/Contacts", "RichText/Media_GenericFile", "RichText/UriObject"):
-                evtCls = SkypeEditMessageEvent if res.get("skypeeditedid") else SkypeNewMessageEvent
-            elif msgType in ("Control/Typing", "Control/ClearTyping"):
-                evtCls = SkypeTypingEvent
-            elif msgType == "Event/Call":
-                evtCls = SkypeCallEvent
+        evtCls = SkypeEvent.resourceTypes.get(resType)
+        if evtCls is None:
+            if count:
+                SkypeEvent.unknownTypes[(resType, None)] += 1
+            return cls
+        res = raw.get("resource", {})
+        msgType = res.get("messagetype")
+        msgCls = SkypeEvent.msgTypes.get((resType, msgType))
+        if msgCls is None:
+            # Only messages are expected to have a type, so don't count other resources without one.
+            if count and resType == "NewMessage":
+                SkypeEvent.unknownTypes[(resType, msgType)] += 1
+        elif msgCls is SkypeNewMessageEvent and res.get("skypeeditedid"):
+            evtCls = SkypeEditMessageEvent
+        else:
+            evtCls = msgCls
+        return evtCls
+
+    @classmethod
+    def fromRaw(cls, skype=None, raw={}):
+        evtCls = cls.rawToClass(raw, count=True)
         return evtCls(skype, raw, **evtCls.rawToFields(raw))
 
+    def __getstate__(self):
+        """
+        Produce a compact form of the event for sending to a :class:`.SkypeEventPool` worker: the raw event and fields
+        from :attr:`attrs`, without the parent Skype instance.  Unpickled events have :attr:`skype` set to ``None``.
+
+        Returns:
+            dict: instance state
+        """
+        state = {attr: self.__dict__[attr] for attr in self.attrs if attr in self.__dict__}
+        state["raw"] = self.raw
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.skype = None
+
+    @staticmethod
+    def ackRaw(conn, raw):
+        """
+        Acknowledge receipt of a raw event, if a response is required, without creating an event object.
+
+        If the connection has an :attr:`.SkypeConnection.acks` batcher, the acknowledgement is queued there instead.
+
+        Args:
+            conn (.SkypeConnection): connection to acknowledge with
+            raw (dict): raw event, as provided by the API
+        """
+        url = raw.get("resource", {}).get("ackrequired")
+        if not url:
+            return
+        if conn.acks:
+            conn.acks.ack(url)
+        else:
+            conn("POST", url, auth=SkypeConnection.Auth.RegToken)
+
     def ack(self):
         """
         Acknowledge receipt of an event, if a response is required.
         """
-        url = self.raw.get("resource", {}).get("ackrequired")
-        if url:
-            self.skype.conn("POST", url, auth=SkypeConnection.Auth.RegToken)
+        self.ackRaw(self.skype.conn, self.raw)
+
+
+class SkypeEventFilter(SkypeObj):
+    """
+    A check of raw events by resource and message type, applied before any event objects are created.
+
+    Each filter accepts either a single value or a list of values.  Message type filters only apply to events that carry
+    a message type (that is, ``NewMessage`` events); other events are matched on resource type alone.
+
+    .. code-block:: python
+
+        # Only text messages, ignoring typing notifications and presence.
+        sk.getEvents(SkypeEventFilter(resourceTypes="NewMessage", msgTypes=("Text", "RichText")))
+
+    Attributes:
+        resourceTypes (set):
+            Resource types to accept, or ``None`` for any.
+        msgTypes (set):
+            Message types to accept, or ``None`` for any.
+        skipResourceTypes (set):
+            Resource types to reject.
+        skipMsgTypes (set):
+            Message types to reject.
+    """
+
+    attrs = ("resourceTypes", "msgTypes", "skipResourceTypes", "skipMsgTypes")
+
+    def __init__(self, resourceTypes=None, msgTypes=None, skipResourceTypes=None, skipMsgTypes=None):
+        """
+        Create a new filter.
 
+        Args:
+            resourceTypes (str or str list): resource types to accept
+            msgTypes (str or str list): message types to accept
+            skipResourceTypes (str or str list): resource types to reject
+            skipMsgTypes (str or str list): message types to reject
+        """
+        super(SkypeEventFilter, self).__init__()
+        self.resourceTypes = self.toSet(resourceTypes)
+        self.msgTypes = self.toSet(msgTypes)
+        self.skipResourceTypes = self.toSet(skipResourceTypes) or set()
+        self.skipMsgTypes = self.toSet(skipMsgTypes) or set()
+
+    @staticmethod
+    def toSet(value):
+        if value is None:
+            return None
+        return set([value]) if isinstance(value, str) else set(value)
+
+    def __call__(self, raw):
+        """
+        Check a raw event against the filter.
+
+        Args:
+            raw (dict): raw event, as provided by the API
 
+        Returns:
+            bool: whether the event is accepted
+        """
+        resType = raw.get("resourceType")
+        if resType in self.skipResourceTypes:
+            return False
+        if self.resourceTypes is not None and resType not in self.resourceTypes:
+            return False
+        msgType = raw.get("resource", {}).get("messagetype")
+        if msgType is None:
+            return True
+        if msgType in self.skipMsgTypes:
+            return False
+        return self.msgTypes is None or msgType in self.msgTypes
+
+
+@SkypeEvent.registerType("UserPresence")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds("user")
 class SkypePresenceEvent(SkypeEvent):
@@ -90,6 +259,75 @@ class SkypePresenceEvent(SkypeEvent):
         return fields
 
 
+class SkypePresences(SkypeObjs):
+    """
+    A table of the latest known presence for each user, maintained from incoming :class:`SkypePresenceEvent` instances.
+
+    Key lookups by user identifier return the most recent event for that user, or ``None`` if nothing has been seen
+    yet -- they never make API calls.  Each entry provides :attr:`~SkypePresenceEvent.status`,
+    :attr:`~SkypePresenceEvent.online`, :attr:`~SkypePresenceEvent.capabilities`, and the
+    :attr:`~SkypeEvent.time` of the last change.
+
+    Attributes:
+        listeners (method list):
+            Callbacks taking the previous and new events for a user, called whenever a user's presence changes.
+    """
+
+    def __init__(self, skype=None):
+        super(SkypePresences, self).__init__(skype)
+        self.listeners = []
+        # There's nothing to retrieve upfront, all entries come from events.
+        self.synced = True
+
+    def __getitem__(self, key):
+        return self.cache.get(key)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def online(self, id):
+        """
+        Check if a user is currently connected, as far as is known.
+
+        Args:
+            id (str): user identifier to look up
+
+        Returns:
+            bool: whether the user was last seen online
+        """
+        entry = self.cache.get(id)
+        return bool(entry and entry.online)
+
+    def addListener(self, fn):
+        """
+        Register a callback for changes in presence.
+
+        Args:
+            fn (method): callback taking the previous event (or ``None``) and the new event
+        """
+        self.listeners.append(fn)
+
+    def update(self, event):
+        """
+        Record a presence event, notifying listeners if the user's presence has changed.
+
+        Args:
+            event (SkypePresenceEvent): incoming event
+
+        Returns:
+            bool: whether the presence differs from the previous entry
+        """
+        old = self.cache.get(event.userId)
+        if old and (old.status, old.online, old.capabilities) == (event.status, event.online, event.capabilities):
+            # Keep the entry from the actual change, so its time isn't replaced by the latest repeat.
+            return False
+        self.cache[event.userId] = event
+        for fn in self.listeners:
+            fn(old, event)
+        return True
+
+
+@SkypeEvent.registerType("EndpointPresence")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds("user")
 class SkypeEndpointEvent(SkypeEvent):
@@ -124,6 +362,7 @@ class SkypeEndpointEvent(SkypeEvent):
         return fields
 
 
+@SkypeEvent.registerType("NewMessage", "Control/Typing", "Control/ClearTyping")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds("user", "chat")
 class SkypeTypingEvent(SkypeEvent):
@@ -151,6 +390,7 @@ class SkypeTypingEvent(SkypeEvent):
         return fields
 
 
+@SkypeEvent.registerType("NewMessage")
 @SkypeUtils.initAttrs
 class SkypeMessageEvent(SkypeEvent):
     """
@@ -176,6 +416,8 @@ class SkypeMessageEvent(SkypeEvent):
         return SkypeMsg.fromRaw(self.skype, self.raw.get("resource", {}))
 
 
+@SkypeEvent.registerType("NewMessage", "Text", "RichText", "RichText/Contacts", "RichText/Media_GenericFile",
+                         "RichText/UriObject")
 @SkypeUtils.initAttrs
 class SkypeNewMessageEvent(SkypeMessageEvent):
     """
@@ -190,6 +432,7 @@ class SkypeEditMessageEvent(SkypeMessageEvent):
     """
 
 
+@SkypeEvent.registerType("NewMessage", "Event/Call")
 @SkypeUtils.initAttrs
 class SkypeCallEvent(SkypeMessageEvent):
     """
@@ -197,6 +440,7 @@ class SkypeCallEvent(SkypeMessageEvent):
     """
 
 
+@SkypeEvent.registerType("ConversationUpdate")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds("chat")
 class SkypeChatUpdateEvent(SkypeEvent):
@@ -224,12 +468,16 @@ class SkypeChatUpdateEvent(SkypeEvent):
         """
         Use the consumption horizon to mark the conversation as up-to-date.
         """
+        if self.skype.conn.acks:
+            self.skype.conn.acks.consume(self.chatId, self.horizon)
+            return
         self.skype.conn("PUT", "{0}/users/ME/conversations/{1}/properties"
                                .format(self.skype.conn.msgsHost, self.chatId),
                         auth=SkypeConnection.Auth.RegToken, params={"name": "consumptionhorizon"},
                         json={"consumptionhorizon": self.horizon})
 
 
+@SkypeEvent.registerType("ThreadUpdate")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds("users", "chat")
 class SkypeChatMemberEvent(SkypeEvent):
@@ -1,13 +1,26 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import gzip
+import json
+import os
+import pickle
+import threading
+import time
 from uuid import uuid4
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
 import requests
 
-from .core import SkypeObj, SkypeEnum, SkypeAuthException
+from .core import SkypeObj, SkypeEnum, SkypeException, SkypeAuthException
 from .util import SkypeUtils
 from .conn import SkypeConnection
 from .user import SkypeUser, SkypeContact, SkypeContacts
 from .chat import SkypeChats
-from .event import SkypeEvent
+from .event import SkypeEvent, SkypePresenceEvent, SkypePresences
 
 
 class Skype(SkypeObj):
@@ -21,12 +34,21 @@ class Skype(SkypeObj):
             Container of contacts for the connected user.
         chats (:class:`.SkypeChats`):
             Container of conversations for the connected user.
+        presence (:class:`.SkypePresences`):
+            Latest known presence of contacts, updated by :meth:`getEvents`.
         settings (:class:`.SkypeSettings`):
             Read/write access to server-side account options.
         services (dict):
             Skype credit and other paid services for the connected account.
         translate (:class:`.SkypeTranslator`):
             Connected instance of the translator service.
+        recorder (:class:`.SkypeEventRecorder`):
+            If set, receives a copy of every raw event retrieved by :meth:`getRawEvents`.
+        tracker (:class:`.SkypeEventTracker`):
+            If set, drops repeated events from :meth:`getRawEvents`, and backfills messages missed while the event
+            subscription was being renewed.
+        refreshThread (threading.Thread):
+            Background revalidation started by the last :meth:`loadState`, if any.
         conn (:class:`.SkypeConnection`):
             Underlying connection instance.
     """
@@ -69,8 +91,12 @@ class Skype(SkypeObj):
                 self.conn.getSkypeToken()
         self.contacts = SkypeContacts(self)
         self.chats = SkypeChats(self)
+        self.presence = SkypePresences(self)
         self.settings = SkypeSettings(self)
         self.translate = SkypeTranslator(self)
+        self.recorder = None
+        self.tracker = None
+        self.refreshThread = None
 
     @property
     def userId(self):
@@ -79,6 +105,15 @@ class Skype(SkypeObj):
     @property
     @SkypeUtils.cacheResult
     def user(self):
+        return self.fetchUser()
+
+    def fetchUser(self):
+        """
+        Retrieve the connected user's profile, bypassing the cache used by :attr:`user`.
+
+        Returns:
+            SkypeContact: profile of the connected user
+        """
         json = self.conn("GET", "{0}/users/self/profile".format(SkypeConnection.API_USER),
                          auth=SkypeConnection.Auth.SkypeToken).json()
         return SkypeContact.fromRaw(self, json)
@@ -89,28 +124,210 @@ class Skype(SkypeObj):
         return self.conn("GET", "{0}/users/{1}/services".format(SkypeConnection.API_ENTITLEMENT, self.userId),
                          auth=SkypeConnection.Auth.SkypeToken, headers={"Accept": "application/json; ver=3.0"}).json()
 
+    def saveState(self, path):
+        """
+        Write cached account data to a file, to be restored in a later process with :meth:`loadState`.
+
+        This covers the connected user's profile, cached users and conversations, the contact list and groups, sync
+        state cursors, and account flags.  The file is a gzip-compressed pickle, replaced atomically.
+
+        Args:
+            path (str): location of the state file
+        """
+        contacts = self.contacts
+        blocked = getattr(contacts, "blocked", None)
+        state = {"version": 2,
+                 "saved": time.time(),
+                 "userId": self.userId,
+                 "user": self.packObj(Skype.user.fget.cache.get((self,))),
+                 "users": [self.packObj(user) for user in contacts.cache.values()],
+                 "usersSynced": contacts.synced,
+                 "contactIds": list(contacts.contactIds),
+                 "groups": dict((id, self.packObj(group)) for id, group in contacts.groups.items()),
+                 "blocked": self.packObj(blocked),
+                 "chats": [self.packObj(chat) for chat in self.chats.cache.values()],
+                 "syncStates": dict((key, list(states)) for key, states in self.conn.syncStates.items()),
+                 "flags": sorted(self.settings.flags)}
+        SkypeUtils.atomicWrite(path, gzip.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL)), "wb")
+
+    @staticmethod
+    def packObj(obj):
+        """
+        Reduce a cached object to its class, raw data and fields from :attr:`.SkypeObj.attrs`, for :meth:`saveState`.
+
+        Args:
+            obj (SkypeObj): object to store, or ``None``
+
+        Returns:
+            tuple: (``class``, ``raw``, ``fields``) tuple, or ``None``
+        """
+        if obj is None:
+            return None
+        return (obj.__class__, obj.raw, dict((attr, getattr(obj, attr, None)) for attr in obj.attrs))
+
+    def unpackObj(self, packed):
+        """
+        Rebuild an object stored by :meth:`packObj`, attached to this instance.
+
+        Args:
+            packed (tuple): output of :meth:`packObj`
+
+        Returns:
+            SkypeObj: restored object, or ``None``
+        """
+        if packed is None:
+            return None
+        cls, raw, fields = packed
+        return cls(self, raw, **fields)
+
+    def loadState(self, path, maxAge=None, refresh=True):
+        """
+        Restore cached account data from a file written by :meth:`saveState`, so that the connection is usable without
+        first fetching contacts, conversations and the user profile.
+
+        Restored data may be out of date: unless disabled, :meth:`refreshState` is then run in a background thread.
+
+        .. warning:: State files are pickles, so should only be loaded from trusted locations.
+
+        Args:
+            path (str): location of the state file
+            maxAge (int): number of seconds after which a saved state is ignored, or ``None`` to always use it
+            refresh (bool): whether to revalidate the restored data in the background
+
+        Returns:
+            threading.Thread: background refresh thread if started (also kept as :attr:`refreshThread`), ``True`` if
+            loaded without refresh, or ``False`` if there was no usable state
+
+        Raises:
+            .SkypeException: if the state belongs to a different account
+        """
+        if not os.path.isfile(path):
+            return False
+        with gzip.open(path, "rb") as f:
+            state = pickle.load(f)
+        if not state.get("version") == 2 or (maxAge is not None and state["saved"] + maxAge < time.time()):
+            return False
+        if self.userId and state["userId"] and not self.userId == state["userId"]:
+            raise SkypeException("State belongs to {0}, not {1}".format(state["userId"], self.userId))
+        user = self.unpackObj(state["user"])
+        if user:
+            Skype.user.fget.cache[(self,)] = user
+        contacts = self.contacts
+        for packed in state["users"]:
+            contacts.merge(self.unpackObj(packed))
+        contacts.contactIds = state["contactIds"]
+        contacts.groups = dict((id, self.unpackObj(packed)) for id, packed in state["groups"].items())
+        blocked = self.unpackObj(state["blocked"])
+        if blocked:
+            contacts.blocked = blocked
+        contacts.synced = contacts.synced or state["usersSynced"]
+        for packed in state["chats"]:
+            self.chats.merge(self.unpackObj(packed))
+        for key, states in state["syncStates"].items():
+            self.conn.syncStates.setdefault(key, states)
+        self.settings.flags = set(state["flags"])
+        if not refresh:
+            return True
+        thread = threading.Thread(target=self.refreshState, name="Skype-refreshState")
+        thread.daemon = True
+        self.refreshThread = thread
+        thread.start()
+        return thread
+
+    def refreshState(self):
+        """
+        Revalidate data restored by :meth:`loadState`: the user profile, contact list and account flags are fetched
+        again, and only the differences applied to the existing caches (see :meth:`.SkypeContacts.revalidate`), so
+        restored objects stay usable throughout.  Conversations are kept up to date by incoming events, so aren't
+        fetched here.
+        """
+        user = self.fetchUser()
+        cache = Skype.user.fget.cache
+        cached = cache.get((self,))
+        if cached:
+            # Keep the existing object, so that references to it see the update.
+            cached.merge(user)
+        else:
+            cache[(self,)] = user
+        self.contacts.revalidate()
+        self.settings.syncFlags()
+
     def subscribePresence(self):
         """
-        Subscribe to contact presence events.
+        Subscribe to contact presence events.  Incoming events also update the :attr:`presence` table.
         """
         self.conn.endpoints["self"].subscribePresence(self.contacts)
 
     @SkypeConnection.handle(404, regToken=True)
     @SkypeConnection.handle(404, subscribe="self")
-    def getEvents(self):
+    def getRawEvents(self, filter=None):
+        """
+        Retrieve a list of raw events since the last poll, without creating any event objects.
+
+        See :meth:`getEvents` for blocking behaviour.  The :attr:`recorder`, if set, receives all events after any
+        de-duplication and backfill by the :attr:`tracker`, including those rejected by the filter.
+
+        Args:
+            filter (method): check called with each raw event, such as a :class:`.SkypeEventFilter`
+
+        Returns:
+            dict list: raw events, as provided by the API
+        """
+        events = self.conn.endpoints["self"].getEvents()
+        if self.tracker:
+            events = self.tracker.process(events)
+        if self.recorder:
+            self.recorder.record(events)
+        if filter:
+            events = [raw for raw in events if filter(raw)]
+        return events
+
+    def iterRawEvents(self, filter=None):
+        """
+        Continuously poll for raw events, yielding each one as a dictionary.
+
+        Args:
+            filter (method): check called with each raw event, such as a :class:`.SkypeEventFilter`
+
+        Returns:
+            dict iterator: raw events, as provided by the API
+        """
+        while True:
+            for raw in self.getRawEvents(filter):
+                yield raw
+
+    def getEvents(self, filter=None):
         """
         Retrieve a list of events since the last poll.  Multiple calls may be needed to retrieve all events.
 
         If no events occur, the API will block for up to 30 seconds, after which an empty list is returned.  As soon as
         an event is received in this time, it is returned immediately.
 
+        If a filter is given, it is applied to the raw events, and objects are only created for those it accepts.
+        Rejected events don't update :attr:`presence`.
+
+        Args:
+            filter (method): check called with each raw event, such as a :class:`.SkypeEventFilter`
+
         Returns:
             :class:`.SkypeEvent` list: a list of events, possibly empty
         """
-        events = []
-        for json in self.conn.endpoints["self"].getEvents():
-            events.append(SkypeEvent.fromRaw(self, json))
-        return events
+        return [self.parseEvent(json) for json in self.getRawEvents(filter)]
+
+    def parseEvent(self, raw):
+        """
+        Create an event object from a raw event, and update any local state (such as :attr:`presence`) affected by it.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+
+        Returns:
+            .SkypeEvent: the new event object
+        """
+        event = SkypeEvent.fromRaw(self, raw)
+        if isinstance(event, SkypePresenceEvent):
+            self.presence.update(event)
+        return event
 
     def setPresence(self, status=SkypeUtils.Status.Online):
         """
@@ -166,6 +383,16 @@ class SkypeEventLoop(Skype):
     Attributes:
         autoAck (bool):
             Whether to automatically acknowledge all incoming events.
+        profiler (:class:`.SkypeLoopProfiler`):
+            If set, times each stage of :meth:`cycle`, and reports slow handlers and falling behind.
+        router (:class:`.SkypeEventRouter`):
+            If set, receives events from the default :meth:`onEvent`, and events that no route applies to are skipped
+            without being created.
+        eventFilter (method):
+            If set, a check of each raw event (such as a :class:`.SkypeEventFilter`), with rejected events skipped
+            without being created.
+        pool (:class:`.SkypeEventPool`):
+            If set, receives events from the default :meth:`onEvent`, to be handled in worker processes.
     """
 
     attrs = Skype.attrs + ("autoAck",)
@@ -185,6 +412,10 @@ class SkypeEventLoop(Skype):
         """
         super(SkypeEventLoop, self).__init__(user, pwd, tokenFile)
         self.autoAck = autoAck
+        self.profiler = None
+        self.router = None
+        self.eventFilter = None
+        self.pool = None
         if status:
             self.setPresence(status)
 
@@ -192,16 +423,30 @@ class SkypeEventLoop(Skype):
         """
         Request one batch of events from Skype, calling :meth:`onEvent` with each event in turn.
 
-        Subclasses may override this method to alter loop functionality.
+        Subclasses may override this method to alter loop functionality.  If a :attr:`profiler` is set, the poll,
+        parse, handler and acknowledgement stages are run through its hooks, so that each can be timed.
         """
+        profiler = self.profiler
         try:
-            events = self.getEvents()
+            raws = profiler.poll(self) if profiler else self.getRawEvents()
         except requests.ConnectionError:
             return
+        events = []
+        for raw in raws:
+            if self.wantsEvent(raw):
+                events.append(profiler.parse(self, raw) if profiler else self.parseEvent(raw))
+            else:
+                self.skipEvent(raw)
         for event in events:
-            self.onEvent(event)
+            if profiler:
+                profiler.handle(self, event)
+            else:
+                self.onEvent(event)
             if self.autoAck:
-                event.ack()
+                if profiler:
+                    profiler.ack(event)
+                else:
+                    event.ack()
 
     def loop(self):
         """
@@ -212,21 +457,56 @@ class SkypeEventLoop(Skype):
         while True:
             self.cycle()
 
+    def wantsEvent(self, raw):
+        """
+        Decide whether a raw event should be created and passed to :meth:`onEvent`.
+
+        Events rejected by :attr:`eventFilter` are never wanted.  Otherwise, all events are wanted unless a
+        :attr:`router` is set, in which case only those that a route could apply to are.  Presence events are then
+        always wanted, to keep :attr:`presence` up-to-date.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+
+        Returns:
+            bool: whether to handle the event
+        """
+        if self.eventFilter and not self.eventFilter(raw):
+            return False
+        return not self.router or self.router.wants(raw) or raw.get("resourceType") == "UserPresence"
+
+    def skipEvent(self, raw):
+        """
+        Discard an unwanted raw event, acknowledging it if :attr:`autoAck` is set.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+        """
+        if self.autoAck:
+            SkypeEvent.ackRaw(self.conn, raw)
+
     def onEvent(self, event):
         """
         A stub method that subclasses should implement to react to messages and status changes.
 
+        If a :attr:`router` or :attr:`pool` is set, the event is passed on to them.
+
         Args:
             event (SkypeEvent): an incoming event
         """
-        pass
+        if self.router:
+            self.router.dispatch(event)
+        if self.pool:
+            self.pool.dispatch(event)
 
 
 class SkypeSettings(SkypeObj):
     """
     An interface for getting and setting server options for the connected account.
 
-    All attributes are read/write, with values fetched on each access, and implicit server writes when changed.
+    All attributes are read/write, with values fetched on each access, and implicit server writes when changed.  To
+    avoid a request per access, take a snapshot with :meth:`load`; to apply several changes at once, make them inside
+    a :meth:`batch` block.
 
     Attributes:
         notificationPopups (bool):
@@ -283,6 +563,9 @@ class SkypeSettings(SkypeObj):
     def __init__(self, skype=None, raw=None):
         super(SkypeSettings, self).__init__(skype, raw)
         self.flags = set()
+        self.options = {}
+        self.snapshot = False
+        self.pending = None
 
     def syncFlags(self):
         """
@@ -291,34 +574,168 @@ class SkypeSettings(SkypeObj):
         self.flags = set(self.skype.conn("GET", SkypeConnection.API_FLAGS,
                                          auth=SkypeConnection.Auth.SkypeToken).json())
 
+    def load(self, workers=8):
+        """
+        Take a snapshot of all settings: the flag list and each option are fetched concurrently, after which reads are
+        served locally until :meth:`unload` is called.  Writes still go to the server, and keep the snapshot current.
+
+        Args:
+            workers (int): maximum number of requests to make at once
+
+        Returns:
+            SkypeSettings: the current instance, for chaining
+        """
+        fetches = {}
+        for name in dir(type(self)):
+            attr = getattr(type(self), name)
+            if isinstance(attr, property) and getattr(attr.fget, "fetch", None):
+                fetches[attr.fget.key] = attr.fget.fetch
+        if workers > 1 and ThreadPoolExecutor:
+            with ThreadPoolExecutor(max_workers=min(workers, len(fetches) + 1)) as pool:
+                flags = pool.submit(self.syncFlags)
+                futures = dict((key, pool.submit(fetch, self)) for key, fetch in fetches.items())
+                flags.result()
+                options = dict((key, future.result()) for key, future in futures.items())
+        else:
+            self.syncFlags()
+            options = dict((key, fetch(self)) for key, fetch in fetches.items())
+        self.options = options
+        self.snapshot = True
+        return self
+
+    def unload(self):
+        """
+        Discard the snapshot taken by :meth:`load`, so that reads go back to the server.
+        """
+        self.snapshot = False
+        self.options = {}
+
+    @contextmanager
+    def batch(self, workers=8):
+        """
+        Context manager: collect changes to settings, then apply them together on exit.
+
+        Values set inside the block are visible to reads within it, but nothing is sent until the block completes.  The
+        changes are compared against a snapshot (taken with :meth:`load` if needed, and discarded again afterwards), and
+        only settings whose values differ are written, concurrently.  If the block raises, all changes are discarded.
+        If any write fails, those that succeeded are reverted before the error is raised.
+
+        .. code-block:: python
+
+            with sk.settings.batch():
+                sk.settings.darkTheme = True
+                sk.settings.callPrivacy = SkypeSettings.Privacy.Contacts
+
+        Args:
+            workers (int): maximum number of requests to make at once
+        """
+        if self.pending is not None:
+            # Nested batches are merged into the outermost one.
+            yield
+            return
+        self.pending = OrderedDict()
+        try:
+            yield
+            pending = self.pending
+        finally:
+            self.pending = None
+        if not pending:
+            return
+        # A snapshot taken just for this batch shouldn't outlive it, or later reads would never see remote changes.
+        loaded = not self.snapshot
+        if loaded:
+            self.load(workers)
+        try:
+            changes = [(key, store, val, self.read(key, fetch)) for key, (fetch, store, val) in pending.items()]
+            self.apply([change for change in changes if not change[2] == change[3]], workers)
+        finally:
+            if loaded:
+                self.unload()
+
+    def apply(self, changes, workers=8):
+        """
+        Make a set of writes, reverting any that succeeded if another fails.
+
+        Args:
+            changes (tuple list): (``key``, ``store``, ``new``, ``old``) tuples
+            workers (int): maximum number of requests to make at once
+        """
+        def write(change):
+            key, store, val, _ = change
+            try:
+                self.write(key, val, None, store)
+            except Exception as e:
+                return e
+        if len(changes) > 1 and workers > 1 and ThreadPoolExecutor:
+            with ThreadPoolExecutor(max_workers=min(workers, len(changes))) as pool:
+                errors = list(pool.map(write, changes))
+        else:
+            errors = [write(change) for change in changes]
+        failures = [error for error in errors if error]
+        if failures:
+            for (key, store, _, old), error in zip(changes, errors):
+                if not error:
+                    self.write(key, old, None, store)
+            raise failures[0]
+
+    def read(self, key, fetch):
+        if self.pending is not None and key in self.pending:
+            return self.pending[key][2]
+        if self.snapshot and key in self.options:
+            return self.options[key]
+        return fetch(self)
+
+    def write(self, key, val, fetch, store):
+        if self.pending is not None:
+            self.pending[key] = (fetch, store, val)
+            return
+        store(self, val)
+        if self.snapshot and key in self.options:
+            self.options[key] = val
+
     def flagProp(id, invert=False):
+        def fetch(self):
+            return id in self.flags
+
+        def store(self, val):
+            # A snapshot keeps the flag list current, otherwise it may be stale and needs refreshing first.
+            if not self.snapshot:
+                self.syncFlags()
+            if not val == (id in self.flags):
+                self.skype.conn("PUT" if val else "DELETE", "{0}/{1}".format(SkypeConnection.API_FLAGS, id),
+                                auth=SkypeConnection.Auth.SkypeToken)
+                self.flags.add(id) if val else self.flags.discard(id)
+
         @property
         def prop(self):
-            return (id in self.flags) ^ invert
+            return self.read(("flag", id), fetch) ^ invert
 
         @prop.setter
         def prop(self, val):
-            val = bool(val) ^ invert
-            self.syncFlags()
-            if not val == (id in self.flags):
-                self.skype.conn("PUT" if val else "DELETE", "{0}/{1}".format(SkypeConnection.API_FLAGS, id),
-                                auth=SkypeConnection.Auth.SkypeToken)
-                self.flags.add(id) if val else self.flags.remove(id)
+            self.write(("flag", id), bool(val) ^ invert, fetch, store)
         return prop
 
     def apiProp(id):
-        @property
-        def prop(self):
+        def fetch(self):
             json = self.skype.conn("GET", "{0}/users/{1}/options/{2}".format(SkypeConnection.API_USER,
                                                                              self.skype.userId, id),
                                    auth=SkypeConnection.Auth.SkypeToken).json()
             return json.get("optionInt", json.get("optionStr", json.get("optionBin")))
 
-        @prop.setter
-        def prop(self, val):
+        def store(self, val):
             self.skype.conn("POST", "{0}/users/{1}/options/{2}".format(SkypeConnection.API_USER,
                                                                        self.skype.userId, id),
                             auth=SkypeConnection.Auth.SkypeToken, data={"integerValue": val})
+
+        @property
+        def prop(self):
+            return self.read(("api", id), fetch)
+
+        @prop.setter
+        def prop(self, val):
+            self.write(("api", id), val, fetch, store)
+        prop.fget.key = ("api", id)
+        prop.fget.fetch = fetch
         return prop
 
     def optProp(id):
@@ -326,17 +743,25 @@ class SkypeSettings(SkypeObj):
             return {"X-Microsoft-Skype-Message-ID": str(uuid4()),
                     "X-Microsoft-Skype-Chain-ID": str(uuid4())}
 
-        @property
-        def prop(self):
+        def fetch(self):
             return self.skype.conn("GET", "{0}/{1}".format(SkypeConnection.API_OPTIONS, id),
                                    auth=SkypeConnection.Auth.SkypeToken,
                                    headers=idHeaders()).json().get("value")
 
-        @prop.setter
-        def prop(self, val):
+        def store(self, val):
             self.skype.conn("PUT", "{0}/{1}".format(SkypeConnection.API_OPTIONS, id),
                             auth=SkypeConnection.Auth.SkypeToken,
                             headers=idHeaders(), json={"value": val})
+
+        @property
+        def prop(self):
+            return self.read(("opt", id), fetch)
+
+        @prop.setter
+        def prop(self, val):
+            self.write(("opt", id), val, fetch, store)
+        prop.fget.key = ("opt", id)
+        prop.fget.fetch = fetch
         return prop
 
     notificationPopups = flagProp(21, True)
@@ -384,6 +809,7 @@ class SkypeSettings(SkypeObj):
 
     # Now make these static methods so they can be used outside of the class.
     flagProp = staticmethod(flagProp)
+    apiProp = staticmethod(apiProp)
     optProp = staticmethod(optProp)
 
 
@@ -391,11 +817,38 @@ class SkypeTranslator(SkypeObj):
     """
     An interface to Skype's translation API.
 
+    Results are kept in a bounded cache, keyed by text and languages, with the least recently used entries dropped
+    first.  The cache can be written to disk with :meth:`saveCache`, and read back with :meth:`loadCache`.
+
     Attributes:
         languages (dict):
             Known languages supported by the translator.
+        cacheSize (int):
+            Maximum number of translations to keep, or ``0`` to disable caching.
+        cacheTTL (int):
+            Number of seconds to keep each translation, or ``None`` to keep them until evicted.
+        stats (dict):
+            Counters of cache ``hits`` and ``misses``.
     """
 
+    attrs = ("cacheSize", "cacheTTL")
+
+    def __init__(self, skype=None, cacheSize=1000, cacheTTL=86400):
+        """
+        Create a new translator.
+
+        Args:
+            skype (Skype): parent Skype instance
+            cacheSize (int): maximum number of translations to keep, or ``0`` to disable caching
+            cacheTTL (int): number of seconds to keep each translation, or ``None`` to keep them until evicted
+        """
+        super(SkypeTranslator, self).__init__(skype)
+        self.cacheSize = cacheSize
+        self.cacheTTL = cacheTTL
+        self.stats = {"hits": 0, "misses": 0}
+        self.cache = OrderedDict()
+        self.cacheLock = threading.Lock()
+
     @property
     @SkypeUtils.cacheResult
     def languages(self):
@@ -410,7 +863,120 @@ class SkypeTranslator(SkypeObj):
             text (str): input text to be translated
             toLang (str): country code of output language
             fromLang (str): country code of input language
+
+        Returns:
+            dict: raw translation result
+        """
+        result = self.cached((text, fromLang or "", toLang))
+        return self.fetch(text, toLang, fromLang) if result is None else result
+
+    def fetch(self, text, toLang, fromLang=None):
+        """
+        Request a translation from the API, bypassing the cache, and store the result in the cache.
+
+        Args:
+            text (str): input text to be translated
+            toLang (str): country code of output language
+            fromLang (str): country code of input language
+
+        Returns:
+            dict: raw translation result
+        """
+        result = self.skype.conn("GET", "{0}/skype/translate".format(SkypeConnection.API_TRANSLATE),
+                                 params={"from": fromLang or "", "to": toLang, "text": text},
+                                 auth=SkypeConnection.Auth.SkypeToken).json()
+        self.store((text, fromLang or "", toLang), result)
+        return result
+
+    def batch(self, texts, toLang, fromLang=None, workers=8):
+        """
+        Translate many strings at once.  Repeated and cached strings are only looked up once, and the rest are
+        requested concurrently.
+
+        Args:
+            texts (str list): input texts to be translated
+            toLang (str): country code of output language
+            fromLang (str): country code of input language
+            workers (int): maximum number of concurrent requests
+
+        Returns:
+            dict list: raw translation results, in the same order as the input
+        """
+        results = {}
+        for text in OrderedDict.fromkeys(texts):
+            results[text] = self.cached((text, fromLang or "", toLang))
+        missing = [text for text, result in results.items() if result is None]
+        if len(missing) > 1 and workers > 1 and ThreadPoolExecutor:
+            with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+                fetched = pool.map(lambda text: self.fetch(text, toLang, fromLang), missing)
+                results.update(zip(missing, fetched))
+        else:
+            results.update((text, self.fetch(text, toLang, fromLang)) for text in missing)
+        return [results[text] for text in texts]
+
+    def cached(self, key):
+        """
+        Look up a translation in the cache, counting the hit or miss.
+
+        Args:
+            key (tuple): (``text``, ``fromLang``, ``toLang``) tuple
+
+        Returns:
+            dict: cached result, or ``None`` if missing or expired
+        """
+        with self.cacheLock:
+            entry = self.cache.get(key)
+            if entry and (entry[0] is None or entry[0] > time.time()):
+                self.cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            if entry:
+                del self.cache[key]
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, key, result):
+        if not self.cacheSize:
+            return
+        expiry = time.time() + self.cacheTTL if self.cacheTTL else None
+        with self.cacheLock:
+            self.cache[key] = (expiry, result)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+
+    def saveCache(self, path):
+        """
+        Write all unexpired cached translations to a JSON file.
+
+        Args:
+            path (str): location of the cache file
+        """
+        now = time.time()
+        with self.cacheLock:
+            entries = [list(key) + [expiry, result] for key, (expiry, result) in self.cache.items()
+                       if expiry is None or expiry > now]
+        SkypeUtils.atomicWrite(path, json.dumps(entries))
+
+    def loadCache(self, path):
+        """
+        Read cached translations from a file written by :meth:`saveCache`, skipping any that have since expired.
+
+        Args:
+            path (str): location of the cache file
+
+        Returns:
+            int: number of translations loaded
         """
-        return self.skype.conn("GET", "{0}/skype/translate".format(SkypeConnection.API_TRANSLATE),
-                               params={"from": fromLang or "", "to": toLang, "text": text},
-                               auth=SkypeConnection.Auth.SkypeToken).json()
+        with open(path, "r") as f:
+            entries = json.load(f)
+        now = time.time()
+        count = 0
+        with self.cacheLock:
+            for text, fromLang, toLang, expiry, result in entries:
+                if expiry is None or expiry > now:
+                    self.cache[(text, fromLang, toLang)] = (expiry, result)
+                    count += 1
+            while len(self.cache) > self.cacheSize:
+                self.cache.popitem(last=False)
+        return count
@@ -0,0 +1,599 @@
+import bisect
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pprint import pformat
+
+from .core import SkypeObj
+
+
+class SkypeApiCall(SkypeObj):
+    """
+    A record of a single API request, passed to each :class:`SkypeInstrument` hook.
+
+    Attributes:
+        method (str):
+            HTTP request method.
+        url (str):
+            Full URL of the request, excluding query parameters.
+        endpoint (str):
+            URL with identifiers replaced by placeholders, suitable for grouping requests, e.g.
+            ``https://client-s.gateway.messenger.live.com/v1/users/ME/conversations/{id}/messages``.
+        auth (.SkypeConnection.Auth):
+            Authentication type included with the request.
+        status (int):
+            HTTP response status, or ``None`` if no response was received.
+        ok (bool):
+            Whether the status was one of those expected by the caller.
+        latency (float):
+            Time in seconds from sending the request to receiving the full response.
+        sent (int):
+            Size in bytes of the request body.
+        received (int):
+            Size in bytes of the response body.
+        retries (int):
+            Number of earlier attempts at this request, re-sent after re-authenticating.
+        error (Exception):
+            Exception raised by :mod:`requests` if no response was received.
+        headers (dict):
+            Request headers, with any tokens masked.
+        kwargs (dict):
+            Other arguments passed to :mod:`requests`.
+        response (requests.Response):
+            Response object, if one was received.
+    """
+
+    attrs = ("method", "url", "endpoint", "auth", "status", "ok", "latency", "sent", "received", "retries", "error")
+    defaults = dict(sent=0, received=0, retries=0)
+
+    secretHeaders = ("X-SkypeToken", "Authorization", "RegistrationToken", "Authentication")
+
+    idPatterns = ((re.compile(r"/users/(?!ME/|self/|batch/|ALL/|ME$|self$|ALL$)[^/]+"), "/users/{id}"),
+                  (re.compile(r"/(?:[0-9]+:[^/]+|%7B[^/]+%7D|{[^/]+}|[0-9]+|0-[a-z]+-[a-z0-9]+-[0-9a-f]+|"
+                              r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(?=/|$)", re.I), "/{id}"))
+
+    def __init__(self, method, url, auth=None, retries=0, headers=None, kwargs=None):
+        """
+        Start a new record, before the request is sent.
+
+        Args:
+            method (str): HTTP request method
+            url (str): full URL to connect to
+            auth (.SkypeConnection.Auth): authentication type included with the request
+            retries (int): number of previous attempts
+            headers (dict): request headers
+            kwargs (dict): any extra parameters to pass to :mod:`requests`
+        """
+        super(SkypeApiCall, self).__init__()
+        self.method = method
+        self.url = url.split("?", 1)[0]
+        self.endpoint = self.template(self.url)
+        self.auth = auth
+        self.retries = retries
+        self.headers = dict((key, "***" if key in self.secretHeaders else val) for key, val in (headers or {}).items())
+        self.kwargs = kwargs or {}
+        self.status = self.ok = self.latency = self.error = self.response = None
+        self.sent = self.received = 0
+
+    @classmethod
+    def template(cls, url):
+        """
+        Replace user, conversation, message and object identifiers in a URL with placeholders.
+
+        Args:
+            url (str): full URL of a request
+
+        Returns:
+            str: templated URL
+        """
+        url = url.split("?", 1)[0]
+        for pattern, repl in cls.idPatterns:
+            url = pattern.sub(repl, url)
+        return url
+
+    @classmethod
+    def perform(cls, instruments, send, method, url, codes, auth=None, retries=0, headers=None, **kwargs):
+        """
+        Make a request through the given function, notifying instruments before and after.
+
+        Args:
+            instruments (SkypeInstrument list): instruments to notify
+            send (method): request function, usually :meth:`requests.Session.request`
+            method (str): HTTP request method
+            url (str): full URL to connect to
+            codes (int list): expected HTTP response codes for success
+            auth (.SkypeConnection.Auth): authentication type included with the request
+            retries (int): number of previous attempts
+            headers (dict): request headers
+            kwargs (dict): any extra parameters to pass to the request function
+
+        Returns:
+            requests.Response: response object provided by :mod:`requests`
+        """
+        call = cls(method, url, auth, retries, headers, kwargs)
+        for inst in instruments:
+            inst.preRequest(call)
+        start = time.time()
+        try:
+            resp = send(method, url, headers=headers, **kwargs)
+        except Exception as e:
+            call.latency = time.time() - start
+            call.ok = False
+            call.error = e
+            for inst in instruments:
+                inst.postRequest(call)
+            raise
+        call.latency = time.time() - start
+        call.response = resp
+        call.status = resp.status_code
+        call.ok = resp.status_code in codes
+        body = resp.request.body if resp.request is not None else None
+        call.sent = len(body) if body and not hasattr(body, "read") else 0
+        if kwargs.get("stream"):
+            call.received = int(resp.headers.get("Content-Length") or 0)
+        else:
+            call.received = len(resp.content or b"")
+        for inst in instruments:
+            inst.postRequest(call)
+        return resp
+
+
+class SkypeInstrument(SkypeObj):
+    """
+    A base class for observers of API activity.  Subclasses override any hooks they're interested in.
+
+    Add instances to a connection with :meth:`.SkypeConnection.addInstrument`.  Hooks are called synchronously on the
+    thread making the request, so should return quickly.
+    """
+
+    def preRequest(self, call):
+        """
+        Called before a request is sent.
+
+        Args:
+            call (SkypeApiCall): details of the request, without any response fields
+        """
+        pass
+
+    def postRequest(self, call):
+        """
+        Called once a response is received, or the request fails.
+
+        Args:
+            call (SkypeApiCall): details of the request and its response
+        """
+        pass
+
+    def retry(self, error):
+        """
+        Called when a failed request is about to be attempted again, after re-authenticating or re-subscribing.
+
+        Args:
+            error (.SkypeApiException): exception raised by the failed attempt, including its response
+        """
+        pass
+
+    def authRefresh(self, key):
+        """
+        Called when a token is about to be renewed.
+
+        Args:
+            key (str): token type, ``skype`` or ``reg``
+        """
+        pass
+
+
+class SkypeDebugInstrument(SkypeInstrument):
+    """
+    An instrument that prints each request and response, with tokens masked.  This is added to every API call whilst
+    the ``SKPY_DEBUG_HTTP`` environment variable is set, which is checked on each call.
+    """
+
+    instance = None
+
+    @classmethod
+    def attach(cls, instruments):
+        """
+        Add the shared debug instrument to a list of instruments, unless one is already present.
+
+        Args:
+            instruments (.SkypeInstrument list): instruments for an API call
+
+        Returns:
+            .SkypeInstrument list: new list including a debug instrument
+        """
+        if any(isinstance(inst, cls) for inst in instruments):
+            return instruments
+        if not cls.instance:
+            cls.instance = cls()
+        return instruments + [cls.instance]
+
+    def preRequest(self, call):
+        print("<= [{0}] {1} {2}".format(datetime.now().strftime("%d/%m %H:%M:%S"), call.method, call.url))
+        print(pformat(dict(call.kwargs, headers=call.headers)))
+
+    def postRequest(self, call):
+        if call.response is None:
+            print("=> [{0}] {1!r}".format(datetime.now().strftime("%d/%m %H:%M:%S"), call.error))
+            return
+        print("=> [{0}] {1}".format(datetime.now().strftime("%d/%m %H:%M:%S"), call.status))
+        print(pformat(dict(call.response.headers)))
+        if not call.kwargs.get("stream"):
+            try:
+                print(pformat(call.response.json()))
+            except ValueError:
+                print(call.response.text)
+
+
+class SkypeLatencyHistogram(SkypeObj):
+    """
+    A fixed-bucket histogram of durations.
+
+    Attributes:
+        bounds (float list):
+            Upper bound in seconds of each bucket, in ascending order.  A final bucket holds anything larger.
+        counts (int list):
+            Number of samples in each bucket.
+        count (int):
+            Total number of samples.
+        total (float):
+            Sum of all samples.
+        max (float):
+            Largest sample.
+    """
+
+    attrs = ("count", "mean", "max")
+
+    defaultBounds = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, bounds=defaultBounds):
+        """
+        Create an empty histogram.
+
+        Args:
+            bounds (float list): upper bound in seconds of each bucket
+        """
+        super(SkypeLatencyHistogram, self).__init__()
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, value):
+        """
+        Record a sample.
+
+        Args:
+            value (float): duration in seconds
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """
+        Estimate a percentile from the bucket counts, as the upper bound of the bucket containing it.
+
+        Args:
+            q (float): percentile to calculate, between 0 and 100
+
+        Returns:
+            float: estimated duration in seconds, or ``None`` with no samples
+        """
+        if not self.count:
+            return None
+        target = self.count * q / 100.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        """
+        Produce a summary of the samples.
+
+        Returns:
+            dict: ``count``, ``mean``, ``p50``, ``p90``, ``p99`` and ``max``, in seconds
+        """
+        return {"count": self.count, "mean": self.mean, "p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "max": self.max}
+
+
+class SkypeMetrics(SkypeInstrument):
+    """
+    An instrument that aggregates API activity per endpoint.
+
+    Attributes:
+        endpoints (dict):
+            Statistics keyed by ``(method, endpoint template)``: a dict with ``count``, ``errors`` (unexpected status
+            or no response), ``statuses`` (count per status code), ``sent`` and ``received`` bytes, ``retries`` and
+            ``latency`` (a :class:`SkypeLatencyHistogram`).
+        retries (int):
+            Number of requests retried after re-authenticating.
+        authRefreshes (dict):
+            Number of token refreshes, keyed by token type.
+    """
+
+    attrs = ("retries", "authRefreshes")
+
+    def __init__(self, bounds=SkypeLatencyHistogram.defaultBounds):
+        """
+        Create an empty aggregator.
+
+        Args:
+            bounds (float list): upper bounds in seconds of the latency histogram buckets
+        """
+        super(SkypeMetrics, self).__init__()
+        self.bounds = bounds
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all statistics collected so far.
+        """
+        with self.lock:
+            self.endpoints = {}
+            self.retries = 0
+            self.authRefreshes = {}
+
+    def postRequest(self, call):
+        key = (call.method, call.endpoint)
+        with self.lock:
+            try:
+                stats = self.endpoints[key]
+            except KeyError:
+                stats = self.endpoints[key] = {"count": 0, "errors": 0, "statuses": {}, "sent": 0, "received": 0,
+                                               "retries": 0, "latency": SkypeLatencyHistogram(self.bounds)}
+            stats["count"] += 1
+            if not call.ok:
+                stats["errors"] += 1
+            stats["statuses"][call.status] = stats["statuses"].get(call.status, 0) + 1
+            stats["sent"] += call.sent
+            stats["received"] += call.received
+            if call.retries:
+                stats["retries"] += 1
+            stats["latency"].add(call.latency)
+
+    def retry(self, error):
+        with self.lock:
+            self.retries += 1
+
+    def authRefresh(self, key):
+        with self.lock:
+            self.authRefreshes[key] = self.authRefreshes.get(key, 0) + 1
+
+    def summary(self):
+        """
+        Produce a plain summary of all endpoints, with latency histograms reduced to percentiles.
+
+        Returns:
+            dict: statistics keyed by ``"<method> <endpoint>"``
+        """
+        with self.lock:
+            return dict(("{0} {1}".format(*key), dict(stats, statuses=dict(stats["statuses"]),
+                                                      latency=stats["latency"].summary()))
+                        for key, stats in self.endpoints.items())
+
+
+class SkypeLoopProfiler(SkypeObj):
+    """
+    A timer for the stages of :meth:`.SkypeEventLoop.cycle`: the long-poll, parsing of each event, the
+    :meth:`~.SkypeEventLoop.onEvent` handler, and the acknowledgement.  Also measures queue lag, the delay between an
+    event's server timestamp and the start of its processing.
+
+    Assign an instance to :attr:`.SkypeEventLoop.profiler` to enable it.
+
+    Attributes:
+        stages (dict):
+            :class:`SkypeLatencyHistogram` for each stage (``poll``, ``parse``, ``handle`` and ``ack``).
+        types (dict):
+            Histograms for the ``parse``, ``handle`` and ``ack`` stages, keyed by event class name.
+        lag (:class:`SkypeLatencyHistogram`):
+            Queue lag of each event, in seconds.
+        thresholds (dict):
+            Durations in seconds, keyed by stage name or ``lag``, beyond which :attr:`callback` is called.
+        callback (method):
+            Receives ``(stage, seconds, event, profile)`` whenever a threshold is exceeded.  ``event`` is ``None`` for
+            the poll stage, and ``profile`` is the text of a sampled profile of a slow handler, or ``None``.
+        sampleRate (float):
+            Fraction of handler calls to run under :mod:`cProfile`, keeping the output of those found to be slow.
+        profiles (collections.deque):
+            Most recent slow handler profiles, as ``(event class name, seconds, profile text)`` tuples.
+    """
+
+    attrs = ("thresholds", "sampleRate")
+
+    lagBounds = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+    def __init__(self, thresholds=None, callback=None, sampleRate=0, keepProfiles=10):
+        """
+        Create a new profiler with empty statistics.
+
+        Args:
+            thresholds (dict): durations in seconds keyed by stage name or ``lag``
+            callback (method): function to call when a threshold is exceeded
+            sampleRate (float): fraction of handler calls to profile, between 0 and 1
+            keepProfiles (int): number of slow handler profiles to retain
+        """
+        super(SkypeLoopProfiler, self).__init__()
+        self.thresholds = dict(thresholds or {})
+        self.callback = callback
+        self.sampleRate = sampleRate
+        self.profiles = deque(maxlen=keepProfiles)
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all statistics collected so far.
+        """
+        self.stages = dict((stage, SkypeLatencyHistogram()) for stage in ("poll", "parse", "handle", "ack"))
+        self.types = {}
+        self.lag = SkypeLatencyHistogram(self.lagBounds)
+
+    def record(self, stage, seconds, event=None, profile=None):
+        """
+        Add a timing to the statistics, and check it against the threshold for the stage.
+
+        Args:
+            stage (str): stage name, or ``lag``
+            seconds (float): time taken
+            event (.SkypeEvent): event being processed, if any
+            profile (str): profile output for the timing, if sampled
+        """
+        if stage == "lag":
+            self.lag.add(seconds)
+        else:
+            self.stages[stage].add(seconds)
+            if event is not None:
+                name = type(event).__name__
+                try:
+                    types = self.types[name]
+                except KeyError:
+                    types = self.types[name] = dict((key, SkypeLatencyHistogram())
+                                                    for key in ("parse", "handle", "ack"))
+                types[stage].add(seconds)
+        threshold = self.thresholds.get(stage)
+        if threshold is not None and seconds > threshold:
+            if profile:
+                self.profiles.append((type(event).__name__, seconds, profile))
+            if self.callback:
+                self.callback(stage, seconds, event, profile)
+
+    @staticmethod
+    def eventLag(raw, now=None):
+        """
+        Calculate how long ago an event was produced, according to its ``time`` field.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+            now (float): current Unix timestamp
+
+        Returns:
+            float: lag in seconds, or ``None`` if the event has no usable timestamp
+        """
+        # Imported here, as the utilities module depends on this one through the connection class.
+        from .util import SkypeUtils
+        try:
+            value = SkypeUtils.parseTime(raw.get("time"), SkypeUtils.TimeMode.Naive)
+        except ValueError:
+            return None
+        return (now or time.time()) - (value - SkypeUtils.epoch).total_seconds()
+
+    def poll(self, loop):
+        """
+        Hook for :meth:`.SkypeEventLoop.cycle`: request a batch of raw events, timing the long-poll.
+
+        Args:
+            loop (.SkypeEventLoop): loop being run
+
+        Returns:
+            dict list: raw events, as provided by the API
+        """
+        start = time.time()
+        raws = loop.getRawEvents()
+        self.record("poll", time.time() - start)
+        return raws
+
+    def parse(self, loop, raw):
+        """
+        Hook for :meth:`.SkypeEventLoop.cycle`: create an event object, timing the parse and recording queue lag.
+
+        Args:
+            loop (.SkypeEventLoop): loop being run
+            raw (dict): raw event, as provided by the API
+
+        Returns:
+            .SkypeEvent: parsed event
+        """
+        start = time.time()
+        lag = self.eventLag(raw, start)
+        event = loop.parseEvent(raw)
+        self.record("parse", time.time() - start, event)
+        if lag is not None:
+            self.record("lag", lag, event)
+        return event
+
+    def handle(self, loop, event):
+        """
+        Hook for :meth:`.SkypeEventLoop.cycle`: call the loop's event handler, under :mod:`cProfile` if this call is
+        picked for sampling.
+
+        Args:
+            loop (.SkypeEventLoop): loop being run
+            event (.SkypeEvent): event to handle
+        """
+        profile = None
+        sampled = False
+        if self.sampleRate:
+            # Sampling and profiling modules are only loaded once enabled, as they're slow to import.
+            import random
+            sampled = random.random() < self.sampleRate
+        if sampled:
+            import cProfile
+            profiler = cProfile.Profile()
+            start = time.time()
+            profiler.runcall(loop.onEvent, event)
+            seconds = time.time() - start
+            threshold = self.thresholds.get("handle")
+            if threshold is not None and seconds > threshold:
+                profile = self.report(profiler)
+        else:
+            start = time.time()
+            loop.onEvent(event)
+            seconds = time.time() - start
+        self.record("handle", seconds, event, profile)
+
+    @staticmethod
+    def report(profiler):
+        """
+        Format the output of a handler profile, listing the most expensive calls first.
+
+        Args:
+            profiler (cProfile.Profile): completed profile
+
+        Returns:
+            str: profile text
+        """
+        import pstats
+        try:
+            from StringIO import StringIO
+        except ImportError:
+            from io import StringIO
+        out = StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(20)
+        return out.getvalue()
+
+    def ack(self, event):
+        """
+        Hook for :meth:`.SkypeEventLoop.cycle`: acknowledge an event, timing the request.
+
+        Args:
+            event (.SkypeEvent): event to acknowledge
+        """
+        start = time.time()
+        event.ack()
+        self.record("ack", time.time() - start, event)
+
+    def summary(self):
+        """
+        Produce a plain summary of all stages, reduced to percentiles.
+
+        Returns:
+            dict: ``stages`` and ``lag`` summaries, and ``types`` with per-stage summaries keyed by event class name
+        """
+        return {"stages": dict((stage, hist.summary()) for stage, hist in self.stages.items()),
+                "types": dict((name, dict((stage, hist.summary()) for stage, hist in types.items()))
+                              for name, types in self.types.items()),
+                "lag": self.lag.summary()}
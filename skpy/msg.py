@@ -1,10 +1,10 @@
 import base64
+from collections import Counter
 import json
 import re
 from datetime import datetime, date
 import time
 
-from bs4 import BeautifulSoup, Tag
 from requests import ConnectionError as RequestsConnectionError
 
 from .core import SkypeObj, SkypeEnum, SkypeApiException
@@ -13,6 +13,8 @@ from .conn import SkypeConnection
 
 
 def makeTag(name, string=None, **kwargs):
+    # bs4 is slow to load, so is only imported once messages are built or parsed.
+    from bs4 import Tag
     tag = Tag(name=name, attrs=kwargs)
     for key in kwargs:
         if kwargs[key] is None:
@@ -49,6 +51,24 @@ class SkypeMsg(SkypeObj):
             Recreated content string based on the field values.
         deleted (bool):
             Whether the message content was deleted by the sender.
+
+    Message classes are picked by :meth:`fromRaw` from a registry of raw message types.  Subclasses for types not
+    handled here can be added with :meth:`registerType`.
+    """
+
+    msgTypes = {}
+    """
+    dict: Mapping from raw message types to the :class:`SkypeMsg` subclasses that represent them.
+    """
+
+    unknownTypes = Counter()
+    """
+    collections.Counter: Number of messages seen of each raw message type missing from :attr:`msgTypes`.
+    """
+
+    emoteIndex = None
+    """
+    tuple: Lookups built by :meth:`emotes` from the current emoticon list, as (``items``, ``names``, ``trie``).
     """
 
     @staticmethod
@@ -133,6 +153,35 @@ class SkypeMsg(SkypeObj):
         """
         return """<a href="{0}">{1}</a>""".format(url, display or url)
 
+    @staticmethod
+    def emotes():
+        """
+        Build lookups of emoticon identifiers and shortcuts, or reuse them if the emoticon list hasn't changed.
+
+        Returns:
+            (dict, dict) tuple: mapping from identifiers and shortcuts to (``id``, ``shortcut``) pairs, and a trie of
+            shortcuts as nested dicts, with each complete shortcut's pair stored under the ``None`` key
+        """
+        items = SkypeUtils.static["items"]
+        index = SkypeMsg.emoteIndex
+        if index and index[0] is items:
+            return index[1:]
+        names = {}
+        trie = {}
+        # Earlier emoticons take precedence, as with a scan of the list.
+        for emote in items:
+            shortcuts = emote.get("shortcuts") or []
+            if shortcuts:
+                names.setdefault(emote["id"], (emote["id"], shortcuts[0]))
+            for shortcut in shortcuts:
+                names.setdefault(shortcut, (emote["id"], shortcut))
+                node = trie
+                for char in shortcut:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, (emote["id"], shortcut))
+        SkypeMsg.emoteIndex = (items, names, trie)
+        return names, trie
+
     @staticmethod
     def emote(shortcut):
         """
@@ -144,14 +193,48 @@ class SkypeMsg(SkypeObj):
         Returns:
             str: tag to render the emoticon
         """
-        for emote in SkypeUtils.static["items"]:
-            if shortcut == emote["id"]:
-                return """<ss type="{0}">{1}</ss>""".format(shortcut, emote["shortcuts"][0])
-            elif shortcut in emote["shortcuts"]:
-                return """<ss type="{0}">{1}</ss>""".format(emote["id"], shortcut)
+        names, _ = SkypeMsg.emotes()
+        if shortcut in names:
+            return """<ss type="{0}">{1}</ss>""".format(*names[shortcut])
         # No match, return the input as-is.
         return shortcut
 
+    @staticmethod
+    def emotify(text):
+        """
+        Replace all emoticon shortcuts in a string with emoticon tags, in a single pass.  Where shortcuts overlap, the
+        longest one starting earliest is used.
+
+        The text is otherwise left as-is, so should already be escaped if needed.
+
+        Args:
+            text (str): text containing shortcuts, such as ``:)`` or ``(wave)``
+
+        Returns:
+            str: text with emoticon tags
+        """
+        _, trie = SkypeMsg.emotes()
+        parts = []
+        start = pos = 0
+        length = len(text)
+        while pos < length:
+            node = trie
+            match = None
+            end = pos
+            while end < length and text[end] in node:
+                node = node[text[end]]
+                end += 1
+                if None in node:
+                    match = (node[None], end)
+            if match:
+                parts.append(text[start:pos])
+                parts.append("""<ss type="{0}">{1}</ss>""".format(*match[0]))
+                start = pos = match[1]
+            else:
+                pos += 1
+        parts.append(text[start:])
+        return "".join(parts)
+
     @staticmethod
     def mention(user):
         """
@@ -225,9 +308,9 @@ class SkypeMsg(SkypeObj):
     @classmethod
     def rawToFields(cls, raw={}):
         try:
-            msgTime = datetime.strptime(raw.get("originalarrivaltime", ""), "%Y-%m-%dT%H:%M:%S.%fZ")
+            msgTime = SkypeUtils.parseTime(raw.get("originalarrivaltime"))
         except ValueError:
-            msgTime = datetime.now()
+            msgTime = SkypeUtils.nowTime()
         fields = {"id": raw.get("id"),
                   "type": raw.get("messagetype"),
                   "time": msgTime,
@@ -236,6 +319,7 @@ class SkypeMsg(SkypeObj):
                   "chatId": SkypeUtils.chatToId(raw.get("conversationLink", "")),
                   "content": raw.get("content")}
         if fields["content"]:
+            from bs4 import BeautifulSoup
             fields.update(cls.contentToFields(BeautifulSoup(fields["content"], "html.parser")))
         return fields
 
@@ -243,26 +327,55 @@ class SkypeMsg(SkypeObj):
     def contentToFields(cls, content):
         return {}
 
+    @staticmethod
+    def registerType(*msgTypes):
+        """
+        Class decorator: use the decorated class in :meth:`fromRaw` for the given raw message types, replacing any class
+        already registered for them.
+
+        .. code-block:: python
+
+            @SkypeMsg.registerType("Poll")
+            class PollMsg(SkypeMsg):
+                ...
+
+        Args:
+            msgTypes (str list): raw message types to handle
+
+        Returns:
+            method: decorator function, ready to apply to a :class:`SkypeMsg` subclass
+        """
+        def decorator(msgCls):
+            for msgType in msgTypes:
+                SkypeMsg.msgTypes[msgType] = msgCls
+            return msgCls
+        return decorator
+
     @classmethod
     def fromRaw(cls, skype=None, raw={}):
-        msgCls = {"Text": SkypeTextMsg,
-                  "RichText": SkypeTextMsg,
-                  "RichText/Contacts": SkypeContactMsg,
-                  "RichText/Location": SkypeLocationMsg,
-                  "RichText/Media_GenericFile": SkypeFileMsg,
-                  "RichText/UriObject": SkypeImageMsg,
-                  "RichText/Media_AudioMsg": SkypeAudioMsg,
-                  "RichText/Media_Video": SkypeVideoMsg,
-                  "RichText/Media_Card": SkypeCardMsg,
-                  "Event/Call": SkypeCallMsg,
-                  "ThreadActivity/TopicUpdate": SkypeTopicPropertyMsg,
-                  "ThreadActivity/JoiningEnabledUpdate": SkypeOpenPropertyMsg,
-                  "ThreadActivity/HistoryDisclosedUpdate": SkypeHistoryPropertyMsg,
-                  "ThreadActivity/AddMember": SkypeAddMemberMsg,
-                  "ThreadActivity/RoleUpdate": SkypeChangeMemberMsg,
-                  "ThreadActivity/DeleteMember": SkypeRemoveMemberMsg}.get(raw.get("messagetype"), cls)
+        msgType = raw.get("messagetype")
+        msgCls = SkypeMsg.msgTypes.get(msgType)
+        if msgCls is None:
+            SkypeMsg.unknownTypes[msgType] += 1
+            msgCls = cls
         return msgCls(skype, raw, **msgCls.rawToFields(raw))
 
+    def __getstate__(self):
+        """
+        Pickle only the raw message and fields from :attr:`attrs`, as carried by events sent to a
+        :class:`.SkypeEventPool` worker.  Unpickled messages have :attr:`skype` set to ``None``.
+
+        Returns:
+            dict: instance state
+        """
+        state = {attr: self.__dict__[attr] for attr in self.attrs if attr in self.__dict__}
+        state["raw"] = self.raw
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.skype = None
+
     @property
     def html(self):
         # If not overridden in a subclass, just return the existing content.
@@ -306,6 +419,7 @@ class SkypeMsg(SkypeObj):
         return self.edit("")
 
 
+@SkypeMsg.registerType("Text", "RichText")
 class SkypeTextMsg(SkypeMsg):
     """
     A message containing rich or plain text.
@@ -363,6 +477,7 @@ class SkypeTextMsg(SkypeMsg):
         return text
 
 
+@SkypeMsg.registerType("RichText/Contacts")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds(users=("contact",))
 class SkypeContactMsg(SkypeMsg):
@@ -396,6 +511,7 @@ class SkypeContactMsg(SkypeMsg):
         return tag
 
 
+@SkypeMsg.registerType("RichText/Location")
 @SkypeUtils.initAttrs
 class SkypeLocationMsg(SkypeMsg):
     """
@@ -436,7 +552,7 @@ class SkypeLocationMsg(SkypeMsg):
 
     @property
     def html(self):
-        timestamp = self.time or datetime.now()
+        timestamp = SkypeUtils.asDatetime(self.time)
         params = {}
         for attr in ("latitude", "longitude", "altitude", "speed", "course"):
             if getattr(self, attr):
@@ -453,6 +569,7 @@ class SkypeLocationMsg(SkypeMsg):
         return tag
 
 
+@SkypeMsg.registerType("RichText/Media_Card")
 @SkypeUtils.initAttrs
 class SkypeCardMsg(SkypeMsg):
     """
@@ -507,7 +624,7 @@ class SkypeCardMsg(SkypeMsg):
                                              "buttons": [button.data for button in self.buttons]},
                                  "contentType": "application/vnd.microsoft.card.hero"}],
                 "type": "message/card",
-                "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")}
+                "timestamp": SkypeUtils.formatTime(datetime.now())}
         if self.chatId:
             data["recipient"] = {"id": self.chatId}
             userType, userId = self.chatId.split(":", 1)
@@ -528,6 +645,7 @@ class SkypeCardMsg(SkypeMsg):
         return tag
 
 
+@SkypeMsg.registerType("RichText/Media_GenericFile")
 @SkypeUtils.initAttrs
 class SkypeFileMsg(SkypeMsg):
     """
@@ -630,6 +748,7 @@ class SkypeFileMsg(SkypeMsg):
         return tag
 
 
+@SkypeMsg.registerType("RichText/UriObject")
 @SkypeUtils.initAttrs
 class SkypeImageMsg(SkypeFileMsg):
     """
@@ -649,6 +768,7 @@ class SkypeImageMsg(SkypeFileMsg):
         return tag
 
 
+@SkypeMsg.registerType("RichText/Media_AudioMsg")
 @SkypeUtils.initAttrs
 class SkypeAudioMsg(SkypeFileMsg):
     """
@@ -667,6 +787,7 @@ class SkypeAudioMsg(SkypeFileMsg):
         return tag
 
 
+@SkypeMsg.registerType("RichText/Media_Video")
 @SkypeUtils.initAttrs
 class SkypeVideoMsg(SkypeFileMsg):
     """
@@ -685,6 +806,7 @@ class SkypeVideoMsg(SkypeFileMsg):
         return tag
 
 
+@SkypeMsg.registerType("Event/Call")
 @SkypeUtils.initAttrs
 @SkypeUtils.convertIds("users")
 class SkypeCallMsg(SkypeMsg):
@@ -749,13 +871,14 @@ class SkypePropertyMsg(SkypeMsg):
 
     def tagTemplate(self, root):
         # Subclasses of this class have the same message structure.
-        timestamp = self.time or datetime.now()
+        timestamp = SkypeUtils.asDatetime(self.time)
         tag = makeTag(root)
         tag.append(makeTag("eventtime", str(int(time.mktime(timestamp.timetuple())))))
         tag.append(makeTag("initiator", "8:{0}".format(self.userId) if self.userId else ""))
         return tag
 
 
+@SkypeMsg.registerType("ThreadActivity/TopicUpdate")
 @SkypeUtils.initAttrs
 class SkypeTopicPropertyMsg(SkypePropertyMsg):
     """
@@ -784,6 +907,7 @@ class SkypeTopicPropertyMsg(SkypePropertyMsg):
         return tag
 
 
+@SkypeMsg.registerType("ThreadActivity/JoiningEnabledUpdate")
 @SkypeUtils.initAttrs
 class SkypeOpenPropertyMsg(SkypePropertyMsg):
     """
@@ -812,6 +936,7 @@ class SkypeOpenPropertyMsg(SkypePropertyMsg):
         return tag
 
 
+@SkypeMsg.registerType("ThreadActivity/HistoryDisclosedUpdate")
 @SkypeUtils.initAttrs
 class SkypeHistoryPropertyMsg(SkypePropertyMsg):
     """
@@ -857,6 +982,7 @@ class SkypeMemberMsg(SkypePropertyMsg):
     attrs = SkypeMsg.attrs + ("memberId",)
 
 
+@SkypeMsg.registerType("ThreadActivity/AddMember")
 @SkypeUtils.initAttrs
 class SkypeAddMemberMsg(SkypeMemberMsg):
     """
@@ -879,6 +1005,7 @@ class SkypeAddMemberMsg(SkypeMemberMsg):
         return tag
 
 
+@SkypeMsg.registerType("ThreadActivity/RoleUpdate")
 @SkypeUtils.initAttrs
 class SkypeChangeMemberMsg(SkypeMemberMsg):
     """
@@ -911,6 +1038,7 @@ class SkypeChangeMemberMsg(SkypeMemberMsg):
         return tag
 
 
+@SkypeMsg.registerType("ThreadActivity/DeleteMember")
 @SkypeUtils.initAttrs
 class SkypeRemoveMemberMsg(SkypeMemberMsg):
     """
@@ -0,0 +1,254 @@
+from collections import deque
+import os
+import threading
+import zlib
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+import requests
+
+from .core import SkypeObj, SkypeApiException
+from .main import Skype
+from .replay import SkypeStubConnection
+from .router import SkypeEventRouter
+
+
+class SkypeWorkerConnection(SkypeStubConnection):
+    """
+    The connection used by event handlers in worker processes of a :class:`SkypeEventPool`.
+
+    Like :class:`.SkypeStubConnection`, no requests are sent.  Any that would change state on the server (that is, all
+    but ``GET`` requests) are collected as replies, to be made by the parent process on its own connection.  Read-only
+    requests return empty responses.
+
+    Attributes:
+        replies (list):
+            Requests to forward, as (``method``, ``url``, ``codes``, ``auth``, ``headers``, ``kwargs``) tuples.
+    """
+
+    def __init__(self, userId=None):
+        super(SkypeWorkerConnection, self).__init__(userId)
+        self.replies = []
+
+    def __call__(self, method, url, codes=(200, 201, 202, 204, 207), auth=None, headers=None, **kwargs):
+        if not method == "GET":
+            self.replies.append((method, url, codes, auth, headers, kwargs))
+        return super(SkypeWorkerConnection, self).__call__(method, url, codes, auth, headers, **kwargs)
+
+
+class SkypeEventPool(SkypeObj):
+    """
+    A dispatcher of events to a handler running in other processes, for CPU-bound processing that would otherwise be
+    limited to one core by the interpreter lock.
+
+    Events are sharded by conversation across single-process workers, so events from each conversation are handled in
+    the order they arrived.  Events are sent in compact form (see :meth:`.SkypeEvent.__getstate__`), along with the
+    parent's cached copy of the conversation if there is one.
+
+    Handlers receive events attached to a worker-side :class:`.Skype` instance using a :class:`SkypeWorkerConnection`,
+    so they can reply with methods such as :meth:`.SkypeChat.sendMsg` as usual.  Once a handler returns, its requests
+    are queued, and made in the parent process on the parent's connection by a dedicated sender thread, so that slow
+    or rate-limited replies don't hold up collecting results from the workers.  Lookups that would need an API call in
+    the worker (for example, fetching contacts) return empty data.
+
+    The handler must be picklable, i.e. a function defined at the top level of a module.
+
+    Attach a pool to an event loop through :attr:`.SkypeEventLoop.pool`, or call :meth:`dispatch` directly.
+
+    Attributes:
+        skype (:class:`.Skype`):
+            Parent Skype instance, whose connection sends the replies.
+        handler (method):
+            Function to call with each event, in a worker process.
+        processes (int):
+            Number of worker processes, and therefore of shards.
+        stats (dict):
+            Counters of ``events`` handled, ``replies`` sent, and ``errors`` from handlers or replies.
+        lastError (Exception):
+            Most recent such error.
+    """
+
+    attrs = ("processes", "stats")
+
+    worker = None
+    """
+    :class:`.Skype`: Within a worker process, the instance that events are attached to.
+    """
+
+    def __init__(self, skype, handler, processes=None):
+        """
+        Create a new pool.  Worker processes are started when first needed.
+
+        Args:
+            skype (Skype): parent Skype instance
+            handler (method): function to call with each event
+            processes (int): number of worker processes, defaults to the number of CPUs
+        """
+        super(SkypeEventPool, self).__init__(skype)
+        self.handler = handler
+        self.processes = processes or os.cpu_count() or 1
+        self.stats = {"events": 0, "replies": 0, "errors": 0}
+        self.lastError = None
+        self.shards = [None] * self.processes
+        self.lock = threading.Lock()
+        self.outbox = deque()
+        self.cond = threading.Condition()
+        self.sender = None
+        self.stopping = False
+
+    @staticmethod
+    def initWorker(userId):
+        """
+        Set up the worker-side Skype instance in a new worker process.
+
+        Args:
+            userId (str): identifier of the connected user
+        """
+        skype = Skype(connect=False)
+        skype.conn = SkypeWorkerConnection(userId)
+        SkypeEventPool.worker = skype
+
+    @staticmethod
+    def work(handler, msgsHost, event, chat=None):
+        """
+        Handle a single event in a worker process.
+
+        Args:
+            handler (method): function to call with the event
+            msgsHost (str): current messaging API base URL of the parent's connection
+            event (.SkypeEvent): event to handle
+            chat (.SkypeChat): cached copy of the event's conversation from the parent process
+
+        Returns:
+            list: requests made by the handler, as :attr:`SkypeWorkerConnection.replies`
+        """
+        skype = SkypeEventPool.worker
+        del skype.conn.replies[:]
+        skype.conn.msgsHost = msgsHost
+        event.skype = skype
+        if chat:
+            chat.skype = skype
+            skype.chats.cache[chat.id] = chat
+        handler(event)
+        return skype.conn.replies
+
+    def shard(self, event):
+        """
+        Pick the worker for an event, based on its conversation (or user, if it has no conversation).
+
+        Args:
+            event (.SkypeEvent): event to handle
+
+        Returns:
+            (int, str) tuple: worker index, and conversation identifier
+        """
+        _, chatId, userId = SkypeEventRouter.rawIds(event.raw or {})
+        key = chatId or userId or ""
+        return zlib.crc32(key.encode("utf-8")) % self.processes, chatId
+
+    def executor(self, index):
+        with self.lock:
+            if not self.shards[index]:
+                if not ProcessPoolExecutor:
+                    raise RuntimeError("Process pools require concurrent.futures")
+                self.shards[index] = ProcessPoolExecutor(max_workers=1, initializer=SkypeEventPool.initWorker,
+                                                         initargs=(self.skype.userId,))
+            return self.shards[index]
+
+    def dispatch(self, event):
+        """
+        Send an event to its worker.  Replies are made from the sender thread once the handler completes.
+
+        Args:
+            event (.SkypeEvent): event to handle
+
+        Returns:
+            concurrent.futures.Future: result of the handler, as a list of replies
+        """
+        index, chatId = self.shard(event)
+        chat = self.skype.chats.cache.get(chatId) if chatId else None
+        msgsHost = self.skype.conn.msgsHost
+        future = self.executor(index).submit(SkypeEventPool.work, self.handler, msgsHost, event, chat)
+        self.startSender()
+        future.add_done_callback(self.collect)
+        return future
+
+    def collect(self, future):
+        # Called by the executor as each handler completes, so only queue the result here.
+        with self.cond:
+            self.outbox.append(future)
+            self.cond.notify()
+
+    def startSender(self):
+        with self.cond:
+            if not (self.sender and self.sender.is_alive()):
+                self.stopping = False
+                self.sender = threading.Thread(target=self.run, name="SkypeEventPool-sender")
+                self.sender.daemon = True
+                self.sender.start()
+
+    def run(self):
+        """
+        Main loop of the sender thread: make the replies of each completed handler in turn, until stopped with nothing
+        left to send.
+        """
+        while True:
+            with self.cond:
+                while not self.outbox and not self.stopping:
+                    self.cond.wait()
+                if not self.outbox:
+                    return
+                future = self.outbox.popleft()
+            self.reply(future)
+
+    def reply(self, future):
+        """
+        Make the requests collected from a completed handler on the parent's connection.
+
+        Args:
+            future (concurrent.futures.Future): completed result of :meth:`work`
+        """
+        try:
+            replies = future.result()
+        except Exception as e:
+            self.error(e)
+            return
+        with self.lock:
+            self.stats["events"] += 1
+        for method, url, codes, auth, headers, kwargs in replies:
+            try:
+                self.skype.conn(method, url, codes, auth=auth, headers=headers, **kwargs)
+            except (SkypeApiException, requests.RequestException) as e:
+                self.error(e)
+            else:
+                with self.lock:
+                    self.stats["replies"] += 1
+
+    def error(self, e):
+        with self.lock:
+            self.stats["errors"] += 1
+            self.lastError = e
+
+    def close(self, wait=True):
+        """
+        Shut down all worker processes.
+
+        Args:
+            wait (bool): whether to wait for queued events to be handled, and their replies sent
+        """
+        with self.lock:
+            shards, self.shards = self.shards, [None] * self.processes
+        for executor in shards:
+            if executor:
+                executor.shutdown(wait)
+        if not wait:
+            # Handlers may still complete, so leave the sender running for their replies.
+            return
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.sender and self.sender.is_alive() and threading.current_thread() is not self.sender:
+            self.sender.join()
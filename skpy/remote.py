@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from .core import SkypeObj, SkypeApiException
+from .conn import SkypeConnection
+
+
+class SkypeCachedResource(SkypeObj):
+    """
+    A public JSON document fetched from an external API, cached in memory and optionally on disk.
+
+    The first read loads the document from disk if a copy exists in :attr:`cacheDir`, otherwise fetches it.  Copies
+    older than :attr:`ttl` seconds are still returned, but trigger a refresh in a background thread.  Refreshes are
+    conditional on the ``ETag`` and ``Last-Modified`` headers of the previous response, so unchanged documents aren't
+    downloaded again.
+
+    .. code-block:: python
+
+        SkypeCachedResource.cacheDir = os.path.expanduser("~/.cache/skpy")
+
+    Attributes:
+        name (str):
+            Identifier for the resource, also used as the name of its cache file.
+        url (str):
+            Location of the document, or a function producing it on each fetch.
+        params (dict):
+            Query parameters to include in requests.
+        ttl (int):
+            Number of seconds before a cached copy is refreshed.
+        data (dict):
+            Cached copy of the document, or ``None`` if not yet loaded.
+        fetched (float):
+            Time the cached copy was last confirmed as current, in seconds since the epoch.
+        stats (dict):
+            Counters of ``fetches`` (full downloads), ``revalidations`` (unchanged responses) and ``failures``.
+    """
+
+    attrs = ("name", "ttl", "fetched")
+
+    cacheDir = None
+    """
+    str: Directory to store cached documents in, shared by all resources, or ``None`` to only cache in memory.
+    """
+
+    def __init__(self, name, url, params=None, ttl=86400):
+        """
+        Create a new resource.  Nothing is loaded until first read.
+
+        Args:
+            name (str): identifier for the resource
+            url (str): location of the document, or a function producing it
+            params (dict): query parameters to include in requests
+            ttl (int): number of seconds before a cached copy is refreshed
+        """
+        super(SkypeCachedResource, self).__init__()
+        self.name = name
+        self.url = url
+        self.params = params
+        self.ttl = ttl
+        self.data = None
+        self.fetched = None
+        self.etag = None
+        self.modified = None
+        self.source = None
+        self.stats = {"fetches": 0, "revalidations": 0, "failures": 0}
+        self.lock = threading.Lock()
+        self.refreshing = None
+
+    @property
+    def path(self):
+        return os.path.join(self.cacheDir, "{0}.json".format(self.name)) if self.cacheDir else None
+
+    @property
+    def stale(self):
+        return self.fetched is None or (self.ttl is not None and self.fetched + self.ttl < time.time())
+
+    def get(self, wait=False):
+        """
+        Retrieve the document, loading or fetching it if needed.
+
+        Args:
+            wait (bool): whether to refresh a stale copy before returning, rather than in the background
+
+        Returns:
+            dict: document content
+        """
+        if self.data is None:
+            with self.lock:
+                if self.data is None:
+                    self.load()
+                if self.data is None:
+                    self.fetch()
+                    return self.data
+        if self.stale:
+            if wait:
+                self.refresh()
+            else:
+                self.refreshAsync()
+        return self.data
+
+    def load(self):
+        """
+        Read the cached copy from disk, if one exists.
+
+        Returns:
+            bool: whether a copy was loaded
+        """
+        path = self.path
+        if not path or not os.path.isfile(path):
+            return False
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            data = entry["data"]
+        except (ValueError, KeyError, OSError):
+            # A corrupt cache file is as good as a missing one.
+            return False
+        self.data = data
+        self.fetched = entry.get("fetched")
+        self.etag = entry.get("etag")
+        self.modified = entry.get("modified")
+        self.source = entry.get("source")
+        return True
+
+    def save(self):
+        """
+        Write the cached copy to disk, if a cache directory is set.
+        """
+        path = self.path
+        if not path or self.data is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"data": self.data, "fetched": self.fetched, "etag": self.etag, "modified": self.modified,
+                 "source": self.source}
+        # Imported here, as the utilities module holds the shared resources defined with this class.
+        from .util import SkypeUtils
+        SkypeUtils.atomicWrite(path, json.dumps(entry))
+
+    def fetch(self):
+        """
+        Request the document, sending validators from any cached copy, and update the cache with the response.
+        """
+        url = self.url() if callable(self.url) else self.url
+        headers = {}
+        # Validators only apply to the same document, so skip them if the location has moved.
+        if self.data is not None and url == self.source:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.modified:
+                headers["If-Modified-Since"] = self.modified
+        resp = SkypeConnection.externalCall("GET", url, codes=(200, 304), params=self.params, headers=headers)
+        if resp.status_code == 304:
+            self.stats["revalidations"] += 1
+        else:
+            self.data = resp.json()
+            self.etag = resp.headers.get("ETag")
+            self.modified = resp.headers.get("Last-Modified")
+            self.source = url
+            self.stats["fetches"] += 1
+        self.fetched = time.time()
+        self.save()
+
+    def refresh(self):
+        """
+        Revalidate the cached copy now.  Failures are counted, and the existing copy kept.
+        """
+        with self.lock:
+            try:
+                self.fetch()
+            except (SkypeApiException, requests.RequestException, ValueError, OSError):
+                self.stats["failures"] += 1
+                if self.data is None:
+                    raise
+                # Hold off retrying until the next expiry, rather than on every read.
+                self.fetched = time.time()
+
+    def refreshAsync(self):
+        """
+        Start revalidating the cached copy in a background thread, unless already in progress.
+        """
+        with self.lock:
+            if self.refreshing and self.refreshing.is_alive():
+                return
+            self.refreshing = threading.Thread(target=self.refresh, name="SkypeCachedResource-{0}".format(self.name))
+            self.refreshing.daemon = True
+            self.refreshing.start()
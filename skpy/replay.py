@@ -0,0 +1,205 @@
+import gzip
+import json
+import threading
+import time
+
+import requests
+
+from .core import SkypeObj
+from .conn import SkypeConnection
+
+
+class SkypeEventRecorder(SkypeObj):
+    """
+    A writer of raw events to a gzip-compressed log, one JSON object per line.
+
+    Attach an instance to :attr:`.Skype.recorder` to capture every raw event as it is polled.  Each line holds the
+    receive time (``time``, seconds since the epoch) and the raw event itself (``event``).
+
+    Attributes:
+        path (str):
+            Location of the log file.
+        count (int):
+            Number of events written so far.
+    """
+
+    attrs = ("path", "count")
+
+    def __init__(self, path):
+        """
+        Open a log for writing.  Existing logs are appended to.
+
+        Args:
+            path (str): location of the log file
+        """
+        super(SkypeEventRecorder, self).__init__()
+        self.path = path
+        self.count = 0
+        self.file = gzip.open(path, "at")
+        self.lock = threading.Lock()
+
+    def record(self, events):
+        """
+        Write a batch of raw events to the log.
+
+        Args:
+            events (dict list): raw events, as provided by the API
+        """
+        now = time.time()
+        lines = "".join(json.dumps({"time": now, "event": raw}) + "\n" for raw in events)
+        with self.lock:
+            self.file.write(lines)
+            self.file.flush()
+            self.count += len(events)
+
+    def close(self):
+        """
+        Flush and close the log.
+        """
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SkypeStubConnection(SkypeConnection):
+    """
+    A connection that never touches the network.  Every call succeeds with an empty JSON response, and is recorded.
+
+    Attributes:
+        calls (list):
+            Requests made so far, as (``method``, ``url``, ``kwargs``) tuples.
+    """
+
+    def __init__(self, userId=None):
+        """
+        Create a new stub connection, appearing connected as the given user.
+
+        Args:
+            userId (str): identifier of the pretend user
+        """
+        super(SkypeStubConnection, self).__init__()
+        self.userId = userId or "stub"
+        self.calls = []
+
+    @property
+    def connected(self):
+        return True
+
+    def verifyToken(self, auth):
+        pass
+
+    def __call__(self, method, url, codes=(200, 201, 202, 204, 207), auth=None, headers=None, **kwargs):
+        self.calls.append((method, url, kwargs))
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp._content = b"{}"
+        return resp
+
+
+class SkypeEventReplay(SkypeObj):
+    """
+    A driver to feed a log written by :class:`SkypeEventRecorder` through an event loop, without a live connection.
+
+    The loop's connection is replaced by a :class:`SkypeStubConnection`, so handlers can send messages or acknowledge
+    events as normal, and their requests are captured instead of sent.
+
+    Attributes:
+        path (str):
+            Location of the log file.
+        loop (:class:`.SkypeEventLoop`):
+            Event loop receiving the events.
+        speed (float):
+            Playback rate relative to the original timing (e.g. ``2`` for double speed), or ``None`` to replay as fast
+            as possible.
+    """
+
+    attrs = ("path", "speed")
+
+    def __init__(self, path, loop, speed=None):
+        """
+        Prepare an event loop for replay.
+
+        Args:
+            path (str): location of the log file
+            loop (SkypeEventLoop): event loop to receive the events
+            speed (float): playback rate, or ``None`` for maximum speed
+        """
+        super(SkypeEventReplay, self).__init__()
+        self.path = path
+        self.loop = loop
+        self.speed = speed
+        if not isinstance(loop.conn, SkypeStubConnection):
+            loop.conn = SkypeStubConnection(loop.conn.userId)
+
+    @staticmethod
+    def readLog(path):
+        """
+        Read a log written by :class:`SkypeEventRecorder`, without an event loop.
+
+        Args:
+            path (str): location of the log file
+
+        Returns:
+            generator: iterator of (``time``, ``raw``) tuples
+        """
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["time"], entry["event"]
+
+    def events(self):
+        """
+        Read the log.
+
+        Returns:
+            generator: iterator of (``time``, ``raw``) tuples
+        """
+        return self.readLog(self.path)
+
+    def run(self):
+        """
+        Replay the whole log through the event loop, parsing each event and passing it to
+        :meth:`.SkypeEventLoop.onEvent`, then acknowledging it if :attr:`~.SkypeEventLoop.autoAck` is set.  Events
+        that the loop doesn't want (see :meth:`.SkypeEventLoop.wantsEvent`) are skipped.
+
+        Returns:
+            dict: summary statistics -- ``events`` processed, wall-clock ``elapsed`` seconds, ``rate`` of events per
+            second, and ``mean``, ``median``, ``p99`` and ``max`` per-event processing latency in seconds
+        """
+        latencies = []
+        start = time.time()
+        first = None
+        for recTime, raw in self.events():
+            if self.speed:
+                if first is None:
+                    first = recTime
+                delay = start + (recTime - first) / self.speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            began = time.perf_counter()
+            if not self.loop.wantsEvent(raw):
+                self.loop.skipEvent(raw)
+                latencies.append(time.perf_counter() - began)
+                continue
+            event = self.loop.parseEvent(raw)
+            self.loop.onEvent(event)
+            if getattr(self.loop, "autoAck", False):
+                event.ack()
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.time() - start
+        latencies.sort()
+        count = len(latencies)
+        return {"events": count,
+                "elapsed": elapsed,
+                "rate": count / elapsed if elapsed else 0.0,
+                "mean": sum(latencies) / count if count else 0.0,
+                "median": latencies[count // 2] if count else 0.0,
+                "p99": latencies[min(count - 1, int(count * 0.99))] if count else 0.0,
+                "max": latencies[-1] if count else 0.0}
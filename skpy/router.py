@@ -0,0 +1,316 @@
+import re
+import threading
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+from .core import SkypeObj
+from .util import SkypeUtils
+from .event import SkypeEvent
+
+
+class SkypeEventRoute(SkypeObj):
+    """
+    A handler registered with a :class:`SkypeEventRouter`, along with the events it should receive.
+
+    Attributes:
+        fn (method):
+            Handler, called with each matching event.
+        cls (type):
+            :class:`.SkypeEvent` subclass to match, including its own subclasses.
+        chatIds (set):
+            Conversation identifiers to match, or ``None`` for any.
+        userIds (set):
+            Sender (or presence subject) identifiers to match, or ``None`` for any.
+        msgTypes (set):
+            Raw message types to match, or ``None`` for any.
+        pattern (re.Pattern):
+            Expression to search for in the raw message content, or ``None``.
+        concurrency (int):
+            If set, the handler runs on its own pool of this many threads, rather than in the event loop.
+        stop (bool):
+            Whether to skip any routes registered after this one when it matches.
+        calls (int):
+            Number of events passed to the handler.
+        errors (int):
+            Number of failures of the handler when running on its own threads.
+        lastError (Exception):
+            Most recent such failure.
+    """
+
+    attrs = ("fn", "cls", "chatIds", "userIds", "msgTypes", "pattern", "concurrency", "stop")
+
+    def __init__(self, fn, cls=SkypeEvent, chat=None, user=None, msgType=None, content=None, concurrency=None,
+                 stop=False):
+        """
+        Create a new route.  Filters accept either a single value or a list of values.
+
+        Args:
+            fn (method): handler to call with each matching event
+            cls (type): event class to match
+            chat (str or str list): conversation identifiers to match
+            user (str or str list): user identifiers to match
+            msgType (str or str list): raw message types to match
+            content (str or re.Pattern): regular expression to search for in message content
+            concurrency (int): number of threads to run the handler on, or ``None`` to run it inline
+            stop (bool): whether to skip later routes when this one matches
+        """
+        super(SkypeEventRoute, self).__init__()
+        self.fn = fn
+        self.cls = cls
+        self.chatIds = self.toSet(chat)
+        self.userIds = self.toSet(user)
+        self.msgTypes = self.toSet(msgType)
+        self.pattern = re.compile(content) if isinstance(content, str) else content
+        self.concurrency = concurrency
+        self.stop = stop
+        self.calls = 0
+        self.errors = 0
+        self.lastError = None
+        self.pool = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def toSet(value):
+        if value is None:
+            return None
+        return set([value]) if isinstance(value, str) else set(value)
+
+    def matches(self, res, chatId, userId, content=True):
+        """
+        Check the filters of this route against the fields of a raw event.
+
+        Args:
+            res (dict): raw resource of the event
+            chatId (str): conversation identifier of the event
+            userId (str): user identifier of the event
+            content (bool): whether to check the content pattern
+
+        Returns:
+            bool: whether all filters match
+        """
+        if self.chatIds is not None and chatId not in self.chatIds:
+            return False
+        if self.userIds is not None and userId not in self.userIds:
+            return False
+        if self.msgTypes is not None and res.get("messagetype") not in self.msgTypes:
+            return False
+        if content and self.pattern is not None and not self.pattern.search(res.get("content") or ""):
+            return False
+        return True
+
+    def call(self, event):
+        """
+        Pass an event to the handler, either inline or on the route's thread pool.
+
+        Args:
+            event (.SkypeEvent): matching event
+        """
+        with self.lock:
+            self.calls += 1
+            pool = self.pool
+            if self.concurrency and not pool:
+                if not ThreadPoolExecutor:
+                    raise RuntimeError("Route concurrency requires concurrent.futures")
+                pool = self.pool = ThreadPoolExecutor(max_workers=self.concurrency)
+            if pool:
+                # Submit while holding the lock, so that close() can't shut the pool down in between.
+                pool.submit(self.run, event)
+                return
+        self.fn(event)
+
+    def run(self, event):
+        try:
+            self.fn(event)
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+                self.lastError = e
+
+    def close(self, wait=True):
+        """
+        Shut down the route's thread pool, if it has one.
+
+        Args:
+            wait (bool): whether to wait for queued events to be handled
+        """
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool:
+            pool.shutdown(wait)
+
+
+class SkypeEventRouter(SkypeObj):
+    """
+    A dispatcher of events to handlers, based on event class, conversation, sender, message type or content.
+
+    Routes are checked in the order they were added.  For each event class, the routes that could apply are worked out
+    once and cached, so an event only visits handlers registered for its class or one of its base classes.
+
+    Attach a router to an event loop through :attr:`.SkypeEventLoop.router`.  The loop then only creates event objects
+    for raw events that some route could match, and passes them to the router from :meth:`.SkypeEventLoop.onEvent`.
+
+    .. code-block:: python
+
+        router = SkypeEventRouter()
+
+        @router.route(SkypeNewMessageEvent, content=r"^!ping\\b")
+        def ping(event):
+            event.msg.chat.sendMsg("Pong!")
+
+    Attributes:
+        routes (:class:`SkypeEventRoute` list):
+            All registered routes.
+    """
+
+    attrs = ("routes",)
+
+    def __init__(self):
+        super(SkypeEventRouter, self).__init__()
+        self.routes = []
+        self.table = {}
+
+    def add(self, fn, cls=SkypeEvent, **kwargs):
+        """
+        Register a handler.  See :class:`SkypeEventRoute` for the accepted filters.
+
+        Args:
+            fn (method): handler to call with each matching event
+            cls (type): event class to match
+
+        Returns:
+            SkypeEventRoute: the new route
+        """
+        route = SkypeEventRoute(fn, cls, **kwargs)
+        self.routes = self.routes + [route]
+        self.table = {}
+        return route
+
+    def route(self, cls=SkypeEvent, **kwargs):
+        """
+        Method decorator: register the decorated function as a handler.  Arguments are as for :meth:`add`.
+        """
+        def decorator(fn):
+            self.add(fn, cls, **kwargs)
+            return fn
+        return decorator
+
+    def remove(self, route):
+        """
+        Unregister a route, shutting down its thread pool if it has one.
+
+        Args:
+            route (SkypeEventRoute): route returned by :meth:`add`
+        """
+        self.routes = [other for other in self.routes if other is not route]
+        self.table = {}
+        route.close()
+
+    def candidates(self, cls):
+        """
+        Look up the routes registered for an event class or any of its base classes.
+
+        Args:
+            cls (type): event class
+
+        Returns:
+            :class:`SkypeEventRoute` tuple: matching routes, in order of registration
+        """
+        return self.lookup(cls)[0]
+
+    def lookup(self, cls):
+        try:
+            return self.table[cls]
+        except KeyError:
+            routes = tuple(route for route in self.routes if issubclass(cls, route.cls))
+            # Only extract identifiers from raw events when some route filters on them.
+            needIds = any(route.chatIds is not None or route.userIds is not None for route in routes)
+            entry = self.table[cls] = (routes, needIds)
+            return entry
+
+    @staticmethod
+    def rawIds(raw):
+        """
+        Extract the conversation and user identifiers that a raw event applies to.
+
+        Returns:
+            (dict, str, str) tuple: raw resource, conversation identifier, and user identifier
+        """
+        res = raw.get("resource", {})
+        link = res.get("conversationLink")
+        if link:
+            chatId = SkypeUtils.chatToId(link)
+        elif raw.get("resourceType") in ("ConversationUpdate", "ThreadUpdate"):
+            chatId = res.get("id")
+        else:
+            chatId = None
+        link = res.get("from") or res.get("selfLink")
+        return res, chatId, SkypeUtils.userToId(link) if link else None
+
+    def match(self, raw, cls=None, content=True):
+        """
+        Find the routes that apply to a raw event, stopping at the first matching route marked as ``stop``.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+            cls (type): event class, if already known
+            content (bool): whether to check content patterns
+
+        Returns:
+            :class:`SkypeEventRoute` list: matching routes
+        """
+        routes, needIds = self.lookup(cls or SkypeEvent.rawToClass(raw))
+        if not routes:
+            return []
+        if needIds:
+            res, chatId, userId = self.rawIds(raw)
+        else:
+            res, chatId, userId = raw.get("resource", {}), None, None
+        matched = []
+        for route in routes:
+            if route.matches(res, chatId, userId, content):
+                matched.append(route)
+                if route.stop and (content or route.pattern is None):
+                    break
+        return matched
+
+    def wants(self, raw):
+        """
+        Check if any route could apply to a raw event, before creating the event object.
+
+        Content patterns are left to :meth:`dispatch`, so that expressions are only evaluated once per event.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+
+        Returns:
+            bool: whether the event should be created and dispatched
+        """
+        return bool(self.match(raw, content=False))
+
+    def dispatch(self, event):
+        """
+        Pass an event to each matching handler.
+
+        Args:
+            event (.SkypeEvent): event to dispatch
+
+        Returns:
+            int: number of handlers the event was passed to
+        """
+        routes = self.match(event.raw or {}, type(event))
+        for route in routes:
+            route.call(event)
+        return len(routes)
+
+    def close(self, wait=True):
+        """
+        Shut down the thread pools of all routes.
+
+        Args:
+            wait (bool): whether to wait for queued events to be handled
+        """
+        for route in self.routes:
+            route.close(wait)
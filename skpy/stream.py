@@ -0,0 +1,150 @@
+import codecs
+import json
+
+from .core import SkypeObj
+
+
+class SkypeJsonStream(SkypeObj):
+    """
+    An incremental parser for a JSON object containing large arrays, such as a contact list or a page of messages.
+
+    Iterating over the stream yields (``key``, ``item``) pairs for each item of the arrays under the chosen top-level
+    keys, decoded one at a time as the body is read, so that the whole document is never held in memory at once.  All
+    other top-level fields are decoded in full, and collected in :attr:`rest` as they're reached -- fields after the
+    arrays are only available once iteration completes.
+
+    .. code-block:: python
+
+        resp = sk.conn("GET", url, stream=True)
+        stream = SkypeJsonStream(resp.iter_content(SkypeJsonStream.chunkSize), ("contacts",))
+        for key, contact in stream:
+            ...
+        groups = stream.rest.get("groups")
+
+    Attributes:
+        keys (str list):
+            Top-level keys whose arrays are streamed.
+        rest (dict):
+            Other top-level fields seen so far.
+        items (int):
+            Number of array items yielded so far.
+    """
+
+    attrs = ("keys", "items")
+
+    chunkSize = 65536
+    """
+    int: Suggested number of bytes to read from the response at a time.
+    """
+
+    # Consumed input is only dropped from the buffer once it exceeds this many characters, to avoid copying on every
+    # item.
+    compactSize = 1 << 20
+
+    def __init__(self, chunks, keys=()):
+        """
+        Create a new stream.  Nothing is read until iteration starts.
+
+        Args:
+            chunks (iterable): response body, as a sequence of :class:`bytes` (decoded as UTF-8) or :class:`str`
+            keys (str list): top-level keys whose arrays are to be streamed
+        """
+        super(SkypeJsonStream, self).__init__()
+        self.chunks = iter(chunks)
+        self.keys = tuple(keys)
+        self.rest = {}
+        self.items = 0
+        self.decoder = json.JSONDecoder()
+        self.textDecoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.done = False
+
+    def read(self):
+        """
+        Append the next chunk of the body to the buffer.
+
+        Returns:
+            bool: ``False`` if the end of the body has been reached
+        """
+        if self.done:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.done = True
+            self.buffer += self.textDecoder.decode(b"", True)
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self.textDecoder.decode(chunk)
+        if self.pos > self.compactSize:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        self.buffer += chunk
+        return True
+
+    def peek(self):
+        """
+        Skip whitespace, then return the next character without consuming it.
+
+        Returns:
+            str: next character, or empty if at the end of the body
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.read():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expected one of {0!r} at offset {1}, got {2!r}".format(chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode the next complete JSON value, reading more of the body as needed.
+
+        Returns:
+            object: decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # Most likely a value split across chunks, unless there's nothing more to read.
+                if not self.read():
+                    raise
+                continue
+            # A number or literal at the end of the buffer may continue into the next chunk.
+            if end == len(self.buffer) and self.read():
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            if key in self.keys and self.peek() == "[":
+                self.pos += 1
+                if self.peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        item = self.value()
+                        self.items += 1
+                        yield key, item
+                        if self.expect(",]") == "]":
+                            break
+            else:
+                self.rest[key] = self.value()
+            if self.expect(",}") == "}":
+                return
@@ -0,0 +1,318 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from .core import SkypeObj
+
+
+class SkypeTokenStore(SkypeObj):
+    """
+    A base class for persistent token storage, shared between any connections (and processes) using the same account.
+
+    Subclasses should implement :meth:`read` and :meth:`write`, and ideally :meth:`lock` and :meth:`version` too, so
+    that only one holder of the store refreshes the tokens whilst the rest wait and pick up the result.
+
+    Tokens are stored as the string produced by :meth:`.SkypeConnection.writeTokenToStr`.
+    """
+
+    def __init__(self):
+        super(SkypeTokenStore, self).__init__()
+        self.listeners = []
+        self.seenVersion = None
+
+    def read(self):
+        """
+        Retrieve the current token string.
+
+        Returns:
+            str: stored tokens, or ``None`` if nothing has been stored
+        """
+        raise NotImplementedError
+
+    def write(self, tokens):
+        """
+        Replace the stored tokens.  Readers should never observe a partially written value.
+
+        Args:
+            tokens (str): token string to store
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self):
+        """
+        Context manager: hold an exclusive lock on the store.  This must be reentrant within a single thread.
+
+        The default implementation doesn't provide any locking.
+        """
+        yield
+
+    def version(self):
+        """
+        Produce a value that changes whenever the stored tokens do.
+
+        The default implementation compares the stored content itself.
+
+        Returns:
+            object: opaque comparable value
+        """
+        return self.read()
+
+    def subscribe(self, fn):
+        """
+        Register a callback to be notified by :meth:`check` when the stored tokens change.
+
+        Args:
+            fn (method): callback, taking no arguments
+        """
+        self.listeners.append(fn)
+
+    def check(self):
+        """
+        Look for changes made by other holders of the store since the last check, and notify any subscribers.
+
+        Returns:
+            bool: whether a change was detected
+        """
+        version = self.version()
+        if version == self.seenVersion:
+            return False
+        self.seenVersion = version
+        for fn in self.listeners:
+            fn()
+        return True
+
+
+class SkypeFileTokenStore(SkypeTokenStore):
+    """
+    A token store backed by a file on the local filesystem.
+
+    Writes go to a private temporary file which is then renamed over the original, and an advisory lock on a companion
+    ``.lock`` file serialises refreshes across processes (where supported by the platform).
+
+    Attributes:
+        path (str):
+            Location of the token file.
+        lockPath (str):
+            Location of the companion lock file.
+    """
+
+    attrs = ("path",)
+
+    def __init__(self, path):
+        """
+        Create a new file store.  Neither file needs to exist yet.
+
+        Args:
+            path (str): location of the token file
+        """
+        super(SkypeFileTokenStore, self).__init__()
+        self.path = path
+        self.lockPath = "{0}.lock".format(path)
+        self.threadLock = threading.RLock()
+        self.lockFile = None
+        self.lockDepth = 0
+
+    def read(self):
+        try:
+            with open(self.path, "r") as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def write(self, tokens):
+        # Imported here, as the utilities depend on the connection, which depends on this module.
+        from .util import SkypeUtils
+        SkypeUtils.atomicWrite(self.path, tokens)
+        # Our own writes shouldn't count as changes to pick up.
+        self.seenVersion = self.version()
+
+    @contextmanager
+    def lock(self):
+        with self.threadLock:
+            if not self.lockDepth:
+                self.lockFile = os.fdopen(os.open(self.lockPath, os.O_RDWR | os.O_CREAT, 0o600), "r+")
+                try:
+                    if fcntl:
+                        fcntl.flock(self.lockFile.fileno(), fcntl.LOCK_EX)
+                    elif msvcrt:
+                        msvcrt.locking(self.lockFile.fileno(), msvcrt.LK_LOCK, 1)
+                except Exception:
+                    self.lockFile.close()
+                    self.lockFile = None
+                    raise
+            self.lockDepth += 1
+            try:
+                yield
+            finally:
+                self.lockDepth -= 1
+                if not self.lockDepth:
+                    if fcntl:
+                        fcntl.flock(self.lockFile.fileno(), fcntl.LOCK_UN)
+                    elif msvcrt:
+                        self.lockFile.seek(0)
+                        msvcrt.locking(self.lockFile.fileno(), msvcrt.LK_UNLCK, 1)
+                    self.lockFile.close()
+                    self.lockFile = None
+
+    def version(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime)
+
+
+class SkypeTokenManager(SkypeObj):
+    """
+    A background refresher for the tokens of a :class:`.SkypeConnection`.
+
+    Rather than waiting for :meth:`.SkypeConnection.verifyToken` to notice an expired token during an API call, a
+    daemon thread renews the Skype and registration tokens a short time before they lapse.  Refreshes hold the
+    connection's token lock, so any API calls made in the meantime wait for the new token instead of starting their own
+    refresh.
+
+    Attributes:
+        conn (:class:`.SkypeConnection`):
+            Connection whose tokens are being managed.
+        margin (datetime.timedelta):
+            How long before expiry to start a refresh.
+        retry (datetime.timedelta):
+            Delay before trying again after a failed refresh.
+        poll (datetime.timedelta):
+            How often to check the connection's token store for tokens refreshed elsewhere.
+        error (Exception):
+            Most recent refresh failure, or ``None`` if the last attempt succeeded.
+    """
+
+    attrs = ("margin", "retry", "running")
+
+    def __init__(self, conn, margin=timedelta(minutes=10), retry=timedelta(minutes=1), poll=timedelta(seconds=30)):
+        """
+        Create a new manager.  No refreshes happen until :meth:`start` is called.
+
+        Args:
+            conn (SkypeConnection): connection to manage tokens for
+            margin (datetime.timedelta): how long before expiry to start a refresh
+            retry (datetime.timedelta): delay before trying again after a failed refresh
+            poll (datetime.timedelta): how often to check the token store for changes
+        """
+        super(SkypeTokenManager, self).__init__()
+        self.conn = conn
+        self.margin = margin
+        self.retry = retry
+        self.poll = poll
+        self.error = None
+        self.thread = None
+        self.stopEvent = threading.Event()
+
+    @property
+    def running(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    def due(self, key):
+        """
+        Check if a token needs refreshing, taking into account the refresh margin.
+
+        Args:
+            key (str): token type, ``skype`` or ``reg``
+
+        Returns:
+            bool: whether the token is missing or close to expiry
+        """
+        expiry = self.conn.tokenExpiry.get(key)
+        return not expiry or datetime.now() >= expiry - self.margin
+
+    def nextRefresh(self):
+        """
+        Calculate when the next refresh should take place.
+
+        Returns:
+            datetime.datetime: time of the earliest token expiry, minus the margin
+        """
+        expiries = [self.conn.tokenExpiry[key] for key in ("skype", "reg") if self.conn.tokenExpiry.get(key)]
+        if not expiries:
+            return datetime.now()
+        return min(expiries) - self.margin
+
+    def refresh(self):
+        """
+        Renew any tokens that are due for a refresh.  Tokens that aren't yet within the margin are left alone.
+
+        A new Skype token is acquired with the stored credentials if available, otherwise by refreshing the existing
+        token.  Either way, a new registration token follows.
+
+        If the connection has a token store, and another process has already refreshed the tokens there, those are used
+        instead of making a new request.
+        """
+        with self.conn.tokenLock, self.conn.tokenStoreLock():
+            if self.conn.tokenStore and (self.due("skype") or self.due("reg")):
+                self.conn.readStoredTokens()
+            if self.due("skype"):
+                if self.conn.hasUserPwd:
+                    if self.conn.instruments:
+                        self.conn.notifyInstruments("authRefresh", "skype")
+                    self.conn.getSkypeToken()
+                else:
+                    self.conn.refreshSkypeToken()
+            elif self.due("reg"):
+                self.conn.getRegToken()
+
+    def start(self):
+        """
+        Start the refresh thread, if not already running.
+
+        Returns:
+            SkypeTokenManager: the current instance, for chaining
+        """
+        if not self.running:
+            self.stopEvent.clear()
+            self.thread = threading.Thread(target=self.run, name="SkypeTokenManager")
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the refresh thread, waiting for any refresh in progress to complete.
+        """
+        self.stopEvent.set()
+        if self.running and threading.current_thread() is not self.thread:
+            self.thread.join()
+
+    def run(self):
+        """
+        Main loop of the refresh thread: sleep until the next refresh is due, then perform it.
+        """
+        while not self.stopEvent.is_set():
+            wait = (self.nextRefresh() - datetime.now()).total_seconds()
+            if wait > 0:
+                if self.conn.tokenStore:
+                    wait = min(wait, self.poll.total_seconds())
+                if self.stopEvent.wait(wait):
+                    break
+                if self.conn.tokenStore:
+                    # Listeners pick up any tokens written by other processes.
+                    self.conn.tokenStore.check()
+                if self.nextRefresh() > datetime.now():
+                    continue
+            try:
+                self.refresh()
+            except Exception as e:
+                self.error = e
+                self.stopEvent.wait(self.retry.total_seconds())
+            else:
+                self.error = None
+                if self.nextRefresh() <= datetime.now():
+                    # New tokens already inside the margin, avoid refreshing in a tight loop.
+                    self.stopEvent.wait(self.retry.total_seconds())
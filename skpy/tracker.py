@@ -0,0 +1,211 @@
+from collections import OrderedDict
+import threading
+
+from .core import SkypeObj
+from .util import SkypeUtils
+from .conn import SkypeConnection
+from .event import SkypeEvent
+
+
+class SkypeEventTracker(SkypeObj):
+    """
+    A guard against lost and repeated events, for use with :attr:`.Skype.tracker`.
+
+    The tracker remembers the most recent message seen in each conversation (its high-water mark), along with a bounded
+    set of recently seen event and message identifiers.  Raw events that have already been seen are dropped, and
+    acknowledged if needed.
+
+    If the event subscription is renewed (for example, when the poll endpoint expires and
+    :meth:`.SkypeConnection.handle` subscribes again), any events raised in between are lost.  On the next poll, the
+    tracker fetches messages newer than each high-water mark from the conversation history, and returns them ahead of
+    the live events as ``NewMessage`` events, flagged with ``"backfill": True``.
+
+    Attributes:
+        skype (:class:`.Skype`):
+            Parent Skype instance.
+        marks (dict):
+            Mapping from conversation identifiers to (``arrival``, ``msgId``) tuples, where ``arrival`` is the arrival
+            time of the latest message in milliseconds since the epoch.
+        size (int):
+            Maximum number of identifiers kept for de-duplication.
+        pages (int):
+            Maximum number of history pages to fetch per conversation when backfilling.
+        duplicates (int):
+            Number of repeated events dropped.
+        backfilled (int):
+            Number of missed messages recovered.
+    """
+
+    attrs = ("size", "duplicates", "backfilled")
+
+    def __init__(self, skype, size=10000, pages=5):
+        """
+        Create a new tracker.
+
+        Args:
+            skype (Skype): parent Skype instance
+            size (int): maximum number of identifiers kept for de-duplication
+            pages (int): maximum number of history pages to fetch per conversation when backfilling
+        """
+        super(SkypeEventTracker, self).__init__(skype)
+        self.marks = {}
+        self.size = size
+        self.pages = pages
+        self.duplicates = 0
+        self.backfilled = 0
+        self.seen = OrderedDict()
+        self.subscriptions = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def arrivalTime(stamp):
+        """
+        Convert a message arrival timestamp to milliseconds since the epoch.
+
+        Args:
+            stamp (str): timestamp of the form ``2016-01-01T00:00:00.000Z``
+
+        Returns:
+            int: arrival time, or ``None`` if the timestamp is missing or malformed
+        """
+        try:
+            return SkypeUtils.parseTime(stamp, SkypeUtils.TimeMode.Millis)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def key(raw, subscriptions=None):
+        """
+        Build the de-duplication key for a raw event.
+
+        Messages are keyed by conversation, message identifier and version, so that edits are not treated as repeats.
+        Other events are keyed by their event identifier, which is only unique within a single subscription.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+            subscriptions (int): subscription count at the time the event was received
+
+        Returns:
+            tuple: key for the event, or ``None`` if it can't be identified
+        """
+        res = raw.get("resource", {})
+        if raw.get("resourceType") == "NewMessage" and res.get("id"):
+            chatId = SkypeUtils.chatToId(res.get("conversationLink", ""))
+            return ("msg", chatId, res.get("id"), res.get("version"))
+        if raw.get("id") is not None:
+            return ("event", subscriptions, raw.get("id"))
+        return None
+
+    def isSeen(self, key):
+        """
+        Check an event key against recently seen events, and remember it if new.
+
+        Args:
+            key (tuple): key produced by :meth:`key`
+
+        Returns:
+            bool: whether the key has been seen before
+        """
+        if key is None:
+            return False
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            return True
+        self.seen[key] = None
+        if len(self.seen) > self.size:
+            self.seen.popitem(last=False)
+        return False
+
+    def mark(self, raw):
+        """
+        Advance the high-water mark of a conversation past a raw message event.
+
+        Args:
+            raw (dict): raw event, as provided by the API
+        """
+        if raw.get("resourceType") != "NewMessage":
+            return
+        res = raw.get("resource", {})
+        chatId = SkypeUtils.chatToId(res.get("conversationLink", ""))
+        arrival = self.arrivalTime(res.get("originalarrivaltime"))
+        if not chatId or arrival is None:
+            return
+        mark = (arrival, res.get("id") or "")
+        if mark > self.marks.get(chatId, (0, "")):
+            self.marks[chatId] = mark
+
+    def process(self, raws):
+        """
+        Filter a batch of polled raw events, backfilling first if the subscription has been renewed since the last
+        batch.
+
+        Args:
+            raws (dict list): raw events, as provided by the API
+
+        Returns:
+            dict list: backfilled and new raw events, in order
+        """
+        endpoint = self.skype.conn.endpoints["self"]
+        with self.lock:
+            subscriptions = endpoint.subscriptions
+            events = []
+            if subscriptions != self.subscriptions:
+                if self.subscriptions is not None and self.marks:
+                    events.extend(self.backfill())
+                self.subscriptions = subscriptions
+            for raw in raws:
+                if self.isSeen(self.key(raw, subscriptions)):
+                    self.duplicates += 1
+                    SkypeEvent.ackRaw(self.skype.conn, raw)
+                    continue
+                self.mark(raw)
+                events.append(raw)
+            return events
+
+    def backfill(self):
+        """
+        Fetch messages newer than the high-water mark of each known conversation.
+
+        Returns:
+            dict list: raw ``NewMessage`` events for any missed messages, oldest first per conversation
+        """
+        events = []
+        for chatId, (arrival, msgId) in list(self.marks.items()):
+            for msg in reversed(self.history(chatId, arrival)):
+                raw = {"id": None,
+                       "resourceType": "NewMessage",
+                       "time": (msg.get("originalarrivaltime") or "")[:19] + "Z",
+                       "resource": msg,
+                       "backfill": True}
+                if msg.get("id") == msgId or self.isSeen(self.key(raw)):
+                    continue
+                self.mark(raw)
+                events.append(raw)
+        self.backfilled += len(events)
+        return events
+
+    def history(self, chatId, since):
+        """
+        Retrieve the messages in a conversation that arrived at or after the given time.
+
+        Args:
+            chatId (str): conversation identifier
+            since (int): arrival time in milliseconds since the epoch
+
+        Returns:
+            dict list: raw messages, newest first
+        """
+        url = "{0}/users/ME/conversations/{1}/messages".format(self.skype.conn.msgsHost, chatId)
+        params = {"startTime": since, "view": "msnp24Equivalent", "pageSize": 100}
+        msgs = []
+        for _ in range(self.pages):
+            json = self.skype.conn("GET", url, params=params, auth=SkypeConnection.Auth.RegToken).json()
+            page = json.get("messages", [])
+            fresh = [msg for msg in page if (self.arrivalTime(msg.get("originalarrivaltime")) or 0) >= since]
+            msgs.extend(fresh)
+            url = json.get("_metadata", {}).get("backwardLink")
+            params = None
+            # Pages run newest first, so stop once a page reaches back past the mark.
+            if not url or len(fresh) < len(page):
+                break
+        return msgs
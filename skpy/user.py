@@ -1,8 +1,10 @@
 from datetime import datetime
+import threading
 
 from .core import SkypeObj, SkypeObjs, SkypeEnum, SkypeApiException
 from .util import SkypeUtils
 from .conn import SkypeConnection
+from .stream import SkypeJsonStream
 from .chat import SkypeSingleChat
 
 
@@ -261,6 +263,8 @@ class SkypeContact(SkypeUser):
                         auth=SkypeConnection.Auth.SkypeToken)
         self.skype.conn("DELETE", "{0}/users/ME/contacts/8:{1}".format(self.skype.conn.msgsHost, self.id),
                         auth=SkypeConnection.Auth.RegToken)
+        # Removing the messaging service contact also ends any presence subscription.
+        self.skype.conn.endpoints["self"].presenceIds.discard(self.id)
 
 
 @SkypeUtils.initAttrs
@@ -340,12 +344,15 @@ class SkypeContacts(SkypeObjs):
             Set of :class:`SkypeContactGroup` instances, keyed by group name.
         blocked (SkypeContactGroup):
             Group of users blocked from all communication.
+        lock (threading.RLock):
+            Held whilst the cache and contact list are updated, so that background refreshes don't interleave.
     """
 
     def __init__(self, skype=None):
         super(SkypeContacts, self).__init__(skype)
         self.contactIds = []
         self.groups = {}
+        self.lock = threading.RLock()
 
     def __getitem__(self, key):
         # Try to retrieve from the cache, otherwise return a user object instead.
@@ -366,31 +373,116 @@ class SkypeContacts(SkypeObjs):
             self.sync()
         return len(self.contactIds)
 
+    stream = False
+    """
+    bool: Whether :meth:`sync` should use :meth:`streamSync`, to limit memory use with very large contact lists.
+    """
+
     def sync(self):
+        if self.stream:
+            for _ in self.streamSync():
+                pass
+            return
         resp = self.skype.conn("GET", "{0}/users/{1}".format(SkypeConnection.API_CONTACTS, self.skype.userId),
                                params={"delta": "", "reason": "default"},
                                auth=SkypeConnection.Auth.SkypeToken).json()
+        contactIds = []
         for json in resp.get("contacts", []):
-            # Merge nested profile key into self.
-            json.update(json.get("profile", {}))
-            # Favourite property only exists if true, else default it to false (doesn't appear in other API requests).
-            json["favorite"] = json.get("favorite", False)
-            contact = SkypeContact.fromRaw(self.skype, json)
-            self.merge(contact)
-            if not json.get("suggested"):
-                self.contactIds.append(contact.id)
-        for json in resp.get("groups", []):
-            self.groups[json.get("name", json.get("id"))] = SkypeContactGroup.fromRaw(self.skype, json)
-        blocked = resp.get("blocklist", [])
-        self.blocked = SkypeContactGroup(self.skype, blocked, userIds=[block.get("mri") for block in blocked])
-        super(SkypeContacts, self).sync()
+            self.mergeRaw(json, contactIds)
+        self.finishSync(contactIds, resp)
+
+    def streamSync(self):
+        """
+        Retrieve the contact list like :meth:`sync`, but decode the response incrementally, adding each contact to the
+        cache as it's read.  The contact list, groups and blocked users are updated once the response is complete.
+
+        Returns:
+            generator: :class:`SkypeContact` objects, as cached
+        """
+        resp = self.skype.conn("GET", "{0}/users/{1}".format(SkypeConnection.API_CONTACTS, self.skype.userId),
+                               params={"delta": "", "reason": "default"}, stream=True,
+                               auth=SkypeConnection.Auth.SkypeToken)
+        contactIds = []
+        try:
+            stream = SkypeJsonStream(resp.iter_content(SkypeJsonStream.chunkSize), ("contacts",))
+            for _, json in stream:
+                yield self.mergeRaw(json, contactIds)
+        finally:
+            resp.close()
+        self.finishSync(contactIds, stream.rest)
+
+    def revalidate(self):
+        """
+        Retrieve the contact list again, and apply only the differences to the cache: new contacts are added, changed
+        ones are updated in place (so existing references see the changes), and the contact list, groups and blocked
+        users are replaced once complete.  Presence subscriptions follow the changes to the contact list.
 
-    def contact(self, id):
+        This is safe to run in a background thread whilst the cache is in use.
+
+        Returns:
+            (set, set, set) tuple: identifiers of contacts added, changed and removed
+        """
+        resp = self.skype.conn("GET", "{0}/users/{1}".format(SkypeConnection.API_CONTACTS, self.skype.userId),
+                               params={"delta": "", "reason": "default"},
+                               auth=SkypeConnection.Auth.SkypeToken).json()
+        contactIds = []
+        changed = set()
+        with self.lock:
+            for json in resp.get("contacts", []):
+                contact = self.rawContact(json)
+                cached = self.cache.get(contact.id)
+                if cached is None:
+                    self.cache[contact.id] = contact
+                elif not cached.raw == contact.raw:
+                    cached.merge(contact)
+                    changed.add(contact.id)
+                if not json.get("suggested"):
+                    contactIds.append(contact.id)
+            oldIds = set(self.contactIds)
+            self.finishSync(contactIds, resp)
+        return set(contactIds) - oldIds, changed & oldIds, oldIds - set(contactIds)
+
+    def merge(self, obj):
+        with self.lock:
+            return super(SkypeContacts, self).merge(obj)
+
+    def rawContact(self, json):
+        # Merge nested profile key into self.
+        json.update(json.get("profile", {}))
+        # Favourite property only exists if true, else default it to false (doesn't appear in other API requests).
+        json["favorite"] = json.get("favorite", False)
+        return SkypeContact.fromRaw(self.skype, json)
+
+    def mergeRaw(self, json, contactIds):
+        contact = self.merge(self.rawContact(json))
+        if not json.get("suggested"):
+            contactIds.append(contact.id)
+        return contact
+
+    def finishSync(self, contactIds, resp):
+        groups = dict((json.get("name", json.get("id")), SkypeContactGroup.fromRaw(self.skype, json))
+                      for json in resp.get("groups", []))
+        blocked = resp.get("blocklist", [])
+        with self.lock:
+            # Replace each collection whole, so that readers never see one half-built.
+            self.contactIds = contactIds
+            self.groups = groups
+            self.blocked = SkypeContactGroup(self.skype, blocked, userIds=[block.get("mri") for block in blocked])
+            super(SkypeContacts, self).sync()
+        # Keep any presence subscription in step with the contact list.
+        endpoint = self.skype.conn.endpoints["self"]
+        if endpoint.subscribedPresence:
+            endpoint.syncPresence(self.contactIds)
+
+    def contact(self, id, subscribe=False):
         """
         Retrieve all details for a specific contact, including fields such as birthday and mood.
 
+        Lookups don't change presence subscriptions, which otherwise follow :meth:`sync`.
+
         Args:
             id (str): user identifier to lookup
+            subscribe (bool): whether to also subscribe to the contact's presence, if subscribed to presences
 
         Returns:
             SkypeContact: resulting contact object
@@ -401,6 +493,10 @@ class SkypeContacts(SkypeObjs):
             contact = SkypeContact.fromRaw(self.skype, json[0])
             if contact.id not in self.contactIds:
                 self.contactIds.append(contact.id)
+            if subscribe:
+                endpoint = self.skype.conn.endpoints["self"]
+                if endpoint.subscribedPresence:
+                    endpoint.addPresence([contact.id])
             return self.merge(contact)
         except SkypeApiException as e:
             if len(e.args) >= 2 and getattr(e.args[1], "status_code", None) == 403:
@@ -530,7 +626,7 @@ class SkypeRequest(SkypeObj):
     def rawToFields(cls, raw={}):
         return {"userId": raw.get("userId"),
                 "greeting": raw.get("message"),
-                "time": datetime.strptime(raw.get("time", ""), "%Y-%m-%dT%H:%M:%SZ")}
+                "time": SkypeUtils.parseTime(raw.get("time"))}
 
     def accept(self):
         """
@@ -541,6 +637,9 @@ class SkypeRequest(SkypeObj):
                         auth=SkypeConnection.Auth.SkypeToken)
         self.skype.conn("PUT", "{0}/users/ME/contacts/8:{1}".format(self.skype.conn.msgsHost, self.userId),
                         auth=SkypeConnection.Auth.RegToken)
+        endpoint = self.skype.conn.endpoints["self"]
+        if endpoint.subscribedPresence:
+            endpoint.presenceIds.add(self.userId)
 
     def reject(self):
         """
@@ -1,10 +1,14 @@
 from __future__ import unicode_literals
 
+from datetime import datetime, timedelta, timezone
+import os
 import re
 import functools
+import tempfile
 
 from .core import SkypeEnum
 from .conn import SkypeConnection
+from .remote import SkypeCachedResource
 
 
 class SkypeUtils:
@@ -16,6 +20,9 @@ class SkypeUtils:
             Raw object containing miscellaneous server-side flags and configuration.
         static (dict):
             Raw object containing emoticons and packs.
+
+    Both are fetched on first access, and refreshed daily in the background.  Set
+    :attr:`.SkypeCachedResource.cacheDir` to keep copies on disk between processes.
     """
 
     Status = SkypeEnum("SkypeUtils.Status", ("Offline", "Hidden", "Busy", "Away", "Idle", "Online"))
@@ -37,6 +44,26 @@ class SkypeUtils:
             User is available to talk.
     """
 
+    TimeMode = SkypeEnum("SkypeUtils.TimeMode", ("Naive", "Aware", "Millis"))
+    """
+    :class:`.SkypeEnum`: Representations of timestamps parsed by :meth:`parseTime`.
+
+    Attributes:
+        TimeMode.Naive:
+            :class:`datetime <datetime.datetime>` in UTC, without time zone information.
+        TimeMode.Aware:
+            :class:`datetime <datetime.datetime>` in UTC, with :data:`datetime.timezone.utc` as its time zone.
+        TimeMode.Millis:
+            Integer number of milliseconds since the epoch, skipping :class:`datetime <datetime.datetime>` creation.
+    """
+
+    timeMode = TimeMode.Naive
+    """
+    :class:`.TimeMode`: Representation used for message and event times, defaults to :attr:`.TimeMode.Naive`.
+    """
+
+    epoch = datetime(1970, 1, 1)
+
     @staticmethod
     def noPrefix(s):
         """
@@ -82,6 +109,102 @@ class SkypeUtils:
         match = re.search(r"conversations/([0-9]+:[^/]+)", url)
         return match.group(1) if match else None
 
+    @staticmethod
+    def parseTime(stamp, mode=None):
+        """
+        Parse an ISO 8601 timestamp from the API, of the form ``2016-01-01T00:00:00.000Z`` (fractional seconds are
+        optional).
+
+        Args:
+            stamp (str): UTC timestamp
+            mode (.TimeMode): representation to return, defaults to :attr:`timeMode`
+
+        Returns:
+            datetime.datetime: parsed time, or an int of milliseconds for :attr:`.TimeMode.Millis`
+
+        Raises:
+            ValueError: if the timestamp is missing or malformed
+        """
+        if not stamp or not stamp[-1] == "Z":
+            raise ValueError("Not a UTC timestamp: {0!r}".format(stamp))
+        try:
+            # Much faster than strptime(), but only accepts 3 or 6 fractional digits before Python 3.11.
+            value = datetime.fromisoformat(stamp[:-1])
+        except ValueError:
+            value = datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%fZ" if "." in stamp else "%Y-%m-%dT%H:%M:%SZ")
+        if value.tzinfo:
+            raise ValueError("Not a UTC timestamp: {0!r}".format(stamp))
+        return SkypeUtils.convertTime(value, mode)
+
+    @staticmethod
+    def convertTime(value, mode=None):
+        """
+        Convert a naive UTC :class:`datetime <datetime.datetime>` to the given time representation.
+
+        Args:
+            value (datetime.datetime): UTC time, without time zone information
+            mode (.TimeMode): representation to return, defaults to :attr:`timeMode`
+
+        Returns:
+            datetime.datetime: converted time, or an int of milliseconds for :attr:`.TimeMode.Millis`
+        """
+        mode = mode or SkypeUtils.timeMode
+        if mode is SkypeUtils.TimeMode.Millis:
+            return (value - SkypeUtils.epoch) // timedelta(milliseconds=1)
+        elif mode is SkypeUtils.TimeMode.Aware:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+    @staticmethod
+    def nowTime(mode=None):
+        """
+        Get the current time, as used in place of unparseable timestamps.
+
+        Args:
+            mode (.TimeMode): representation to return, defaults to :attr:`timeMode`
+
+        Returns:
+            datetime.datetime: current time, or an int of milliseconds for :attr:`.TimeMode.Millis`
+        """
+        mode = mode or SkypeUtils.timeMode
+        if mode is SkypeUtils.TimeMode.Naive:
+            # Matches the historical fallback of local time.
+            return datetime.now()
+        return SkypeUtils.convertTime(datetime.now(timezone.utc).replace(tzinfo=None), mode)
+
+    @staticmethod
+    def asDatetime(value):
+        """
+        Convert a time in any :class:`.TimeMode` back to a :class:`datetime <datetime.datetime>`.
+
+        Args:
+            value (datetime.datetime): time to convert, or an int of milliseconds since the epoch
+
+        Returns:
+            datetime.datetime: equivalent time (naive, in UTC, for milliseconds), or the current time if missing
+        """
+        if value is None:
+            return datetime.now()
+        elif isinstance(value, int):
+            return SkypeUtils.epoch + timedelta(milliseconds=value)
+        return value
+
+    @staticmethod
+    def formatTime(value, millis=False):
+        """
+        Format a time as an ISO 8601 timestamp for the API, of the form ``2016-01-01T00:00:00.000000Z``.
+
+        Args:
+            value (datetime.datetime): time to format, either naive or with a time zone (converted to UTC)
+            millis (bool): whether to round to milliseconds rather than microseconds
+
+        Returns:
+            str: formatted timestamp
+        """
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec="milliseconds" if millis else "microseconds") + "Z"
+
     class classprop(property):
         """
         Method decorator: allows designating class methods as properties.
@@ -258,23 +381,43 @@ class SkypeUtils:
             else:
                 break
 
+    @staticmethod
+    def atomicWrite(path, data, mode="w"):
+        """
+        Replace the contents of a file in one step, via a temporary file in the same directory.
+
+        Readers never see a partially written file, and an interrupted write leaves any existing file untouched.
+
+        Args:
+            path (str): file to write
+            data (str): content to write, or :class:`bytes` if writing in binary mode
+            mode (str): file mode to open the temporary file with, either ``w`` or ``wb``
+        """
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".skpy-")
+        try:
+            with os.fdopen(fd, mode) as f:
+                f.write(data)
+            os.replace(tmpPath, path)
+        except Exception:
+            os.remove(tmpPath)
+            raise
+
+    configResource = SkypeCachedResource("config", "{0}/SkypeLyncWebExperience/0_0.0.0.0"
+                                                   .format(SkypeConnection.API_CONFIG), params={"apikey": "skype.com"})
+    # The personalisation config points to the current assets URL, which provides the static content.
+    staticConfigResource = SkypeCachedResource("personalization", "{0}/Skype/0_0.0.0.0/SkypePersonalization"
+                                                                  .format(SkypeConnection.API_CONFIG))
+    staticResource = SkypeCachedResource("static", lambda: SkypeUtils.staticConfigResource.get().get("pes_config"))
+
     @classprop
     @classmethod
-    @cacheResult
     def config(cls):
-        # Fetch the current assets URL, and follow that to retrieve the static content.
-        return SkypeConnection.externalCall("GET", "{0}/SkypeLyncWebExperience/0_0.0.0.0"
-                                                   .format(SkypeConnection.API_CONFIG),
-                                            params={"apikey": "skype.com"}).json()
+        return cls.configResource.get()
 
     @classprop
     @classmethod
-    @cacheResult
     def static(cls):
-        # Fetch the current assets URL, and follow that to retrieve the static content.
-        json = SkypeConnection.externalCall("GET", "{0}/Skype/0_0.0.0.0/SkypePersonalization"
-                                                   .format(SkypeConnection.API_CONFIG)).json()
-        return SkypeConnection.externalCall("GET", json.get("pes_config")).json()
+        return cls.staticResource.get()
 
     # Now wrap this decorator as a static method.
     cacheResult = staticmethod(cacheResult)
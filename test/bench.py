@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+
+"""
+Offline benchmarks for SkPy hot paths, using mocked API responses.
+
+Run with ``python -m test.bench`` from the repository root.  Each case reports operations per second, and the peak and
+retained memory (via :mod:`tracemalloc`) of one timed run.  Use ``--save`` to store the results as a baseline, after
+which subsequent runs show the change against it, and ``--check`` fails if any case has slowed beyond the tolerance.
+"""
+
+import argparse
+import base64
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+import re
+import subprocess
+
+import responses
+
+from skpy import SkypeConnection, SkypeEvent, SkypeEventFilter, SkypeEventLoop, SkypeEventRouter, SkypeMetrics, \
+                 SkypeMsg, SkypeNewMessageEvent, SkypeStubConnection, SkypeUtils, SkypeJsonCodec
+
+from test.client import Data, mockSkype
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench.json")
+
+cases = []
+
+
+def case(name, number=1000):
+    """
+    Decorator: register a benchmark case.
+
+    The decorated function is a generator that performs any setup, yields a zero-argument callable to be timed, and
+    then tears down after the yield.
+
+    Args:
+        name (str): label for the case
+        number (int): how many times to call the operation per timed run
+    """
+    def decorator(fn):
+        cases.append((name, contextmanager(fn), number))
+        return fn
+    return decorator
+
+
+@contextmanager
+def mocked():
+    """
+    Intercept API calls with the standard client test mocks for the duration of the block.
+    """
+    responses.start()
+    try:
+        yield
+    finally:
+        responses.stop()
+        responses.reset()
+
+
+class Raw:
+    """
+    Generators of raw API objects, as would be received from Skype.
+    """
+
+    chatLink = "{0}/users/ME/conversations/{1}".format(SkypeConnection.API_MSGSHOST, Data.chatThreadId)
+    userLink = "{0}/users/ME/contacts/8:{1}".format(SkypeConnection.API_MSGSHOST, Data.contactId)
+
+    asmUrl = "https://api.asm.skype.com/v1/objects/{0}".format(Data.asmId)
+    card = base64.b64encode(json.dumps({"attachments": [{"content": {"title": "Card", "text": "Body",
+                                                                     "buttons": [{"type": "openUrl", "title": "Go",
+                                                                                  "value": "https://skype.com"}]}}]})
+                            .encode("utf-8")).decode("utf-8")
+
+    contents = {"Text": "Hello world!",
+                "RichText": """<b raw_pre="*" raw_post="*">Bold</b> and <i raw_pre="_" raw_post="_">italic</i> """
+                            """with a <a href="https://skype.com">link</a> and <at id="8:joe.4">Joe</at> """
+                            """<ss type="smile">:)</ss> &lt;&amp;&gt;""",
+                "RichText/Contacts": """<contacts><c t="s" s="joe.4" f="Joe Bloggs"/></contacts>""",
+                "RichText/Location": """<location latitude="51507351" longitude="-127758" altitude="0" """
+                                     """address="London"><a href="https://maps.example.com">London</a></location>""",
+                "RichText/Media_GenericFile": """<URIObject type="File.1" uri="{0}" url_thumbnail="{0}/views/thumb">"""
+                                              """<Title>Title: a.txt</Title><Description/><FileSize v="10"/>"""
+                                              """<OriginalName v="a.txt"/><a href="https://skype.com">view</a>"""
+                                              """</URIObject>""".format(asmUrl),
+                "RichText/UriObject": """<URIObject type="Picture.1" uri="{0}" url_thumbnail="{0}/views/imgt1">"""
+                                      """<OriginalName v="a.jpg"/><a href="https://skype.com">view</a>"""
+                                      """<meta type="photo" originalName="a.jpg"/></URIObject>""".format(asmUrl),
+                "RichText/Media_AudioMsg": """<URIObject type="Audio.1" uri="{0}"><OriginalName v="a.m4a"/>"""
+                                           """</URIObject>""".format(asmUrl),
+                "RichText/Media_Video": """<URIObject type="Video.1" uri="{0}"><OriginalName v="a.mp4"/>"""
+                                        """</URIObject>""".format(asmUrl),
+                "RichText/Media_Card": """<URIObject type="SWIFT.1"><Swift b64="{0}"/></URIObject>""".format(card),
+                "Event/Call": """<partlist type="started" alt=""><part identity="joe.4"><name>Joe</name></part>"""
+                              """</partlist>""",
+                "ThreadActivity/TopicUpdate": """<topicupdate><eventtime>1451606400</eventtime>"""
+                                              """<initiator>8:fred.2</initiator><value>Topic</value></topicupdate>""",
+                "ThreadActivity/JoiningEnabledUpdate": """<joiningenabledupdate><eventtime>1451606400</eventtime>"""
+                                                       """<initiator>8:fred.2</initiator><value>true</value>"""
+                                                       """</joiningenabledupdate>""",
+                "ThreadActivity/HistoryDisclosedUpdate": """<historydisclosedupdate><eventtime>1451606400"""
+                                                         """</eventtime><initiator>8:fred.2</initiator>"""
+                                                         """<value>true</value></historydisclosedupdate>""",
+                "ThreadActivity/AddMember": """<addmember><eventtime>1451606400</eventtime>"""
+                                            """<initiator>8:fred.2</initiator><target>8:joe.4</target></addmember>""",
+                "ThreadActivity/RoleUpdate": """<roleupdate><eventtime>1451606400</eventtime>"""
+                                             """<initiator>8:fred.2</initiator><target><id>8:joe.4</id>"""
+                                             """<role>admin</role></target></roleupdate>""",
+                "ThreadActivity/DeleteMember": """<deletemember><eventtime>1451606400</eventtime>"""
+                                               """<initiator>8:fred.2</initiator><target>8:joe.4</target>"""
+                                               """</deletemember>"""}
+
+    @classmethod
+    def msg(cls, msgType="Text", id=Data.msgId):
+        return {"id": id,
+                "clientmessageid": id,
+                "messagetype": msgType,
+                "contenttype": "text",
+                "content": cls.contents.get(msgType, ""),
+                "composetime": Data.msgTimeFmt,
+                "originalarrivaltime": Data.msgTimeFmt,
+                "conversationLink": cls.chatLink,
+                "from": cls.userLink,
+                "type": "Message",
+                "version": id}
+
+    @classmethod
+    def event(cls, resType="NewMessage", msgType="Text", id=1000):
+        if resType == "NewMessage":
+            res = cls.msg(msgType)
+            res["ackrequired"] = ("{0}/users/ME/conversations/ALL/messages/{1}/ack"
+                                  .format(SkypeConnection.API_MSGSHOST, id))
+        elif resType == "UserPresence":
+            res = {"selfLink": "{0}/users/8:{1}/presenceDocs/messagingService"
+                               .format(SkypeConnection.API_MSGSHOST, Data.contactId),
+                   "availability": "Online", "status": "Online", "capabilities": "Audio | Video"}
+        elif resType == "ConversationUpdate":
+            res = {"id": Data.chatThreadId, "properties": {"consumptionhorizon": "0;0;0"}}
+        else:
+            res = {}
+        return {"id": id, "time": "2016-01-01T00:00:00Z", "resourceType": resType,
+                "resourceLink": "{0}/users/ME/conversations/{1}".format(SkypeConnection.API_MSGSHOST, id),
+                "resource": res}
+
+    @classmethod
+    def events(cls, count=100):
+        kinds = [("NewMessage", "Text"), ("NewMessage", "Control/Typing"), ("NewMessage", "RichText"),
+                 ("UserPresence", None), ("ConversationUpdate", None)]
+        return [cls.event(kinds[i % len(kinds)][0], kinds[i % len(kinds)][1], 1000 + i) for i in range(count)]
+
+    @staticmethod
+    def contacts(count):
+        return {"contacts": [{"authorized": True, "blocked": False, "mri": "8:user.{0}".format(i),
+                              "display_name": "User {0}".format(i),
+                              "profile": {"name": {"first": "User", "surname": str(i)},
+                                          "locations": [{"city": "London", "country": "GB"}],
+                                          "mood": "Busy", "phones": [{"number": "+440000000000", "type": 2}]}}
+                             for i in range(count)],
+                "groups": [{"id": "favorites", "name": "Favorites", "contacts": ["8:user.0"]}],
+                "blocklist": []}
+
+    @staticmethod
+    def groupChats(count):
+        return {"conversations": [{"id": "19:{0:032x}@thread.skype".format(i),
+                                   "properties": {"consumptionhorizon": "0;0;0"},
+                                   "threadProperties": {"topic": "Chat {0}".format(i)},
+                                   "type": "Conversation", "version": Data.msgTime}
+                                  for i in range(count)]}
+
+    @staticmethod
+    def thread(members=20):
+        return {"members": [{"id": "8:user.{0}".format(i), "role": "Admin" if i == 0 else "User"}
+                            for i in range(members)],
+                "properties": {"creator": "8:user.0", "historydisclosed": "true", "joiningenabled": "false"},
+                "type": "Thread", "version": Data.msgTime}
+
+    @staticmethod
+    def emotes(count):
+        return {"items": [{"id": "emote{0}".format(i), "shortcuts": ["(emote{0})".format(i), ":{0})".format(i)]}
+                          for i in range(count)]}
+
+
+@contextmanager
+def emoticons(count):
+    """
+    Provide a list of emoticons in place of the static content for the duration of the block.
+    """
+    resource = SkypeUtils.staticResource
+    data, fetched = resource.data, resource.fetched
+    resource.data, resource.fetched = Raw.emotes(count), time.time()
+    try:
+        yield
+    finally:
+        resource.data, resource.fetched = data, fetched
+
+
+def msgCase(msgType):
+    def fn():
+        raw = Raw.msg(msgType)
+        yield lambda: SkypeMsg.fromRaw(None, raw)
+    case("SkypeMsg.fromRaw[{0}]".format(msgType), 2000)(fn)
+
+
+for msgType in sorted(Raw.contents):
+    msgCase(msgType)
+
+
+@case("SkypeEvent.fromRaw", 5000)
+def eventFromRaw():
+    raws = Raw.events(50)
+    yield lambda: [SkypeEvent.fromRaw(None, raw) for raw in raws]
+
+
+@case("datetime.strptime[arrival time]", 20000)
+def strptimeBaseline():
+    # The parsing previously used for message times, as a reference for SkypeUtils.parseTime.
+    yield lambda: datetime.strptime(Data.msgTimeFmt, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+@case("SkypeUtils.parseTime[arrival time]", 20000)
+def parseTime():
+    yield lambda: SkypeUtils.parseTime(Data.msgTimeFmt)
+
+
+@case("SkypeUtils.parseTime[arrival time, millis]", 20000)
+def parseTimeMillis():
+    yield lambda: SkypeUtils.parseTime(Data.msgTimeFmt, SkypeUtils.TimeMode.Millis)
+
+
+@case("datetime.strftime[arrival time]", 20000)
+def strftimeBaseline():
+    value = datetime(2016, 1, 1, 12, 34, 56, 789000)
+    yield lambda: datetime.strftime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+@case("SkypeUtils.formatTime[arrival time]", 20000)
+def formatTime():
+    value = datetime(2016, 1, 1, 12, 34, 56, 789000)
+    yield lambda: SkypeUtils.formatTime(value)
+
+
+@case("SkypeTextMsg.plain", 5000)
+def textPlain():
+    msg = SkypeMsg.fromRaw(None, Raw.msg("RichText"))
+    yield lambda: msg.plain
+
+
+@case("SkypeTextMsg.markup", 5000)
+def textMarkup():
+    msg = SkypeMsg.fromRaw(None, Raw.msg("RichText"))
+    yield lambda: msg.markup
+
+
+@case("SkypeMsg.emote[scan baseline, 500 emoticons]", 2000)
+def emoteScan():
+    # The linear search previously used for shortcuts, as a reference for SkypeMsg.emote.
+    def scan(shortcut):
+        for emote in SkypeUtils.static["items"]:
+            if shortcut == emote["id"]:
+                return """<ss type="{0}">{1}</ss>""".format(shortcut, emote["shortcuts"][0])
+            elif shortcut in emote["shortcuts"]:
+                return """<ss type="{0}">{1}</ss>""".format(emote["id"], shortcut)
+        return shortcut
+    with emoticons(500):
+        yield lambda: scan(":250)")
+
+
+@case("SkypeMsg.emote[500 emoticons]", 2000)
+def emote():
+    with emoticons(500):
+        yield lambda: SkypeMsg.emote(":250)")
+
+
+@case("SkypeMsg.emotify[500 emoticons, 1k chars]", 500)
+def emotify():
+    text = "Hello (emote1) world :250) (wave) " * 30
+    with emoticons(500):
+        yield lambda: SkypeMsg.emotify(text)
+
+
+def startup(code):
+    # Each run uses a fresh interpreter, so nothing is cached from previous imports.
+    return lambda: subprocess.check_call([sys.executable, "-c", code])
+
+
+@case("python -c pass[startup baseline]", 5)
+def startupBaseline():
+    yield startup("pass")
+
+
+@case("import skpy[startup]", 5)
+def startupImport():
+    yield startup("import skpy")
+
+
+@case("from skpy import Skype[startup]", 5)
+def startupSkype():
+    yield startup("from skpy import Skype")
+
+
+def codecCase(name, payload, body):
+    def fn():
+        codec = SkypeJsonCodec.named(name)
+        yield lambda: codec.loads(body)
+    case("SkypeJsonCodec[{0}].loads[{1}]".format(name, payload), 3)(fn)
+
+
+# Realistic payloads: a large contact list, and a page of rich text message history.
+historyPage = {"messages": [Raw.msg("RichText", str(i)) for i in range(1000)]}
+for payload, body in (("10000 contacts", json.dumps(Raw.contacts(10000)).encode("utf-8")),
+                      ("history page", json.dumps(historyPage).encode("utf-8"))):
+    for name in ("json", "orjson", "ujson"):
+        if SkypeJsonCodec.named(name):
+            codecCase(name, payload, body)
+
+
+@case("SkypeContacts.sync[10000]", 3)
+def contactsSync():
+    with mocked():
+        sk = mockSkype()
+        responses.replace(responses.GET, "{0}/users/{1}".format(SkypeConnection.API_CONTACTS, Data.userId),
+                          status=200, content_type="application/json", body=json.dumps(Raw.contacts(10000)))
+        yield sk.contacts.sync
+
+
+@case("SkypeContacts.sync[10000, requests json]", 3)
+def contactsSyncRequestsJson():
+    # As above, but decoding with requests rather than the default codec.
+    with mocked():
+        sk = mockSkype()
+        sk.conn.codec = None
+        responses.replace(responses.GET, "{0}/users/{1}".format(SkypeConnection.API_CONTACTS, Data.userId),
+                          status=200, content_type="application/json", body=json.dumps(Raw.contacts(10000)))
+        yield sk.contacts.sync
+
+
+@case("SkypeContacts.streamSync[10000]", 3)
+def contactsStreamSync():
+    with mocked():
+        sk = mockSkype()
+        responses.replace(responses.GET, "{0}/users/{1}".format(SkypeConnection.API_CONTACTS, Data.userId),
+                          status=200, content_type="application/json", body=json.dumps(Raw.contacts(10000)))
+        sk.contacts.stream = True
+        yield sk.contacts.sync
+
+
+@case("SkypeChats.recent[500 groups]", 3)
+def chatsRecent():
+    with mocked():
+        sk = mockSkype()
+        responses.replace(responses.GET, "{0}/users/ME/conversations".format(SkypeConnection.API_MSGSHOST),
+                          status=200, content_type="application/json", body=json.dumps(Raw.groupChats(500)))
+        responses.add(responses.GET, re.compile(r"{0}/threads/.*".format(re.escape(SkypeConnection.API_MSGSHOST))),
+                      status=200, content_type="application/json", body=json.dumps(Raw.thread()))
+        yield sk.chats.recent
+
+
+@case("SkypeChat.sendMsg", 200)
+def chatSendMsg():
+    with mocked():
+        sk = mockSkype()
+        chat = sk.chats[Data.chatThreadId]
+        yield lambda: chat.sendMsg("Hello world!")
+
+
+@case("SkypeChat.sendMsg[metrics]", 200)
+def chatSendMsgMetrics():
+    with mocked():
+        sk = mockSkype()
+        sk.conn.addInstrument(SkypeMetrics())
+        chat = sk.chats[Data.chatThreadId]
+        yield lambda: chat.sendMsg("Hello world!")
+
+
+@case("SkypeEventLoop.cycle[100 events]", 100)
+def loopCycle():
+    raws = Raw.events(100)
+    loop = SkypeEventLoop()
+    loop.conn = SkypeStubConnection(Data.userId)
+    loop.getRawEvents = lambda: raws
+    yield loop.cycle
+
+
+@case("SkypeEventLoop.cycle[100 events, router]", 100)
+def loopCycleRouter():
+    raws = Raw.events(100)
+    loop = SkypeEventLoop()
+    loop.conn = SkypeStubConnection(Data.userId)
+    loop.getRawEvents = lambda: raws
+    loop.router = SkypeEventRouter()
+    loop.router.add(lambda event: None, SkypeNewMessageEvent, content=r"^!")
+    yield loop.cycle
+
+
+@case("SkypeEventLoop.cycle[100 events, filter]", 100)
+def loopCycleFilter():
+    raws = Raw.events(100)
+    loop = SkypeEventLoop()
+    loop.conn = SkypeStubConnection(Data.userId)
+    loop.getRawEvents = lambda: raws
+    loop.eventFilter = SkypeEventFilter(skipResourceTypes="UserPresence", skipMsgTypes="Control/Typing")
+    yield loop.cycle
+
+
+def measure(op, number, repeat=3):
+    """
+    Time and trace a benchmark operation.
+
+    Args:
+        op (method): operation to call
+        number (int): calls per run
+        repeat (int): timed runs, of which the fastest is used
+
+    Returns:
+        dict: ``ops`` per second, and ``peak`` and ``retained`` memory in KiB
+    """
+    # Warm up any caches before measuring.
+    op()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        for _ in range(number):
+            op()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ops": number / best if best else float("inf"),
+            "peak": peak / 1024.0,
+            "retained": current / 1024.0}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run SkPy benchmarks against mocked API responses.")
+    parser.add_argument("-k", "--filter", help="only run cases containing this string")
+    parser.add_argument("-b", "--baseline", default=BASELINE, help="baseline file to compare against or save to")
+    parser.add_argument("-s", "--save", action="store_true",
+                        help="store the results as the new baseline, merged into it when filtered")
+    parser.add_argument("-c", "--check", action="store_true", help="exit with an error on any regression")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2,
+                        help="fraction of ops/sec that may be lost before a regression is reported")
+    opts = parser.parse_args(args)
+    baseline = {}
+    if os.path.exists(opts.baseline):
+        with open(opts.baseline) as f:
+            baseline = json.load(f)
+    results = {}
+    regressions = []
+    print("{0:<56} {1:>12} {2:>10} {3:>10} {4:>8}".format("case", "ops/sec", "peak KiB", "kept KiB", "change"))
+    for name, fn, number in cases:
+        if opts.filter and opts.filter not in name:
+            continue
+        with fn() as op:
+            results[name] = res = measure(op, number)
+        change = ""
+        if name in baseline:
+            ratio = res["ops"] / baseline[name]["ops"] - 1
+            change = "{0:+.0%}".format(ratio)
+            if ratio < -opts.tolerance:
+                regressions.append(name)
+                change += " !"
+        print("{0:<56} {1:>12.1f} {2:>10.1f} {3:>10.1f} {4:>8}"
+              .format(name, res["ops"], res["peak"], res["retained"], change))
+    if opts.save:
+        # Filtered runs only replace their own cases, leaving the rest of the baseline in place.
+        saved = dict(baseline) if opts.filter else {}
+        saved.update(results)
+        with open(opts.baseline, "w") as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+    if regressions:
+        print("Regressions: {0}".format(", ".join(regressions)))
+        if opts.check:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
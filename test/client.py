@@ -1,16 +1,32 @@
 #!/usr/bin/env python
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import time
 import re
 import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
 
 from urllib3.connection import HTTPHeaderDict
 
 import responses
 
-from skpy import Skype, SkypeConnection, SkypeContact, SkypeMsg, SkypeTextMsg, SkypeUtils
+from skpy import Skype, SkypeConnection, SkypeContact, SkypeMsg, SkypeTextMsg, SkypeUtils, SkypeTokenManager, \
+                 SkypeFileTokenStore, SkypeEndpointScheduler, SkypeEvent, SkypeEventLoop, SkypeNewMessageEvent, \
+                 SkypeEventRecorder, SkypeEventReplay, SkypeStubConnection, SkypeMetrics, SkypeApiCall, \
+                 SkypeLoopProfiler, SkypeEventRouter, SkypeMessageEvent, SkypeTypingEvent, SkypeEventFilter, \
+                 SkypeEventTracker, SkypeAckBatcher, SkypeSingleChat, SkypeEventPool, \
+                 SkypeMsgColumns, SkypeTranslator, SkypeCachedResource, SkypeException, \
+                 SkypeJsonCodec, SkypeJsonStream, SkypeEndpoint
 
 
 class Data:
@@ -300,6 +316,13 @@ def mockSkype():
     return sk
 
 
+def poolHandler(event):
+    """
+    Reply to messages from a worker process of a :class:`.SkypeEventPool`.
+    """
+    event.msg.chat.sendMsg("{0} from {1}".format(event.msg.content, os.getpid()))
+
+
 class SkypeClientTest(unittest.TestCase):
     """
     Main test class for all SkPy code.
@@ -373,6 +396,178 @@ class SkypeClientTest(unittest.TestCase):
         self.assertTrue(sk.conn.guest)
         self.assertEqual(sk.userId, Data.guestId)
 
+    @responses.activate
+    def testTokenRefresh(self):
+        """
+        Renew a registration token ahead of its expiry, and rewrite the token file.
+        """
+        sk = mockSkype()
+        tmpDir = tempfile.mkdtemp()
+        try:
+            sk.conn.setTokenFile(os.path.join(tmpDir, "tokens"))
+            sk.conn.tokenExpiry["reg"] = datetime.now() + timedelta(minutes=1)
+            manager = SkypeTokenManager(sk.conn, margin=timedelta(minutes=10))
+            # Skype token is still valid beyond the margin, registration token isn't.
+            self.assertFalse(manager.due("skype"))
+            self.assertTrue(manager.due("reg"))
+            manager.refresh()
+            self.assertEqual(sk.conn.tokens["reg"], "registrationToken={0}".format(Data.regToken))
+            self.assertFalse(manager.due("reg"))
+            # Token file should have been written in full, without leftover temporary files.
+            self.assertEqual(sorted(os.listdir(tmpDir)), ["tokens", "tokens.lock"])
+            with open(sk.conn.tokenFile) as f:
+                self.assertEqual(f.read(), sk.conn.writeTokenToStr())
+        finally:
+            shutil.rmtree(tmpDir)
+
+    @responses.activate
+    def testSharedTokenStore(self):
+        """
+        Pick up a registration token written to a shared store by another connection, instead of requesting one.
+        """
+        sk = mockSkype()
+        tmpDir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpDir, "tokens")
+            sk.conn.setTokenFile(path)
+            sk.conn.writeToken()
+            # Another process sharing the file refreshes the registration token.
+            other = mockSkype()
+            other.conn.setTokenStore(SkypeFileTokenStore(path))
+            other.conn.tokens["reg"] = "registrationToken=other"
+            other.conn.writeToken()
+            self.assertTrue(sk.conn.tokenStore.check())
+            self.assertFalse(sk.conn.tokenStore.check())
+            self.assertEqual(sk.conn.tokens["reg"], "registrationToken=other")
+            # A forced refresh should also prefer a newer stored token over registering a new endpoint.
+            other.conn.tokens["reg"] = "registrationToken=newer"
+            other.conn.writeToken()
+            endpointLink = ("{0}/users/ME/endpoints/{{{1}}}/presenceDocs/messagingService"
+                            .format(sk.conn.msgsHost, Data.endpointId))
+            responses.replace(responses.GET, "{0}/users/ME/presenceDocs/messagingService".format(sk.conn.msgsHost),
+                              status=200, json={"endpointPresenceDocs": [{"link": endpointLink}]})
+            calls = len(responses.calls)
+            sk.conn.getRegToken()
+            self.assertEqual(sk.conn.tokens["reg"], "registrationToken=newer")
+            self.assertFalse([call for call in responses.calls[calls:] if call.request.method == "POST"])
+            # Endpoints should still be picked up and configured for the stored token.
+            self.assertEqual(sk.conn.endpoints["main"].id, "{{{0}}}".format(Data.endpointId))
+            self.assertTrue(any(call.request.method == "PUT" for call in responses.calls[calls:]))
+            # Tokens stored for a different user should be ignored.
+            other.conn.userId = "other.user"
+            other.conn.tokens["reg"] = "registrationToken=stranger"
+            other.conn.writeToken()
+            self.assertFalse(sk.conn.readStoredTokens())
+            self.assertEqual(sk.conn.tokens["reg"], "registrationToken=newer")
+            # A Skype token just obtained by logging in shouldn't be replaced by an older stored one.
+            other.conn.userId = sk.conn.userId
+            other.conn.tokens["skype"] = "olderSkypeToken"
+            other.conn.tokenExpiry["skype"] = sk.conn.tokenExpiry["skype"] - timedelta(minutes=5)
+            other.conn.writeToken()
+            sk.conn.readStoredTokens()
+            self.assertEqual(sk.conn.tokens["skype"], Data.skypeToken)
+            with sk.conn.tokenStore.lock():
+                with sk.conn.tokenStore.lock():
+                    self.assertTrue(os.path.exists(sk.conn.tokenStore.lockPath))
+        finally:
+            shutil.rmtree(tmpDir)
+
+    @responses.activate
+    def testEndpointKeepAlive(self):
+        """
+        Ping an endpoint, and recover it after a lapse.
+        """
+        sk = mockSkype()
+        endpoint = sk.conn.endpoints["self"]
+        pingUrl = "{0}/users/ME/endpoints/SELF/active".format(SkypeConnection.API_MSGSHOST)
+        subUrl = "{0}/users/ME/endpoints/SELF/subscriptions".format(SkypeConnection.API_MSGSHOST)
+        responses.add(responses.POST, pingUrl, status=200)
+        responses.add(responses.POST, pingUrl, status=404)
+        contactsUrl = "{0}/users/ME/contacts".format(SkypeConnection.API_MSGSHOST)
+        responses.add(responses.POST, subUrl, status=201)
+        responses.add(responses.PUT, "{0}/0".format(subUrl), status=200)
+        responses.add(responses.POST, contactsUrl, status=201)
+        endpoint.subscribePresence([SkypeContact(sk, id="user.{0}".format(i)) for i in range(2)])
+        scheduler = SkypeEndpointScheduler()
+        scheduler.add(endpoint)
+        scheduler.keep(endpoint)
+        self.assertEqual(scheduler.stats["pings"], 1)
+        # Second ping finds the endpoint lapsed, so it should be re-registered and re-subscribed.
+        scheduler.keep(endpoint)
+        self.assertEqual(scheduler.stats["lapses"], 1)
+        self.assertEqual(scheduler.stats["recoveries"], 1)
+        self.assertEqual(scheduler.endpointStats[endpoint]["lapses"], 1)
+        self.assertEqual(sk.conn.tokens["reg"], "registrationToken={0}".format(Data.regToken))
+        self.assertEqual(len([call for call in responses.calls if call.request.url == subUrl]), 2)
+        # Presence should be restored for the same contacts.
+        self.assertEqual(len([call for call in responses.calls if call.request.url.startswith(subUrl + "/0")]), 2)
+        self.assertEqual(len([call for call in responses.calls if call.request.url == contactsUrl]), 2)
+        self.assertEqual(endpoint.presenceIds, {"user.0", "user.1"})
+        scheduler.remove(endpoint)
+        self.assertFalse(scheduler.queue)
+        # A lapsed main endpoint is replaced by the one registered in its place.
+        old = sk.conn.endpoints["main"] = SkypeEndpoint(sk.conn, "{00000000-0000-0000-0000-000000000000}")
+        responses.add(responses.POST, "{0}/users/ME/endpoints/%7B00000000-0000-0000-0000-000000000000%7D/active"
+                                      .format(SkypeConnection.API_MSGSHOST), status=404)
+        scheduler.add(old)
+        new = scheduler.keep(old)
+        self.assertIs(new, sk.conn.endpoints["main"])
+        self.assertEqual(new.id, "{{{0}}}".format(Data.endpointId))
+        self.assertEqual([item[2] for item in scheduler.queue], [new])
+        self.assertEqual(scheduler.endpointStats[new]["lapses"], 1)
+        self.assertNotIn(old, scheduler.endpointStats)
+
+    @responses.activate
+    def testPresence(self):
+        """
+        Subscribe to presence in chunks, and track presence events in a local table.
+        """
+        sk = mockSkype()
+        endpointUrl = "{0}/users/ME/endpoints/SELF/subscriptions".format(SkypeConnection.API_MSGSHOST)
+        contactsUrl = "{0}/users/ME/contacts".format(SkypeConnection.API_MSGSHOST)
+        responses.add(responses.POST, endpointUrl, status=201)
+        responses.add(responses.PUT, "{0}/0".format(endpointUrl), status=200)
+        responses.add(responses.POST, contactsUrl, status=201)
+        responses.add(responses.DELETE, re.compile("{0}/8:.*".format(re.escape(contactsUrl))), status=200)
+        contacts = [SkypeContact(sk, id="user.{0}".format(i)) for i in range(5)]
+        endpoint = sk.conn.endpoints["self"]
+        endpoint.subscribePresence(contacts, chunkSize=2)
+        posts = [call for call in responses.calls if call.request.url == contactsUrl]
+        self.assertEqual(len(posts), 3)
+        self.assertEqual(endpoint.presenceIds, set(contact.id for contact in contacts))
+        # Only the differences should be sent when the contact list changes.
+        calls = len(responses.calls)
+        endpoint.syncPresence(["user.1", "user.2", "user.3", "user.4", "user.5"], chunkSize=2)
+        self.assertEqual([call.request.method for call in responses.calls[calls:]], ["POST", "DELETE"])
+        # Looking up a contact only subscribes to their presence if asked.
+        responses.add(responses.POST, "{0}/users/batch/profiles".format(SkypeConnection.API_USER), status=200,
+                      json=[{"username": "user.9"}])
+        calls = len(responses.calls)
+        sk.contacts.contact("user.9")
+        self.assertEqual([call.request.method for call in responses.calls[calls:]], ["POST"])
+        self.assertNotIn("user.9", endpoint.presenceIds)
+        sk.contacts.contact("user.9", subscribe=True)
+        self.assertIn("user.9", endpoint.presenceIds)
+        # Presence events should update the table, and notify only on changes.
+        changes = []
+        sk.presence.addListener(lambda old, new: changes.append((old, new)))
+        raw = {"id": 1000, "time": "2016-01-01T00:00:00Z", "resourceType": "UserPresence",
+               "resource": {"selfLink": "{0}/users/8:{1}/presenceDocs/messagingService"
+                                        .format(SkypeConnection.API_MSGSHOST, Data.contactId),
+                            "availability": "Online", "status": "Online", "capabilities": "Audio | Video"}}
+        first = SkypeEvent.fromRaw(sk, raw)
+        sk.presence.update(first)
+        repeat = SkypeEvent.fromRaw(sk, dict(raw, time="2016-01-01T00:05:00Z"))
+        self.assertFalse(sk.presence.update(repeat))
+        self.assertEqual(len(changes), 1)
+        # Repeats leave both the live event and the time of the change as they were.
+        self.assertEqual(repeat.time, datetime(2016, 1, 1, 0, 5))
+        self.assertIs(sk.presence[Data.contactId], first)
+        self.assertTrue(sk.presence.online(Data.contactId))
+        self.assertEqual(sk.presence[Data.contactId].status, SkypeUtils.Status.Online)
+        self.assertEqual(sk.presence[Data.contactId].capabilities, ["Audio", "Video"])
+        self.assertIsNone(sk.presence[Data.nonContactId])
+
     @responses.activate
     def testContactList(self):
         """
@@ -456,6 +651,754 @@ class SkypeClientTest(unittest.TestCase):
         self.assertTrue(isinstance(msg, SkypeTextMsg))
         self.assertEqual(msg.type, "RichText")
 
+    @responses.activate
+    def testMetrics(self):
+        """
+        Aggregate API requests per endpoint, including retries after re-subscribing.
+        """
+        sk = mockSkype()
+        metrics = sk.conn.addInstrument(SkypeMetrics())
+        sk.chats[Data.chatThreadId].sendMsg("Word")
+        sk.chats[Data.chatThreadId].sendMsg("Word")
+        # Identifiers are replaced in endpoint templates.
+        sendKey = ("POST", "{0}/users/ME/conversations/{{id}}/messages".format(SkypeConnection.API_MSGSHOST))
+        self.assertEqual(SkypeApiCall.template("{0}/users/ME/conversations/{1}/messages?x=1"
+                                               .format(SkypeConnection.API_MSGSHOST, Data.chatThreadId)), sendKey[1])
+        stats = metrics.endpoints[sendKey]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["statuses"], {200: 2})
+        self.assertEqual(stats["latency"].count, 2)
+        self.assertTrue(stats["sent"] > 0 and stats["received"] > 0)
+        # A poll on a lapsed subscription is retried once re-subscribed.
+        pollUrl = "{0}/users/ME/endpoints/SELF/subscriptions/0/poll".format(SkypeConnection.API_MSGSHOST)
+        responses.add(responses.POST, "{0}/users/ME/endpoints/SELF/subscriptions".format(SkypeConnection.API_MSGSHOST),
+                      status=201)
+        responses.add(responses.POST, pollUrl, status=404)
+        responses.add(responses.POST, pollUrl, status=200, json={"eventMessages": []})
+        sk.conn.endpoints["self"].subscribed = True
+        sk.getRawEvents()
+        self.assertEqual(metrics.retries, 1)
+        pollStats = metrics.endpoints[("POST", SkypeApiCall.template(pollUrl))]
+        self.assertEqual((pollStats["count"], pollStats["errors"], pollStats["retries"]), (2, 1, 1))
+        self.assertEqual(metrics.summary()["POST {0}".format(SkypeApiCall.template(pollUrl))]["latency"]["count"], 2)
+        # Nothing more is collected once removed.
+        sk.conn.removeInstrument(metrics)
+        sk.chats[Data.chatThreadId].sendMsg("Word")
+        self.assertEqual(metrics.endpoints[sendKey]["count"], 2)
+
+    @responses.activate
+    def testState(self):
+        """
+        Save cached account data, and restore it in a new instance without any API calls.
+        """
+        sk = mockSkype()
+        self.assertEqual(sk.user.id, Data.userId)
+        self.assertTrue(len(sk.contacts))
+        sk.chats.recent()
+        sk.settings.syncFlags()
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "state.pkl.gz")
+            sk.saveState(path)
+            # State should be written in full, without leftover temporary files.
+            self.assertEqual(os.listdir(tmp), ["state.pkl.gz"])
+            other = mockSkype()
+            calls = len(responses.calls)
+            self.assertIs(other.loadState(path, refresh=False), True)
+            user = other.user
+            self.assertEqual(user.id, Data.userId)
+            self.assertIs(user.skype, other)
+            self.assertEqual([contact.id for contact in other.contacts], [contact.id for contact in sk.contacts])
+            self.assertEqual(set(other.chats.cache), set(sk.chats.cache))
+            self.assertEqual(other.conn.syncStates, sk.conn.syncStates)
+            self.assertEqual(other.settings.flags, {1})
+            self.assertEqual(len(responses.calls), calls)
+            # Restored data is revalidated in place, keeping the objects already handed out.
+            contact = other.contacts[next(iter(other.contacts.contactIds))]
+            other.refreshState()
+            self.assertGreater(len(responses.calls), calls)
+            self.assertIs(other.user, user)
+            self.assertIs(other.contacts.cache[contact.id], contact)
+            self.assertEqual(other.contacts.revalidate(), (set(), set(), set()))
+            third = mockSkype()
+            thread = third.loadState(path)
+            self.assertIs(third.refreshThread, thread)
+            thread.join()
+            self.assertEqual(third.user.id, Data.userId)
+            # State is only used for the same account, and within the age limit.
+            self.assertFalse(mockSkype().loadState(path, maxAge=-1))
+            third.conn.userId = "someone.else"
+            with self.assertRaises(SkypeException):
+                third.loadState(path)
+        finally:
+            shutil.rmtree(tmp)
+
+    @responses.activate
+    def testEventTracker(self):
+        """
+        Drop repeated events, and backfill messages missed while re-subscribing.
+        """
+        sk = mockSkype()
+        sk.tracker = SkypeEventTracker(sk)
+        host = SkypeConnection.API_MSGSHOST
+        chatId = "8:{0}".format(Data.contactId)
+        pollUrl = "{0}/users/ME/endpoints/SELF/subscriptions/0/poll".format(host)
+        ackUrl = "{0}/users/ME/conversations/ALL/messages/1000/ack".format(host)
+
+        def msg(id, second):
+            return {"id": id, "messagetype": "Text", "content": "Message {0}".format(id),
+                    "originalarrivaltime": "2016-01-01T00:00:{0:02d}.000Z".format(second),
+                    "conversationLink": "{0}/users/ME/conversations/{1}".format(host, chatId),
+                    "from": "{0}/users/ME/contacts/{1}".format(host, chatId)}
+
+        def event(id, res):
+            return dict(id=id, resourceType="NewMessage", time="2016-01-01T00:00:00Z", resource=res)
+
+        first = event(1000, dict(msg("1", 1), ackrequired=ackUrl))
+        responses.add(responses.POST, pollUrl, status=200, json={"eventMessages": [first, first]})
+        responses.add(responses.POST, ackUrl, status=201)
+        sk.conn.endpoints["self"].subscribed = True
+        self.assertEqual([raw["resource"]["id"] for raw in sk.getRawEvents()], ["1"])
+        self.assertEqual(sk.tracker.duplicates, 1)
+        self.assertEqual(sk.tracker.marks[chatId], (1451606401000, "1"))
+        # The subscription lapses, and message 2 is only found in the conversation history.
+        responses.add(responses.POST, "{0}/users/ME/endpoints/SELF/subscriptions".format(host), status=201)
+        responses.add(responses.POST, pollUrl, status=404)
+        responses.add(responses.POST, pollUrl, status=200, json={"eventMessages": [event(1000, msg("3", 3))]})
+        responses.add(responses.GET, "{0}/users/ME/conversations/{1}/messages".format(host, chatId), status=200,
+                      json={"messages": [msg("3", 3), msg("2", 2), msg("1", 1)], "_metadata": {}})
+        raws = sk.getRawEvents()
+        self.assertEqual([raw["resource"]["id"] for raw in raws], ["2", "3"])
+        self.assertTrue(all(raw.get("backfill") for raw in raws))
+        self.assertEqual((sk.tracker.backfilled, sk.tracker.duplicates), (2, 2))
+        self.assertEqual([call.request.method for call in responses.calls].count("GET"), 1)
+
+    def testAckBatcher(self):
+        """
+        Merge repeated acknowledgements and consumption horizons, sending only once per window.
+        """
+        sk = Skype(connect=False)
+        sk.conn = SkypeStubConnection(Data.userId)
+        acks = sk.conn.acks = SkypeAckBatcher(sk.conn, window=60)
+        ackUrl = "{0}/users/ME/conversations/ALL/messages/{{0}}/ack".format(SkypeConnection.API_MSGSHOST)
+        for id in (1000, 1001, 1000):
+            SkypeEvent.ackRaw(sk.conn, {"id": id, "resource": {"ackrequired": ackUrl.format(id)}})
+        chat = SkypeSingleChat(sk, id="8:{0}".format(Data.contactId))
+        for stamp in (1000, 3000, 2000):
+            chat.setConsumption("0;{0};0".format(stamp))
+        # Nothing is sent until the window closes or the batcher is flushed.
+        self.assertEqual(sk.conn.calls, [])
+        self.assertEqual(acks.pending, 3)
+        acks.flush()
+        self.assertEqual([(method, url) for method, url, kwargs in sk.conn.calls[:2]],
+                         [("POST", ackUrl.format(1000)), ("POST", ackUrl.format(1001))])
+        self.assertEqual(sk.conn.calls[2][2]["json"], {"consumptionhorizon": "0;3000;0"})
+        self.assertEqual(acks.stats, {"acks": 2, "horizons": 1, "merged": 3, "failures": 0})
+        # Anything pending is sent when the background thread stops.
+        with acks:
+            self.assertTrue(acks.running)
+            SkypeEvent.ackRaw(sk.conn, {"resource": {"ackrequired": ackUrl.format(1002)}})
+        self.assertFalse(acks.running)
+        self.assertEqual(sk.conn.calls[-1][1], ackUrl.format(1002))
+
+    def testEventPool(self):
+        """
+        Handle events in worker processes, sharded by conversation, with replies sent by the parent.
+        """
+        sk = Skype(connect=False)
+        sk.conn = SkypeStubConnection(Data.userId)
+        host = SkypeConnection.API_MSGSHOST
+        chatIds = ("8:{0}".format(Data.contactId), "8:{0}".format(Data.nonContactId))
+        for chatId in chatIds:
+            sk.chats.cache[chatId] = SkypeSingleChat(sk, id=chatId, userId=chatId[2:])
+        events = []
+        for i in range(6):
+            events.append(SkypeEvent.fromRaw(sk, {
+                "id": 1000 + i, "time": "2016-01-01T00:00:00Z", "resourceType": "NewMessage",
+                "resource": {"id": str(i), "messagetype": "Text", "content": str(i),
+                             "originalarrivaltime": Data.msgTimeFmt,
+                             "conversationLink": "{0}/users/ME/conversations/{1}".format(host, chatIds[i % 2]),
+                             "from": "{0}/users/ME/contacts/{1}".format(host, chatIds[i % 2])}}))
+        # Events are pickled without their connection, and enum values keep their identity.
+        copy = pickle.loads(pickle.dumps(events[0]))
+        self.assertIsNone(copy.skype)
+        self.assertEqual((copy.id, copy.msgId, copy.time, copy.raw), (1000, 0, events[0].time, events[0].raw))
+        self.assertIs(pickle.loads(pickle.dumps(SkypeUtils.Status.Online)), SkypeUtils.Status.Online)
+        pool = SkypeEventPool(sk, poolHandler, processes=2)
+        self.assertEqual(pool.shard(events[0])[1], chatIds[0])
+        for event in events:
+            pool.dispatch(event)
+        pool.close()
+        self.assertEqual(pool.stats, {"events": 6, "replies": 6, "errors": 0})
+        # Replies are sent from the pool's own thread, which finishes once they're all sent.
+        self.assertFalse(pool.outbox)
+        self.assertFalse(pool.sender.is_alive())
+        for i, chatId in enumerate(chatIds):
+            sent = [kwargs["json"]["content"].split(" from ") for method, url, kwargs in sk.conn.calls
+                    if url == "{0}/users/ME/conversations/{1}/messages".format(host, chatId)]
+            # Each conversation's events are handled in order, outside of this process.
+            self.assertEqual([content for content, pid in sent], [str(j) for j in range(i, 6, 2)])
+            self.assertNotIn(str(os.getpid()), [pid for content, pid in sent])
+
+    @responses.activate
+    def testMsgColumns(self):
+        """
+        Extract message metadata into dictionary-encoded columns, from event logs and conversation history.
+        """
+        host = SkypeConnection.API_MSGSHOST
+
+        def event(id, chatId, userId, msgType, stamp):
+            return {"id": id, "resourceType": "NewMessage",
+                    "resource": {"id": str(id), "messagetype": msgType, "originalarrivaltime": stamp,
+                                 "conversationLink": "{0}/users/ME/conversations/{1}".format(host, chatId),
+                                 "from": "{0}/users/ME/contacts/8:{1}".format(host, userId)}}
+
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "events.log.gz")
+            with SkypeEventRecorder(path) as recorder:
+                recorder.record([event(1000, Data.chatThreadId, Data.contactId, "Text", "2016-01-01T00:00:00.123Z"),
+                                 {"id": 1001, "resourceType": "UserPresence", "resource": {}},
+                                 event(1002, Data.chatThreadId, Data.nonContactId, "RichText", "bad"),
+                                 event(1003, Data.chatThreadId, Data.contactId, "Text", "2016-01-01T01:00:00Z")])
+            cols = SkypeMsgColumns()
+            cols.addLog(path)
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(cols.count, 3)
+        self.assertEqual(list(cols.times), [1451606400123, 0, 1451610000000])
+        self.assertEqual((cols.userIds, list(cols.users)), ([Data.contactId, Data.nonContactId], [0, 1, 0]))
+        self.assertEqual((cols.chatIds, list(cols.chats)), ([Data.chatThreadId], [0, 0, 0]))
+        self.assertEqual((cols.msgTypes, list(cols.types)), (["Text", "RichText"], [0, 1, 0]))
+        # History pages are read without creating message objects.
+        sk = mockSkype()
+        chat = sk.chats[Data.chatThreadId]
+        msgsUrl = "{0}/users/ME/conversations/{1}/messages".format(SkypeConnection.API_MSGSHOST, Data.chatThreadId)
+        nextUrl = "https://example.com/messages/next"
+        # A page without a link to the next one is only read once.
+        single = SkypeMsgColumns()
+        single.addHistory(chat)
+        self.assertEqual(single.count, 1)
+        raw = chat.getRawMsgs()[0]
+        responses.replace(responses.GET, msgsUrl, status=200,
+                          json={"messages": [raw], "_metadata": {"syncState": nextUrl}})
+        responses.add(responses.GET, nextUrl, status=200, json={"messages": []})
+        sk.conn.syncStates.clear()
+        chat.getRawMsgs()
+        cols.addHistory(chat)
+        self.assertEqual(cols.count, 4)
+        # The export pages separately, leaving the conversation's own position alone.
+        self.assertEqual(sk.conn.syncStates[("GET", msgsUrl)], [nextUrl])
+        self.assertEqual(cols.userIds[cols.users[3]], Data.nonContactId)
+        data = cols.arrays()
+        self.assertEqual(list(data["time"])[:1], [1451606400123])
+        self.assertEqual(data["msgTypes"], cols.msgTypes)
+
+    @responses.activate
+    def testSettingsBatch(self):
+        """
+        Load all settings in one pass, and apply only the changed ones from a batch.
+        """
+        sk = mockSkype()
+        flags = {15, 28}
+        writes = []
+
+        def flagWrite(req):
+            id = int(req.url.rsplit("/", 1)[1])
+            writes.append((req.method, id))
+            flags.add(id) if req.method == "PUT" else flags.discard(id)
+            return (200, {}, "")
+
+        def optWrite(req):
+            writes.append((req.method, json.loads(req.body)["value"]))
+            return (200, {}, "")
+
+        responses.remove(responses.GET, SkypeConnection.API_FLAGS)
+        responses.add_callback(responses.GET, SkypeConnection.API_FLAGS,
+                               callback=lambda req: (200, {}, json.dumps(sorted(flags))))
+        flagUrl = re.compile(r"{0}/\d+".format(re.escape(SkypeConnection.API_FLAGS)))
+        responses.add_callback(responses.PUT, flagUrl, callback=flagWrite)
+        responses.add_callback(responses.DELETE, flagUrl, callback=flagWrite)
+        optUrl = "{0}/calling.skype-call-policy".format(SkypeConnection.API_OPTIONS)
+        responses.add(responses.GET, optUrl, status=200, json={"value": "EVERYONE_CAN_CALL"})
+        responses.add_callback(responses.PUT, optUrl, callback=optWrite)
+        settings = sk.settings.load()
+        fetched = len(responses.calls)
+        self.assertTrue(settings.darkTheme)
+        self.assertEqual(settings.videoPrivacy, settings.Privacy.Contacts)
+        self.assertEqual(settings.callPrivacy, settings.Privacy.Anyone)
+        self.assertEqual(len(responses.calls), fetched)
+        with settings.batch():
+            settings.darkTheme = True
+            settings.youtubePlayer = True
+            settings.callPrivacy = settings.Privacy.Contacts
+            settings.videoPrivacy = settings.Privacy.Anyone
+            self.assertEqual(settings.videoPrivacy, settings.Privacy.Anyone)
+            self.assertEqual(writes, [])
+        self.assertEqual(sorted(writes, key=str), sorted([("PUT", 12), ("DELETE", 15),
+                                                          ("PUT", "AUTHORIZED_CAN_CALL")], key=str))
+        self.assertEqual(flags, {12, 28})
+        self.assertTrue(settings.youtubePlayer)
+        self.assertEqual(settings.callPrivacy, settings.Privacy.Contacts)
+        # Changes are dropped if the block fails.
+        with self.assertRaises(ValueError):
+            with settings.batch():
+                settings.darkTheme = False
+                raise ValueError
+        self.assertTrue(settings.darkTheme)
+        self.assertEqual(len(writes), 3)
+        # A snapshot taken by the batch itself is discarded afterwards.
+        settings.unload()
+        with settings.batch():
+            settings.darkTheme = False
+        self.assertFalse(settings.snapshot)
+        self.assertEqual(len(writes), 4)
+        self.assertFalse(settings.darkTheme)
+
+    @responses.activate
+    def testJsonCodec(self):
+        """
+        Encode request bodies and decode responses with a custom JSON codec.
+        """
+        sk = mockSkype()
+        used = []
+
+        def loads(data):
+            used.append("loads")
+            return json.loads(data)
+
+        def dumps(obj):
+            used.append("dumps")
+            return json.dumps(obj)
+
+        sk.conn.codec = SkypeJsonCodec("test", loads, dumps)
+        url = "{0}/calling.skype-call-policy".format(SkypeConnection.API_OPTIONS)
+        responses.add(responses.GET, url, status=200, json={"value": "EVERYONE_CAN_CALL"})
+        responses.add_callback(responses.PUT, url,
+                               callback=lambda req: (200, {"Content-Type": req.headers["Content-Type"]}, req.body))
+        self.assertEqual(sk.settings.callPrivacyOpt, "EVERYONE_CAN_CALL")
+        self.assertEqual(used, ["loads"])
+        resp = sk.conn("PUT", url, json={"value": "AUTHORIZED_CAN_CALL"})
+        self.assertEqual(resp.headers["Content-Type"], "application/json")
+        self.assertEqual(resp.json(), {"value": "AUTHORIZED_CAN_CALL"})
+        self.assertEqual(used, ["loads", "dumps", "loads"])
+        # Invalid responses still raise ValueError, as with requests.
+        responses.add(responses.GET, SkypeConnection.API_JOIN, status=200, body="<html/>")
+        with self.assertRaises(ValueError):
+            sk.conn("GET", SkypeConnection.API_JOIN).json()
+        # Installed libraries can be picked by name.
+        self.assertEqual(SkypeJsonCodec.named("json").loads(b'{"a": 1}'), {"a": 1})
+        for name in ("orjson", "ujson"):
+            codec = SkypeJsonCodec.named(name)
+            if codec:
+                self.assertEqual(codec.loads(codec.dumps({"a": [1, "\u00e9"]})), {"a": [1, "\u00e9"]})
+
+    @responses.activate
+    def testJsonStream(self):
+        """
+        Decode large arrays incrementally, for contacts, conversations and message history.
+        """
+        doc = {"count": 3, "contacts": [{"id": i, "name": "\u00e9" * i} for i in range(3)], "empty": [],
+               "_metadata": {"syncState": "https://example.com/next"}}
+        body = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        # Values (and multi-byte characters) may be split across chunks.
+        stream = SkypeJsonStream([body[i:i + 3] for i in range(0, len(body), 3)], ("contacts", "empty"))
+        self.assertEqual([item for key, item in stream], doc["contacts"])
+        self.assertEqual(stream.rest, {"count": 3, "_metadata": doc["_metadata"]})
+        with self.assertRaises(ValueError):
+            list(SkypeJsonStream([b'{"contacts": [{"id": 1}'], ("contacts",)))
+        sk = mockSkype()
+        contacts = list(sk.contacts.streamSync())
+        self.assertEqual(set(contact.id for contact in contacts), set(sk.contacts.cache))
+        self.assertTrue(sk.contacts.synced)
+        other = mockSkype()
+        other.contacts.sync()
+        self.assertEqual(sk.contacts.contactIds, other.contacts.contactIds)
+        self.assertEqual(sk.contacts.blocked.userIds, other.contacts.blocked.userIds)
+        chats = list(sk.chats.streamRecent())
+        self.assertEqual(set(chat.id for chat in chats), set(sk.chats.cache))
+        msgs = list(sk.chats[Data.chatThreadId].iterRawMsgs())
+        self.assertEqual(msgs, sk.chats[Data.chatThreadId].getRawMsgs())
+
+    @responses.activate
+    def testCachedResource(self):
+        """
+        Keep copies of external documents on disk, and revalidate them once expired.
+        """
+        url = "{0}/Test/0_0.0.0.0".format(SkypeConnection.API_CONFIG)
+
+        def config(req):
+            if req.headers.get("If-None-Match") == "v1":
+                return (304, {}, "")
+            return (200, {"ETag": "v1"}, json.dumps({"value": 1}))
+
+        responses.add_callback(responses.GET, url, callback=config)
+        tmp = tempfile.mkdtemp()
+        try:
+            SkypeCachedResource.cacheDir = tmp
+            self.assertEqual(SkypeCachedResource("test", url).get(), {"value": 1})
+            # A new instance (e.g. in another process) reads from disk.
+            resource = SkypeCachedResource("test", url)
+            self.assertEqual(resource.get(), {"value": 1})
+            self.assertEqual(len(responses.calls), 1)
+            self.assertEqual(resource.stats["fetches"], 0)
+            # Expired copies are revalidated rather than downloaded again.
+            resource.fetched -= resource.ttl + 1
+            self.assertEqual(resource.get(wait=True), {"value": 1})
+            self.assertEqual(len(responses.calls), 2)
+            self.assertEqual(resource.stats["revalidations"], 1)
+            self.assertFalse(resource.stale)
+            # A failed write leaves neither a partial document nor a stray temporary file behind.
+            files = sorted(os.listdir(tmp))
+            with mock.patch("os.replace", side_effect=OSError):
+                self.assertRaises(OSError, resource.save)
+            self.assertEqual(sorted(os.listdir(tmp)), files)
+        finally:
+            SkypeCachedResource.cacheDir = None
+            shutil.rmtree(tmp)
+
+    @responses.activate
+    def testTranslatorCache(self):
+        """
+        Translate strings once, serving repeats from a bounded cache that can be saved to disk.
+        """
+        sk = mockSkype()
+        requested = []
+
+        def translate(req):
+            text = re.search(r"text=([^&]*)", req.url).group(1)
+            requested.append(text)
+            return (200, {}, json.dumps({"translation": text.upper()}))
+
+        responses.add_callback(responses.GET, "{0}/skype/translate".format(SkypeConnection.API_TRANSLATE),
+                               callback=translate)
+        translate = sk.translate
+        translate.cacheSize = 3
+        self.assertEqual(translate("hi", "fr")["translation"], "HI")
+        self.assertEqual(translate("hi", "fr")["translation"], "HI")
+        self.assertEqual(requested, ["hi"])
+        self.assertEqual(translate.stats, {"hits": 1, "misses": 1})
+        # Batches only request new strings, once each.
+        results = translate.batch(["a", "hi", "b", "a"], "fr")
+        self.assertEqual([result["translation"] for result in results], ["A", "HI", "B", "A"])
+        self.assertEqual(sorted(requested), ["a", "b", "hi"])
+        # The least recently used entry is evicted once full.
+        translate("c", "fr")
+        self.assertEqual(set(text for text, fromLang, toLang in translate.cache), {"a", "b", "c"})
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "translations.json")
+            translate.saveCache(path)
+            self.assertEqual(os.listdir(tmp), ["translations.json"])
+            other = SkypeTranslator(sk, cacheTTL=None)
+            self.assertEqual(other.loadCache(path), 3)
+            self.assertEqual(other("b", "fr")["translation"], "B")
+            self.assertEqual(len(requested), 4)
+        finally:
+            shutil.rmtree(tmp)
+
+    def testEventReplay(self):
+        """
+        Record raw events to a log, and replay them through an event loop without a connection.
+        """
+        chatFmt = (SkypeConnection.API_MSGSHOST, Data.chatThreadId)
+        raw = {"id": 1000, "time": "2016-01-01T00:00:00Z", "resourceType": "NewMessage",
+               "resource": {"id": Data.msgId, "messagetype": "Text", "content": "Hi!",
+                            "originalarrivaltime": Data.msgTimeFmt,
+                            "conversationLink": "{0}/users/ME/conversations/{1}".format(*chatFmt),
+                            "from": "{0}/users/ME/contacts/8:{1}".format(SkypeConnection.API_MSGSHOST, Data.contactId),
+                            "ackrequired": "{0}/users/ME/conversations/ALL/messages/1/ack"
+                                           .format(SkypeConnection.API_MSGSHOST)}}
+
+        class Loop(SkypeEventLoop):
+            def onEvent(self, event):
+                self.seen.append(event)
+
+        tmpDir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpDir, "events.log.gz")
+            with SkypeEventRecorder(path) as recorder:
+                recorder.record([raw, raw])
+                recorder.record([raw])
+            loop = Loop()
+            loop.seen = []
+            stats = SkypeEventReplay(path, loop).run()
+            self.assertEqual(stats["events"], 3)
+            self.assertEqual(len(loop.seen), 3)
+            self.assertTrue(isinstance(loop.seen[0], SkypeNewMessageEvent))
+            self.assertEqual(loop.seen[0].msg.content, "Hi!")
+            # Acks should have gone to the stub connection.
+            self.assertEqual(len(loop.conn.calls), 3)
+            self.assertEqual(loop.conn.calls[0][1], raw["resource"]["ackrequired"])
+        finally:
+            shutil.rmtree(tmpDir)
+
+    @responses.activate
+    def testDebugHttp(self):
+        """
+        Print requests and pretty-printed responses whilst the debug environment variable is set.
+        """
+        sk = mockSkype()
+        url = "{0}/users/self/profile".format(SkypeConnection.API_USER)
+        out = StringIO()
+        with redirect_stdout(out):
+            sk.conn("GET", url, auth=SkypeConnection.Auth.SkypeToken)
+        self.assertEqual(out.getvalue(), "")
+        # The variable is checked on each call, so can be set at runtime.
+        with mock.patch.dict(os.environ, {"SKPY_DEBUG_HTTP": "1"}), redirect_stdout(out):
+            sk.conn("GET", url, auth=SkypeConnection.Auth.SkypeToken)
+        self.assertIn("GET {0}".format(url), out.getvalue())
+        self.assertIn("'username': '{0}'".format(Data.userId), out.getvalue())
+        self.assertFalse(sk.conn.instruments)
+
+    def testLoopProfiler(self):
+        """
+        Time each stage of an event loop cycle, and report slow handlers and lagging events.
+        """
+        now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        host = SkypeConnection.API_MSGSHOST
+        raws = [{"id": 1000, "time": "2016-01-01T00:00:00Z", "resourceType": "EndpointPresence",
+                 "resource": {"selfLink": "{0}/users/8:{1}/endpoints/SELF/presenceDocs/messagingService"
+                                          .format(host, Data.contactId)}},
+                {"id": 1001, "time": now, "resourceType": "NewMessage",
+                 "resource": {"id": Data.msgId, "messagetype": "Control/Typing",
+                              "conversationLink": "{0}/users/ME/conversations/8:{1}".format(host, Data.contactId),
+                              "from": "{0}/users/ME/contacts/8:{1}".format(host, Data.contactId),
+                              "ackrequired": "{0}/users/ME/conversations/ALL/messages/1/ack".format(host)}}]
+
+        class Loop(SkypeEventLoop):
+            def onEvent(self, event):
+                if event.type == "NewMessage":
+                    time.sleep(0.02)
+
+        slow = []
+        loop = Loop()
+        loop.conn = SkypeStubConnection(Data.userId)
+        loop.getRawEvents = lambda: raws
+        loop.profiler = SkypeLoopProfiler(thresholds={"handle": 0.01, "lag": 3600},
+                                          callback=lambda *args: slow.append(args), sampleRate=1)
+        loop.cycle()
+        summary = loop.profiler.summary()
+        self.assertEqual(summary["stages"]["poll"]["count"], 1)
+        self.assertEqual(summary["stages"]["parse"]["count"], 2)
+        self.assertEqual(summary["stages"]["handle"]["count"], 2)
+        self.assertEqual(summary["types"]["SkypeTypingEvent"]["ack"]["count"], 1)
+        self.assertEqual(summary["lag"]["count"], 2)
+        # The old event is lagging, and the typing event handler is slow, with a profile of the sleep.
+        self.assertEqual([(stage, type(event).__name__) for stage, _, event, _ in slow],
+                         [("lag", "SkypeEndpointEvent"), ("handle", "SkypeTypingEvent")])
+        self.assertIn("sleep", slow[1][3])
+        self.assertEqual(len(loop.profiler.profiles), 1)
+        # Lag is measured to fractions of a second.
+        self.assertAlmostEqual(SkypeLoopProfiler.eventLag({"time": "2016-01-01T00:00:00.250Z"}, 1451606400.5), 0.25)
+        self.assertIsNone(SkypeLoopProfiler.eventLag({"time": "yesterday"}))
+
+    def testEventRouter(self):
+        """
+        Route events to handlers by class, conversation, sender and content, skipping events with no routes.
+        """
+        host = SkypeConnection.API_MSGSHOST
+
+        def msg(id, chatId, userId, msgType, content):
+            return {"id": id, "time": "2016-01-01T00:00:00Z", "resourceType": "NewMessage",
+                    "resource": {"id": Data.msgId, "messagetype": msgType, "content": content,
+                                 "originalarrivaltime": Data.msgTimeFmt,
+                                 "conversationLink": "{0}/users/ME/conversations/{1}".format(host, chatId),
+                                 "from": "{0}/users/ME/contacts/8:{1}".format(host, userId),
+                                 "ackrequired": "{0}/users/ME/conversations/ALL/messages/{1}/ack".format(host, id)}}
+
+        raws = [msg(1000, Data.chatThreadId, Data.contactId, "Text", "!ping"),
+                msg(1001, Data.chatThreadId, Data.nonContactId, "Text", "Hello"),
+                msg(1002, "8:{0}".format(Data.contactId), Data.contactId, "Control/Typing", ""),
+                msg(1003, "8:{0}".format(Data.contactId), Data.contactId, "Text", "!ping")]
+        seen = []
+        router = SkypeEventRouter()
+        router.add(lambda event: seen.append(("ping", event.id)), SkypeNewMessageEvent, content=r"^!ping", stop=True)
+        router.add(lambda event: seen.append(("team", event.id)), SkypeNewMessageEvent, chat=Data.chatThreadId)
+        router.add(lambda event: seen.append(("anna", event.id)), SkypeMessageEvent, user=Data.nonContactId)
+        # Event classes are resolved without creating the event.
+        self.assertIs(SkypeEvent.rawToClass(raws[2]), SkypeTypingEvent)
+        self.assertFalse(router.wants(raws[2]))
+        self.assertEqual(router.candidates(SkypeTypingEvent), ())
+        loop = SkypeEventLoop()
+        loop.conn = SkypeStubConnection(Data.userId)
+        loop.getRawEvents = lambda: raws
+        loop.router = router
+        parsed = []
+        parseEvent = loop.parseEvent
+        loop.parseEvent = lambda raw: parsed.append(raw["id"]) or parseEvent(raw)
+        loop.cycle()
+        # The first ping stops before the chat route, the typing event is never created.
+        self.assertEqual(seen, [("ping", 1000), ("team", 1001), ("anna", 1001), ("ping", 1003)])
+        self.assertEqual(parsed, [1000, 1001, 1003])
+        # All events are still acknowledged.
+        self.assertEqual(len(loop.conn.calls), 4)
+        # Handlers can run on their own threads.
+        done = []
+        route = router.add(done.append, SkypeTypingEvent, concurrency=2)
+        loop.cycle()
+        router.close()
+        self.assertEqual([event.id for event in done], [1002])
+        self.assertEqual(route.calls, 1)
+        # Dispatch from several threads while the route is being closed neither fails nor loses counts.
+        errors = []
+
+        def hammer():
+            try:
+                for _ in range(200):
+                    route.call(done[0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for _ in range(20):
+            route.close(wait=False)
+        for thread in threads:
+            thread.join()
+        route.close()
+        self.assertEqual(errors, [])
+        self.assertEqual(route.calls, 801)
+
+    def testTypeRegistry(self):
+        """
+        Register message and event classes for new raw types, and count types with no class.
+        """
+        @SkypeMsg.registerType("Poll")
+        class PollMsg(SkypeMsg):
+            pass
+
+        @SkypeEvent.registerType("NewMessage", "Poll")
+        class PollEvent(SkypeNewMessageEvent):
+            pass
+
+        @SkypeEvent.registerType("CustomUpdate")
+        class CustomEvent(SkypeEvent):
+            pass
+
+        @SkypeEvent.registerType("CustomUpdate", "Poll")
+        class CustomPollEvent(SkypeEvent):
+            pass
+
+        try:
+            raw = {"id": 1000, "resourceType": "NewMessage", "resource": {"id": Data.msgId, "messagetype": "Poll"}}
+            event = SkypeEvent.fromRaw(None, raw)
+            self.assertIsInstance(event, PollEvent)
+            self.assertIsInstance(event.msg, PollMsg)
+            self.assertIsInstance(SkypeEvent.fromRaw(None, {"resourceType": "CustomUpdate"}), CustomEvent)
+            # Message types are registered per resource type.
+            custom = {"resourceType": "CustomUpdate", "resource": {"messagetype": "Poll"}}
+            self.assertIsInstance(SkypeEvent.fromRaw(None, custom), CustomPollEvent)
+            # Built-in types are unaffected.
+            raw["resource"]["messagetype"] = "Text"
+            self.assertIsInstance(SkypeEvent.fromRaw(None, raw).msg, SkypeTextMsg)
+            # Unregistered types fall back to the base classes, and are counted.
+            before = SkypeEvent.unknownTypes[("NewMessage", "Vote")], SkypeMsg.unknownTypes["Vote"]
+            raw["resource"]["messagetype"] = "Vote"
+            # Only created events are counted, not those merely inspected.
+            self.assertIs(SkypeEvent.rawToClass(raw), SkypeMessageEvent)
+            self.assertEqual(SkypeEvent.unknownTypes[("NewMessage", "Vote")], before[0])
+            event = SkypeEvent.fromRaw(None, raw)
+            self.assertIs(type(event), SkypeMessageEvent)
+            self.assertIs(type(event.msg), SkypeMsg)
+            self.assertEqual((SkypeEvent.unknownTypes[("NewMessage", "Vote")], SkypeMsg.unknownTypes["Vote"]),
+                             (before[0] + 1, before[1] + 1))
+        finally:
+            del SkypeMsg.msgTypes["Poll"]
+            del SkypeEvent.msgTypes[("NewMessage", "Poll")]
+            del SkypeEvent.msgTypes[("CustomUpdate", "Poll")]
+            del SkypeEvent.resourceTypes["CustomUpdate"]
+
+    def testEventFilter(self):
+        """
+        Filter raw events by resource and message type, before any event objects are created.
+        """
+        host = SkypeConnection.API_MSGSHOST
+        ack = "{0}/users/ME/conversations/ALL/messages/{{0}}/ack".format(host)
+        chat = "{0}/users/ME/conversations/{1}".format(host, Data.chatThreadId)
+        user = "{0}/users/ME/contacts/8:{1}".format(host, Data.contactId)
+        raws = [{"id": 1000, "resourceType": "NewMessage",
+                 "resource": {"id": Data.msgId, "messagetype": "Text", "content": "Hi", "conversationLink": chat,
+                              "from": user, "originalarrivaltime": Data.msgTimeFmt, "ackrequired": ack.format(1000)}},
+                {"id": 1001, "resourceType": "NewMessage",
+                 "resource": {"messagetype": "Control/Typing", "conversationLink": chat, "from": user,
+                              "ackrequired": ack.format(1001)}},
+                {"id": 1002, "resourceType": "EndpointPresence",
+                 "resource": {"selfLink": "{0}/users/8:{1}/endpoints/{{{2}}}/presenceDocs/messagingService"
+                                          .format(host, Data.contactId, Data.endpointId),
+                              "publicInfo": {}, "privateInfo": {}}}]
+        textOnly = SkypeEventFilter(msgTypes=("Text", "RichText"))
+        self.assertEqual([raw["id"] for raw in raws if textOnly(raw)], [1000, 1002])
+        noTyping = SkypeEventFilter(resourceTypes="NewMessage", skipMsgTypes="Control/Typing")
+        self.assertEqual([raw["id"] for raw in raws if noTyping(raw)], [1000])
+
+        class Endpoint(object):
+            def getEvents(self):
+                return raws
+
+        loop = SkypeEventLoop()
+        loop.conn = SkypeStubConnection(Data.userId)
+        loop.conn.endpoints["self"] = Endpoint()
+        self.assertEqual([raw["id"] for raw in loop.getRawEvents(noTyping)], [1000])
+        self.assertEqual([event.id for event in loop.getEvents(textOnly)], [1000, 1002])
+        self.assertEqual(next(loop.iterRawEvents(noTyping))["id"], 1000)
+        # Rejected events are never created, but are still acknowledged.
+        seen = []
+        loop.onEvent = seen.append
+        loop.eventFilter = noTyping
+        loop.cycle()
+        self.assertEqual([event.id for event in seen], [1000])
+        self.assertEqual(sorted(url for method, url, kwargs in loop.conn.calls), [ack.format(1000), ack.format(1001)])
+
+    def testEmotes(self):
+        """
+        Look up emoticons by identifier or shortcut, and replace shortcuts throughout a string.
+        """
+        resource = SkypeUtils.staticResource
+        data, fetched = resource.data, resource.fetched
+        resource.data = {"items": [{"id": "smile", "shortcuts": [":)", ":-)"]},
+                                   {"id": "sad", "shortcuts": [":(", ":-("]},
+                                   {"id": "wave", "shortcuts": ["(wave)", "(hi)"]},
+                                   {"id": "smiley", "shortcuts": [":))"]}]}
+        resource.fetched = time.time()
+        try:
+            self.assertEqual(SkypeMsg.emote("wave"), """<ss type="wave">(wave)</ss>""")
+            self.assertEqual(SkypeMsg.emote(":-("), """<ss type="sad">:-(</ss>""")
+            self.assertEqual(SkypeMsg.emote("(nope)"), "(nope)")
+            self.assertEqual(SkypeMsg.emotify("(hi) there :)) :-) (:"),
+                             """<ss type="wave">(hi)</ss> there <ss type="smiley">:))</ss> """
+                             """<ss type="smile">:-)</ss> (:""")
+            # The index is rebuilt when the emoticon list changes.
+            resource.data = {"items": [{"id": "cool", "shortcuts": ["(cool)"]}]}
+            self.assertEqual(SkypeMsg.emotify("(wave) (cool)"), """(wave) <ss type="cool">(cool)</ss>""")
+        finally:
+            resource.data, resource.fetched = data, fetched
+
+    def testLazyImport(self):
+        """
+        Import the package without loading submodules or their dependencies until first use.
+        """
+        def imported(code):
+            # Use -X importtime to list every module loaded by a fresh interpreter.
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], stderr=subprocess.PIPE,
+                                  universal_newlines=True, check=True)
+            return set(line.rsplit("|", 1)[1].strip() for line in proc.stderr.splitlines()
+                       if line.startswith("import time:") and "|" in line)
+
+        modules = imported("import skpy")
+        self.assertIn("skpy", modules)
+        self.assertFalse(modules & {"requests", "bs4", "skpy.core", "skpy.conn", "skpy.main"})
+        modules = imported("from skpy import SkypeConnection; SkypeConnection.USER_AGENT")
+        self.assertIn("skpy.conn", modules)
+        self.assertFalse(modules & {"bs4", "xml.etree.ElementTree", "skpy.main"})
+        # The main class pulls in messages, but HTML parsing waits until a message is read.
+        modules = imported("from skpy import Skype")
+        self.assertIn("skpy.msg", modules)
+        self.assertFalse(modules & {"bs4", "skpy.metrics", "cProfile", "pstats"})
+        subprocess.run([sys.executable, "-c", "import sys, skpy; skpy.Skype; assert 'bs4' not in sys.modules"],
+                       check=True)
+
     def testUtils(self):
         """
         Various tests for parsing provided by :class:`.SkypeUtils`.
@@ -483,6 +1426,18 @@ class SkypeClientTest(unittest.TestCase):
                          Data.chatThreadId)
         self.assertEqual(SkypeUtils.chatToId("{0}/conversations/{1}".format(Data.msgsHost, Data.chatP2PThreadId)),
                          Data.chatP2PThreadId)
+        # Parse and format API timestamps.
+        self.assertEqual(SkypeUtils.parseTime("2016-01-01T00:00:00.123Z"), datetime(2016, 1, 1, 0, 0, 0, 123000))
+        self.assertEqual(SkypeUtils.parseTime("2016-01-01T00:00:00.1Z"), datetime(2016, 1, 1, 0, 0, 0, 100000))
+        self.assertEqual(SkypeUtils.parseTime("2016-01-01T00:00:00Z", SkypeUtils.TimeMode.Aware),
+                         datetime(2016, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(SkypeUtils.parseTime("2016-01-01T00:00:00.123Z", SkypeUtils.TimeMode.Millis), 1451606400123)
+        for stamp in (None, "", "2016-01-01", "2016-01-01T00:00:00+01:00Z", "yesterday"):
+            self.assertRaises(ValueError, SkypeUtils.parseTime, stamp)
+        self.assertEqual(SkypeUtils.formatTime(datetime(2016, 1, 1, 0, 0, 0, 123000)), "2016-01-01T00:00:00.123000Z")
+        self.assertEqual(SkypeUtils.formatTime(datetime(2016, 1, 1, 1, tzinfo=timezone(timedelta(hours=1))), True),
+                         "2016-01-01T00:00:00.000Z")
+        self.assertEqual(SkypeUtils.asDatetime(1451606400123), datetime(2016, 1, 1, 0, 0, 0, 123000))
 
 
 if __name__ == "__main__":
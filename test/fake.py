@@ -0,0 +1,798 @@
+#!/usr/bin/env python
+
+"""
+A local stand-in for the Skype HTTP APIs, for load and soak testing without a live account.
+
+:class:`SkypeFakeServer` runs a threaded HTTP server on the loopback interface, implementing the endpoints used by SkPy
+with generated contacts and conversations.  Latency, server errors and rate limiting can be injected, and synthetic
+events are queued for long-polling clients.
+
+Run ``python -m test.fake`` for an event loop soak test, or ``python -m unittest test.fake`` for basic checks.
+"""
+
+import argparse
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlsplit
+import json
+import random
+import re
+import threading
+import time
+import unittest
+import uuid
+
+from skpy import SkypeConnection, SkypeAPIAuthProvider, SkypeEventLoop, SkypeNewMessageEvent, SkypeLoopProfiler
+from skpy.core import SkypeRateLimitException
+
+
+class SkypeFakeServerHTTP(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SkypeFakeHandler(BaseHTTPRequestHandler):
+    """
+    Request handler that passes each request to the :class:`SkypeFakeServer` it belongs to.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, so avoid delayed ACKs stalling every response.
+    disable_nagle_algorithm = True
+
+    def handle_one_request(self):
+        try:
+            BaseHTTPRequestHandler.handle_one_request(self)
+        except (IOError, OSError):
+            # Client went away mid-request, usually a cancelled long-poll.
+            self.close_connection = True
+
+    def dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.server.fake.handle(self.command, self.path, self.headers, body)
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        elif payload is None:
+            payload = b""
+        self.send_response(status)
+        for key, val in headers.items():
+            self.send_header(key, val)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+def route(methods, pattern, auth=None):
+    """
+    Method decorator: register a :class:`SkypeFakeServer` method as the handler for matching requests.
+
+    Args:
+        methods (str or str tuple): HTTP request methods
+        pattern (str): regular expression to match against the request path, with groups passed as arguments
+        auth (str): token type required, ``skype`` or ``reg``
+    """
+    def decorator(fn):
+        fn.route = (methods if isinstance(methods, tuple) else (methods,), re.compile("^{0}$".format(pattern)), auth)
+        return fn
+    return decorator
+
+
+class SkypeFakeServer(object):
+    """
+    A fake Skype API server, holding generated accounts, conversations and events.
+
+    Attributes:
+        url (str):
+            Base URL of the running server.
+        userId (str):
+            Username of the connected account.
+        contacts (str list):
+            Usernames of the account's contacts.
+        chats (dict):
+            Raw conversations keyed by identifier, each with a ``messages`` list (newest last).
+        latency (float):
+            Delay in seconds added to each response.
+        jitter (float):
+            Maximum random delay in seconds added on top of ``latency``.
+        errorRate (float):
+            Fraction of requests answered with a 503 error.
+        rateLimitRate (float):
+            Fraction of requests answered with a 429 error.
+        faultPattern (re.Pattern):
+            If set, only request paths matching this are subject to injected errors.
+        pageSize (int):
+            Default number of items in each page of conversations or messages.
+        pollTimeout (float):
+            How long a poll request waits for the first event before returning an empty list.
+        pollBatch (int):
+            Maximum number of events returned by each poll.
+        tokenLifetime (int):
+            Validity of issued tokens, in seconds.
+        stats (dict):
+            Counts of requests per route handler, plus ``faults``, ``polls``, ``events``, ``acks`` and ``unknown``.
+    """
+
+    # Host used in resource links, which clients only use to extract identifiers.
+    LINK_HOST = "https://fake.gateway.messenger.live.com/v1"
+
+    def __init__(self, userId="fake.user", contacts=100, groups=20, singles=20, history=50, latency=0, jitter=0,
+                 errorRate=0, rateLimitRate=0, faultPattern=None, pageSize=50, pollTimeout=1, pollBatch=100,
+                 tokenLifetime=86400, seed=None):
+        """
+        Generate the account data for a new server.  The server is not started until :meth:`start` is called.
+
+        Args:
+            userId (str): username of the connected account
+            contacts (int): number of contacts to generate
+            groups (int): number of group conversations to generate
+            singles (int): number of one-to-one conversations to generate
+            history (int): number of messages to generate in each conversation
+            latency (float): delay in seconds added to each response
+            jitter (float): maximum random delay in seconds added on top of ``latency``
+            errorRate (float): fraction of requests answered with a 503 error
+            rateLimitRate (float): fraction of requests answered with a 429 error
+            faultPattern (str): regular expression of request paths subject to injected errors
+            pageSize (int): default number of items in each page
+            pollTimeout (float): maximum wait in seconds for events during a poll
+            pollBatch (int): maximum number of events returned by each poll
+            tokenLifetime (int): validity of issued tokens, in seconds
+            seed (int): seed for the random number generator, for repeatable runs
+        """
+        self.userId = userId
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.rateLimitRate = rateLimitRate
+        self.faultPattern = re.compile(faultPattern) if faultPattern else None
+        self.pageSize = pageSize
+        self.pollTimeout = pollTimeout
+        self.pollBatch = pollBatch
+        self.tokenLifetime = tokenLifetime
+        self.random = random.Random(seed)
+        self.httpd = None
+        self.thread = None
+        self.url = None
+        self.generator = None
+        self.stopEvent = threading.Event()
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.events = deque()
+        self.eventId = 1000
+        self.msgId = int(time.time() * 1000)
+        self.skypeTokens = set()
+        self.regTokens = set()
+        self.endpoints = {}
+        self.presence = set()
+        self.objects = {}
+        self.stats = {"faults": 0, "polls": 0, "events": 0, "acks": 0, "unknown": 0}
+        self.contacts = ["user.{0}".format(i) for i in range(contacts)]
+        self.chats = {}
+        for i in range(groups):
+            id = "19:{0:032x}@thread.skype".format(i)
+            members = self.random.sample(self.contacts, min(len(self.contacts), 10))
+            self.chats[id] = {"id": id, "type": "Conversation", "properties": {"consumptionhorizon": "0;0;0"},
+                              "threadProperties": {"topic": "Group {0}".format(i)},
+                              "members": [{"id": "8:{0}".format(self.userId), "role": "Admin"}] +
+                                         [{"id": "8:{0}".format(user), "role": "User"} for user in members],
+                              "messages": []}
+        for user in self.contacts[:singles]:
+            id = "8:{0}".format(user)
+            self.chats[id] = {"id": id, "type": "Conversation", "properties": {"consumptionhorizon": "0;0;0"},
+                              "messages": []}
+        for id in self.chats:
+            for _ in range(history):
+                self.chats[id]["messages"].append(self.makeMsg(id, self.sender(id), "Text", "Message"))
+        self.routes = [getattr(self, name).route + (getattr(self, name),) for name in dir(type(self))
+                       if hasattr(getattr(type(self), name), "route")]
+
+    @property
+    def msgsHost(self):
+        return "{0}/msgs/v1".format(self.url)
+
+    def apis(self):
+        """
+        Produce API base URLs for the running server, keyed by :class:`.SkypeConnection` attribute name.
+
+        Returns:
+            dict: replacement API URLs
+        """
+        return {"API_USER": "{0}/user".format(self.url),
+                "API_PROFILE": "{0}/profile/v1".format(self.url),
+                "API_CONTACTS": "{0}/contacts/v2".format(self.url),
+                "API_MSGSHOST": self.msgsHost,
+                "API_ASM": "{0}/asm/v1/objects".format(self.url)}
+
+    def start(self):
+        """
+        Start serving on a free port of the loopback interface.
+
+        Returns:
+            SkypeFakeServer: the current instance, for chaining
+        """
+        self.httpd = SkypeFakeServerHTTP(("127.0.0.1", 0), SkypeFakeHandler)
+        self.httpd.fake = self
+        self.url = "http://127.0.0.1:{0}".format(self.httpd.server_address[1])
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.1},
+                                       name="SkypeFakeServer")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving, and stop any event generator.
+        """
+        self.stopEvent.set()
+        with self.cond:
+            self.cond.notify_all()
+        if self.generator:
+            self.generator.join()
+            self.generator = None
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.thread.join()
+            self.httpd = None
+
+    @contextmanager
+    def patch(self):
+        """
+        Context manager: start the server, and point new :class:`.SkypeConnection` instances at it.
+        """
+        self.start()
+        old = dict((key, getattr(SkypeConnection, key)) for key in self.apis())
+        for key, val in self.apis().items():
+            setattr(SkypeConnection, key, val)
+        try:
+            yield self
+        finally:
+            for key, val in old.items():
+                setattr(SkypeConnection, key, val)
+            self.stop()
+
+    def login(self, sk, pwd="password"):
+        """
+        Connect a new :class:`.Skype` (or :class:`.SkypeEventLoop`) instance, created within :meth:`patch`, using the
+        full token and registration handshake.
+
+        Args:
+            sk (Skype): unconnected instance
+
+        Returns:
+            Skype: the same instance, now connected
+        """
+        def auth(conn):
+            conn.tokens["skype"], conn.tokenExpiry["skype"] = SkypeAPIAuthProvider(conn).auth(self.userId, pwd)
+            conn.getUserId()
+            conn.getRegToken()
+        sk.conn.skypeTokenClosure(auth, sk.conn)
+        sk.conn.getSkypeToken()
+        return sk
+
+    def handle(self, method, path, headers, body):
+        """
+        Process a single request.
+
+        Returns:
+            (int, dict, object) tuple: status code, response headers, and response body
+        """
+        parts = urlsplit(path)
+        query = dict((key, vals[-1]) for key, vals in parse_qs(parts.query).items())
+        try:
+            data = json.loads(body.decode("utf-8")) if body else {}
+        except ValueError:
+            data = body
+        for methods, pattern, auth, fn in self.routes:
+            match = pattern.match(parts.path)
+            if method not in methods or not match:
+                continue
+            with self.lock:
+                self.stats[fn.__name__] = self.stats.get(fn.__name__, 0) + 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                time.sleep(delay)
+            fault = self.fault(parts.path)
+            if fault:
+                return fault
+            if auth and not self.authorised(auth, headers):
+                return 401, {}, {"errorCode": 401, "message": "Authentication failed."}
+            return fn(query, data, headers, *match.groups())
+        with self.lock:
+            self.stats["unknown"] += 1
+        return 404, {}, {"errorCode": 404, "message": "Resource not found."}
+
+    def fault(self, path):
+        if self.faultPattern and not self.faultPattern.search(path):
+            return None
+        roll = self.random.random()
+        if roll < self.rateLimitRate:
+            status, headers = 429, {"Retry-After": "1"}
+        elif roll < self.rateLimitRate + self.errorRate:
+            status, headers = 503, {}
+        else:
+            return None
+        with self.lock:
+            self.stats["faults"] += 1
+        return status, headers, {"errorCode": status}
+
+    def authorised(self, auth, headers):
+        if auth == "skype":
+            token = headers.get("X-SkypeToken") or (headers.get("Authorization") or "").replace("skype_token ", "")
+            return token in self.skypeTokens
+        elif auth == "reg":
+            return (headers.get("RegistrationToken") or "").split(";")[0] in self.regTokens
+
+    def token(self):
+        return uuid.uuid4().hex
+
+    def sender(self, chatId):
+        chat = self.chats[chatId]
+        if "members" in chat:
+            return self.random.choice(chat["members"][1:] or chat["members"])["id"][2:]
+        return chatId[2:]
+
+    def makeMsg(self, chatId, userId, msgType="Text", content="Message", clientId=None):
+        """
+        Create a raw message and allocate it an identifier.  The message is not stored anywhere.
+
+        Args:
+            chatId (str): conversation identifier
+            userId (str): sender identifier
+            msgType (str): raw message type
+            content (str): message content
+            clientId (str): client-side identifier, defaults to the message identifier
+
+        Returns:
+            dict: raw message
+        """
+        with self.lock:
+            self.msgId += 1
+            id = str(self.msgId)
+        stamp = datetime.utcfromtimestamp(int(id) / 1000.0).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        return {"id": id, "clientmessageid": clientId or id, "version": id, "type": "Message",
+                "messagetype": msgType, "contenttype": "text", "content": content,
+                "conversationLink": "{0}/users/ME/conversations/{1}".format(self.LINK_HOST, chatId),
+                "from": "{0}/users/ME/contacts/8:{1}".format(self.LINK_HOST, userId),
+                "composetime": stamp, "originalarrivaltime": stamp}
+
+    def push(self, resource, resourceType="NewMessage", ack=True):
+        """
+        Queue an event for delivery to polling clients.
+
+        Args:
+            resource (dict): raw resource of the event
+            resourceType (str): raw event type
+            ack (bool): whether to request acknowledgement of the event
+
+        Returns:
+            dict: queued raw event
+        """
+        with self.cond:
+            self.eventId += 1
+            id = self.eventId
+            if ack:
+                resource = dict(resource, ackrequired="{0}/users/ME/conversations/ALL/messages/{1}/ack"
+                                                      .format(self.msgsHost, id))
+            event = {"id": id, "type": "EventMessage", "resourceType": resourceType, "resource": resource,
+                     "time": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                     "resourceLink": resource.get("conversationLink", self.LINK_HOST)}
+            self.events.append(event)
+            self.stats["events"] += 1
+            self.cond.notify_all()
+        return event
+
+    def pushMsg(self, chatId=None, userId=None, content="Message", msgType="Text"):
+        """
+        Add a message to a conversation, and queue the corresponding event.
+
+        Args:
+            chatId (str): conversation identifier, chosen at random if not set
+            userId (str): sender identifier, chosen from the conversation members if not set
+            content (str): message content
+            msgType (str): raw message type
+
+        Returns:
+            dict: queued raw event
+        """
+        chatId = chatId or self.random.choice(sorted(self.chats))
+        msg = self.makeMsg(chatId, userId or self.sender(chatId), msgType, content)
+        with self.lock:
+            self.chats[chatId]["messages"].append(msg)
+        return self.push(msg)
+
+    def generate(self, count=None, rate=None):
+        """
+        Produce synthetic events in a background thread: a mix of new messages, typing notifications and presence.
+
+        Args:
+            count (int): number of events to produce, or ``None`` to continue until stopped
+            rate (float): events per second, or ``None`` for as fast as possible
+        """
+        def run():
+            sent = 0
+            start = time.time()
+            while not self.stopEvent.is_set() and (count is None or sent < count):
+                roll = self.random.random()
+                if roll < 0.8:
+                    self.pushMsg(content="Message {0}".format(sent))
+                elif roll < 0.9:
+                    chatId = self.random.choice(sorted(self.chats))
+                    self.push(self.makeMsg(chatId, self.sender(chatId), "Control/Typing", ""), ack=False)
+                else:
+                    user = self.random.choice(self.contacts)
+                    self.push({"selfLink": "{0}/users/8:{1}/presenceDocs/messagingService"
+                                           .format(self.LINK_HOST, user),
+                               "availability": self.random.choice(("Online", "Offline")),
+                               "status": self.random.choice(("Online", "Busy", "Away", "Hidden")),
+                               "capabilities": ""}, "UserPresence", ack=False)
+                sent += 1
+                if rate:
+                    ahead = start + sent / float(rate) - time.time()
+                    if ahead > 0:
+                        self.stopEvent.wait(ahead)
+        self.generator = threading.Thread(target=run, name="SkypeFakeServerEvents")
+        self.generator.daemon = True
+        self.generator.start()
+
+    def page(self, items, query, url):
+        """
+        Slice a list of items for a paged response, following ``syncState`` cursors.
+
+        Returns:
+            (list, dict) tuple: items in the page, and ``_metadata`` for the response
+        """
+        offset = int(query.get("syncState") or 0)
+        size = int(query.get("pageSize") or self.pageSize)
+        chunk = items[offset:offset + size]
+        state = "{0}?syncState={1}&pageSize={2}".format(url, offset + len(chunk), size)
+        return chunk, {"syncState": state, "totalCount": len(items)}
+
+    def profile(self, userId):
+        return {"username": userId, "firstname": "User", "lastname": userId.split(".")[-1],
+                "displayname": "User {0}".format(userId), "mood": "Testing", "city": "London", "country": "gb"}
+
+    def conv(self, chat):
+        return dict((key, val) for key, val in chat.items() if key not in ("members", "messages"))
+
+    # Authentication and registration.
+
+    @route("POST", "/user/login/skypetoken")
+    def loginToken(self, query, data, headers):
+        if not data.get("username") == self.userId:
+            return 401, {}, {"status": {"code": 40120, "text": "Incorrect username or password."}}
+        token = self.token()
+        with self.lock:
+            self.skypeTokens.add(token)
+        return 200, {}, {"skypetoken": token, "expiresIn": self.tokenLifetime}
+
+    @route("GET", "/user/users/self/profile", "skype")
+    def selfProfile(self, query, data, headers):
+        return 200, {}, self.profile(self.userId)
+
+    @route("POST", "/(?:user/users|profile/v1)/batch/profiles", "skype")
+    def batchProfiles(self, query, data, headers):
+        return 200, {}, [self.profile(user) if user in self.contacts or user == self.userId
+                         else {"username": user, "status": {"code": 404}} for user in data.get("usernames", [])]
+
+    @route("POST", "/msgs/v1/users/ME/endpoints")
+    def createEndpoint(self, query, data, headers):
+        token = (headers.get("Authentication") or "").replace("skypetoken=", "")
+        if token not in self.skypeTokens or "LockAndKey" not in headers:
+            return 401, {}, {"errorCode": 911, "message": "Authentication failed."}
+        reg = self.token()
+        endpoint = "{{{0}}}".format(uuid.uuid4())
+        with self.lock:
+            self.regTokens.add("registrationToken={0}".format(reg))
+            self.endpoints[endpoint] = {"subscribed": False}
+        expiry = int(time.time()) + self.tokenLifetime
+        regHead = "registrationToken={0}; expires={1}; endpointId={2}".format(reg, expiry, endpoint)
+        return 201, {"Set-RegistrationToken": regHead}, {}
+
+    @route("PUT", "/msgs/v1/users/ME/endpoints/([^/]+)/presenceDocs/messagingService", "reg")
+    def configEndpoint(self, query, data, headers, endpoint):
+        return 200, {}, {}
+
+    @route("POST", "/msgs/v1/users/ME/endpoints/([^/]+)/active", "reg")
+    def pingEndpoint(self, query, data, headers, endpoint):
+        endpoint = endpoint.replace("%7B", "{").replace("%7D", "}")
+        return (201, {}, {}) if endpoint in self.endpoints or endpoint == "SELF" else (404, {}, {})
+
+    @route("GET", "/msgs/v1/users/ME/presenceDocs/messagingService", "reg")
+    def listEndpoints(self, query, data, headers):
+        link = "{0}/users/ME/endpoints/{1}/presenceDocs/messagingService"
+        return 200, {}, {"endpointPresenceDocs": [{"link": link.format(self.LINK_HOST, id)} for id in self.endpoints]}
+
+    @route("PUT", "/msgs/v1/users/ME/presenceDocs/messagingService", "reg")
+    def setPresence(self, query, data, headers):
+        return 200, {}, {}
+
+    # Events.
+
+    @route("POST", "/msgs/v1/users/ME/endpoints/([^/]+)/subscriptions", "reg")
+    def subscribe(self, query, data, headers, endpoint):
+        with self.lock:
+            self.endpoints.setdefault(endpoint, {})["subscribed"] = True
+        return 201, {"Location": "{0}/users/ME/endpoints/{1}/subscriptions/0".format(self.msgsHost, endpoint)}, {}
+
+    @route("PUT", "/msgs/v1/users/ME/endpoints/([^/]+)/subscriptions/0", "reg")
+    def updateSubscription(self, query, data, headers, endpoint):
+        if not self.endpoints.get(endpoint, {}).get("subscribed"):
+            return 404, {}, {"errorCode": 729}
+        return 200, {}, {}
+
+    @route("POST", "/msgs/v1/users/ME/endpoints/([^/]+)/subscriptions/0/poll", "reg")
+    def poll(self, query, data, headers, endpoint):
+        if not self.endpoints.get(endpoint, {}).get("subscribed"):
+            return 404, {}, {"errorCode": 729,
+                             "message": "You must create an endpoint before performing this operation."}
+        deadline = time.time() + self.pollTimeout
+        with self.cond:
+            self.stats["polls"] += 1
+            while not self.events and not self.stopEvent.is_set():
+                wait = deadline - time.time()
+                if wait <= 0:
+                    break
+                self.cond.wait(wait)
+            batch = [self.events.popleft() for _ in range(min(self.pollBatch, len(self.events)))]
+        return 200, {}, {"eventMessages": batch}
+
+    @route("POST", "/msgs/v1/users/ME/conversations/ALL/messages/([0-9]+)/ack", "reg")
+    def ack(self, query, data, headers, id):
+        with self.lock:
+            self.stats["acks"] += 1
+        return 201, {}, {}
+
+    @route("POST", "/msgs/v1/users/ME/contacts", "reg")
+    def addPresence(self, query, data, headers):
+        with self.lock:
+            self.presence.update(contact["id"][2:] for contact in data.get("contacts", []))
+        return 201, {}, {}
+
+    @route(("PUT", "DELETE"), "/msgs/v1/users/ME/contacts/8:([^/]+)", "reg")
+    def changePresence(self, query, data, headers, id):
+        return 200, {}, {}
+
+    # Conversations.
+
+    @route("GET", "/msgs/v1/users/ME/conversations", "reg")
+    def listChats(self, query, data, headers):
+        with self.lock:
+            chats = sorted(self.chats.values(), key=lambda chat: chat["messages"][-1]["id"] if chat["messages"] else "",
+                           reverse=True)
+            convs = [dict(self.conv(chat), lastMessage=chat["messages"][-1] if chat["messages"] else {})
+                     for chat in chats]
+        page, meta = self.page(convs, query, "{0}/users/ME/conversations".format(self.msgsHost))
+        return 200, {}, {"conversations": page, "_metadata": meta}
+
+    @route("GET", "/msgs/v1/users/ME/conversations/([^/]+)", "reg")
+    def getChat(self, query, data, headers, id):
+        chat = self.chats.get(id)
+        return (200, {}, self.conv(chat)) if chat else (404, {}, {"errorCode": 404})
+
+    @route("PUT", "/msgs/v1/users/ME/conversations/([^/]+)/properties", "reg")
+    def setChatProperty(self, query, data, headers, id):
+        if id not in self.chats:
+            return 404, {}, {"errorCode": 404}
+        with self.lock:
+            self.chats[id]["properties"].update((key, val) for key, val in data.items()
+                                                if not isinstance(val, (dict, list)))
+        return 200, {}, {}
+
+    @route("GET", "/msgs/v1/users/ME/conversations/([^/]+)/messages", "reg")
+    def getMsgs(self, query, data, headers, id):
+        chat = self.chats.get(id)
+        if not chat:
+            return 404, {}, {"errorCode": 404}
+        with self.lock:
+            msgs = list(reversed(chat["messages"]))
+        page, meta = self.page(msgs, query, "{0}/users/ME/conversations/{1}/messages".format(self.msgsHost, id))
+        return 200, {}, {"messages": page, "_metadata": meta}
+
+    @route("POST", "/msgs/v1/users/ME/conversations/([^/]+)/messages", "reg")
+    def sendMsg(self, query, data, headers, id):
+        if id not in self.chats and not id.startswith("8:"):
+            return 404, {}, {"errorCode": 404}
+        with self.lock:
+            if id not in self.chats:
+                self.chats[id] = {"id": id, "type": "Conversation", "properties": {}, "messages": []}
+        msg = self.makeMsg(id, self.userId, data.get("messagetype", "Text"), data.get("content", ""),
+                           data.get("clientmessageid"))
+        with self.lock:
+            self.chats[id]["messages"].append(msg)
+        location = "{0}/users/ME/conversations/{1}/messages/{2}".format(self.msgsHost, id, msg["id"])
+        return 201, {"Location": location}, {"OriginalArrivalTime": int(msg["id"])}
+
+    @route("PUT", "/msgs/v1/users/ME/conversations/([^/]+)/messages/([0-9]+)", "reg")
+    def editMsg(self, query, data, headers, id, msgId):
+        return 200, {}, {"edittime": str(int(time.time() * 1000))}
+
+    @route("DELETE", "/msgs/v1/users/ME/conversations/([^/]+)/messages(?:/([0-9]+))?", "reg")
+    def deleteMsg(self, query, data, headers, id, msgId):
+        with self.lock:
+            msgs = self.chats.get(id, {}).get("messages", [])
+            msgs[:] = [msg for msg in msgs if msgId and not msg["id"] == msgId]
+        return 200, {}, {}
+
+    # Group threads.
+
+    @route("GET", "/msgs/v1/threads/([^/]+)", "reg")
+    def getThread(self, query, data, headers, id):
+        chat = self.chats.get(id)
+        if not chat or "members" not in chat:
+            return 404, {}, {"errorCode": 404}
+        return 200, {}, {"id": id, "type": "Thread", "members": chat["members"],
+                         "properties": {"creator": "8:{0}".format(self.userId), "historydisclosed": "false",
+                                        "joiningenabled": "true", "topic": chat["threadProperties"]["topic"]}}
+
+    @route("POST", "/msgs/v1/threads", "reg")
+    def createThread(self, query, data, headers):
+        id = "19:{0}@thread.skype".format(uuid.uuid4().hex)
+        with self.lock:
+            self.chats[id] = {"id": id, "type": "Conversation", "properties": {}, "threadProperties": {"topic": ""},
+                              "members": data.get("members", []), "messages": []}
+        return 201, {"Location": "{0}/threads/{1}".format(self.msgsHost, id)}, {}
+
+    @route("PUT", "/msgs/v1/threads/([^/]+)/properties", "reg")
+    def setThreadProperty(self, query, data, headers, id):
+        return (200, {}, {}) if id in self.chats else (404, {}, {"errorCode": 404})
+
+    @route(("PUT", "DELETE"), "/msgs/v1/threads/([^/]+)/members/8:([^/]+)", "reg")
+    def changeMember(self, query, data, headers, id, userId):
+        return (200, {}, {}) if id in self.chats else (404, {}, {"errorCode": 404})
+
+    # Contacts.
+
+    @route("GET", "/contacts/v2/users/([^/]+)", "skype")
+    def listContacts(self, query, data, headers, userId):
+        contacts = [{"mri": "8:{0}".format(user), "display_name": "User {0}".format(user), "authorized": True,
+                     "blocked": False, "profile": {"name": {"first": "User", "surname": user}}}
+                    for user in self.contacts]
+        return 200, {}, {"contacts": contacts, "groups": [], "blocklist": []}
+
+    # ASM objects.
+
+    @route("POST", "/asm/v1/objects", "skype")
+    def createObject(self, query, data, headers):
+        id = "0-weu-d1-{0}".format(uuid.uuid4().hex)
+        with self.lock:
+            self.objects[id] = {"meta": data, "content": {}}
+        return 201, {}, {"id": id}
+
+    @route("PUT", "/asm/v1/objects/([^/]+)/content/([^/]+)", "skype")
+    def uploadObject(self, query, data, headers, id, view):
+        if id not in self.objects:
+            return 404, {}, {}
+        with self.lock:
+            self.objects[id]["content"][view] = data if isinstance(data, bytes) else json.dumps(data).encode("utf-8")
+        return 201, {}, {}
+
+    @route("GET", "/asm/v1/objects/([^/]+)/views/([^/]+)", "skype")
+    def downloadObject(self, query, data, headers, id, view):
+        content = self.objects.get(id, {}).get("content", {})
+        if not content:
+            return 404, {}, {}
+        return 200, {"Content-Type": "application/octet-stream"}, content.get(view, next(iter(content.values())))
+
+
+class SkypeFakeLoop(SkypeEventLoop):
+    """
+    An event loop that counts the events it handles, by type.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SkypeFakeLoop, self).__init__(*args, **kwargs)
+        self.counts = {}
+
+    def onEvent(self, event):
+        name = type(event).__name__
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+class SkypeFakeServerTest(unittest.TestCase):
+    """
+    Checks of SkPy against the fake server, covering the full login handshake and common operations.
+    """
+
+    def setUp(self):
+        self.fake = SkypeFakeServer(contacts=30, groups=3, singles=3, history=25, pageSize=10, pollTimeout=0.2,
+                                    seed=0)
+        self.patch = self.fake.patch()
+        self.patch.__enter__()
+        self.addCleanup(self.patch.__exit__, None, None, None)
+        self.loop = self.fake.login(SkypeFakeLoop())
+
+    def testLogin(self):
+        self.assertTrue(self.loop.conn.connected)
+        self.assertEqual(self.loop.userId, self.fake.userId)
+        self.assertEqual(self.loop.conn.msgsHost, self.fake.msgsHost)
+        self.assertIn(self.loop.conn.endpoints["main"].id, self.fake.endpoints)
+
+    def testPaging(self):
+        self.assertEqual(len(self.loop.contacts), 30)
+        chats = {}
+        for _ in range(3):
+            chats.update(self.loop.chats.recent())
+        self.assertEqual(sorted(chats), sorted(self.fake.chats))
+        chat = self.loop.chats[sorted(self.fake.chats)[0]]
+        msgs = chat.getMsgs() + chat.getMsgs() + chat.getMsgs()
+        self.assertEqual(len(msgs), 25)
+        self.assertEqual(chat.getMsgs(), [])
+        sent = chat.sendMsg("Hello")
+        self.assertEqual(self.fake.chats[chat.id]["messages"][-1]["id"], sent.id)
+
+    def testEventLoop(self):
+        self.fake.generate(50)
+        self.fake.generator.join()
+        while self.fake.events:
+            self.loop.cycle()
+        self.assertEqual(sum(self.loop.counts.values()), 50)
+        self.assertTrue(self.loop.counts.get(SkypeNewMessageEvent.__name__))
+        self.assertEqual(self.fake.stats["acks"], self.loop.counts[SkypeNewMessageEvent.__name__])
+
+    def testFaults(self):
+        self.fake.rateLimitRate = 1
+        self.fake.faultPattern = re.compile("/messages$")
+        with self.assertRaises(SkypeRateLimitException):
+            self.loop.chats[sorted(self.fake.chats)[0]].sendMsg("Hello")
+        self.assertEqual(self.fake.stats["faults"], 1)
+
+
+def soak(args=None):
+    parser = argparse.ArgumentParser(description="Run an event loop soak test against a local fake Skype server.")
+    parser.add_argument("-n", "--events", type=int, default=10000, help="number of events to generate")
+    parser.add_argument("-r", "--rate", type=float, help="events per second (default: unlimited)")
+    parser.add_argument("-l", "--latency", type=float, default=0, help="response delay in seconds")
+    parser.add_argument("-j", "--jitter", type=float, default=0, help="maximum extra random delay in seconds")
+    parser.add_argument("-e", "--errors", type=float, default=0, help="fraction of requests failing with 503")
+    parser.add_argument("-q", "--rate-limit", type=float, default=0, help="fraction of requests failing with 429")
+    parser.add_argument("-c", "--contacts", type=int, default=1000, help="number of contacts")
+    parser.add_argument("-g", "--groups", type=int, default=100, help="number of group conversations")
+    opts = parser.parse_args(args)
+    fake = SkypeFakeServer(contacts=opts.contacts, groups=opts.groups, latency=opts.latency, jitter=opts.jitter,
+                           errorRate=opts.errors, rateLimitRate=opts.rate_limit,
+                           faultPattern="/poll$|/ack$|/messages$")
+    with fake.patch():
+        loop = fake.login(SkypeFakeLoop())
+        loop.profiler = SkypeLoopProfiler()
+        fake.generate(opts.events, opts.rate)
+        failures = 0
+        start = time.time()
+        while fake.generator.is_alive() or fake.events:
+            try:
+                loop.cycle()
+            except Exception:
+                failures += 1
+        elapsed = time.time() - start
+        handled = sum(loop.counts.values())
+        print("Handled {0} events in {1:.2f}s ({2:.1f}/sec), {3} failed cycles, {4} acks, {5} injected faults"
+              .format(handled, elapsed, handled / elapsed if elapsed else 0, failures, fake.stats["acks"],
+                      fake.stats["faults"]))
+        for name, count in sorted(loop.counts.items()):
+            print("  {0:<32} {1:>8}".format(name, count))
+        summary = loop.profiler.summary()
+        for stage in ("poll", "parse", "handle", "ack"):
+            stats = summary["stages"][stage]
+            print("  {0:<8} mean {1:.4f}s  p99 {2:.4f}s  max {3:.4f}s"
+                  .format(stage, stats["mean"], stats["p99"] or 0, stats["max"]))
+        print("  lag      mean {0:.4f}s  p99 {1:.4f}s".format(summary["lag"]["mean"], summary["lag"]["p99"] or 0))
+
+
+if __name__ == "__main__":
+    soak()